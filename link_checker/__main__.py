@@ -6,41 +6,90 @@
 
 # Standard library
 import argparse
+import io
 import sys
 import time
 import traceback
 
 # Third-party
-import grequests  # WARNING: Always import grequests before requests
-from bs4 import BeautifulSoup
+import gevent
 
 # First-party/Local
+from link_checker.cache import (
+    close_cache,
+    open_cache,
+    output_cache_statistics,
+)
 from link_checker.constants import (
     CRITICAL,
     DEBUG,
+    DEFAULT_CACHE_ERROR_TTL,
+    DEFAULT_CACHE_TTL,
     DEFAULT_ROOT_URL,
+    FETCH_WORKERS,
     INFO,
     LICENSE_GITHUB_BASE,
-    LICENSE_LOCAL_PATH,
     LICENSES_DIR,
-    REQUESTS_TIMEOUT,
+    NOT_CHECKED,
+    PARTIAL_EXIT_STATUS,
+    RECHECK_CONCURRENCY,
+    RECHECK_TIMEOUT,
+    REQUESTS_POOL_SIZE,
     START_TIME,
     WARNING,
 )
+from link_checker.engines import (
+    ENGINES,
+    get_link_responses,
+    output_http_versions,
+    recheck_link_responses,
+)
+from link_checker.hosts import load_host_config, output_host_statistics
+from link_checker.metrics import (
+    LINK_STATISTICS,
+    get_coverage,
+    output_metrics,
+)
+from link_checker.profiling import (
+    output_profile,
+    phase,
+    profile_iter,
+    set_profile_check,
+    start_profile,
+)
+from link_checker.scheduling import (
+    get_stop_reason,
+    iter_until_stopped,
+    output_stop_reason,
+    prioritize_links,
+    record_unchecked_pages,
+    start_schedule,
+    stop_checks,
+)
+from link_checker.shards import parse_shard
 from link_checker.utils import (
     CheckerError,
     create_base_link,
-    exception_handler,
+    create_session,
+    get_html_links_concurrently,
     get_index_rdf,
     get_legalcode,
     get_links_from_rdf,
+    get_local_html_links,
     get_memoized_result,
+    get_page,
     get_rdf,
     get_scrapable_links,
+    get_unique_links,
+    is_partial,
     memoize_result,
+    merge_shard_result,
+    output_pool_statistics,
+    output_shard_result,
     output_summaries,
-    request_local_text,
-    request_text,
+    prefetch_text,
+    print_warnings,
+    read_shard_results,
     write_response,
 )
 
@@ -107,6 +156,12 @@ def parse_arguments(arguments):
         " license paths (uses LICENSE_LOCAL_PATH environment variable and"
         f" falls back to default: '{LICENSES_DIR}')",
     )
+    parser_shared_licenses.add_argument(
+        "--local-path",
+        help="with --local, directory of the legalcode files (default: the"
+        " LICENSE_LOCAL_PATH environment variable or its default)",
+        metavar="DIR",
+    )
 
     # Shared reporting parser (optional arguments used by all reporting
     # subcommands)
@@ -120,6 +175,186 @@ def parse_arguments(arguments):
         " create junit-xml type summary (test-summary/junit-xml-report.xml)",
         metavar="output_file",
     )
+    parser_shared_reporting.add_argument(
+        "--metrics",
+        help="output the metrics of the run (links checked, cache hits,"
+        " broken links, request durations per host, phase durations, etc.)"
+        " to file in the Prometheus text format (e.g. for the node"
+        " exporter's textfile collector)",
+        metavar="output_file",
+    )
+
+    # Shared link checking parser (optional arguments used by all link
+    # checking subcommands)
+    parser_shared_checking = argparse.ArgumentParser(add_help=False)
+    parser_shared_checking.add_argument(
+        "--engine",
+        default="grequests",
+        choices=ENGINES,
+        help="link checking engine (default: 'grequests'). The async engine"
+        " requires httpx and the http2 engine requires httpx[http2]",
+    )
+    parser_shared_checking.add_argument(
+        "--max-concurrency",
+        default=REQUESTS_POOL_SIZE,
+        type=int,
+        help="maximum number of link checks in flight at once (default:"
+        f" {REQUESTS_POOL_SIZE})",
+        metavar="N",
+    )
+    parser_shared_checking.add_argument(
+        "--fetch-workers",
+        default=FETCH_WORKERS,
+        type=int,
+        help="number of pages (deeds, legalcode, and RDFs) downloaded"
+        f" concurrently ahead of parsing (default: {FETCH_WORKERS})",
+        metavar="N",
+    )
+    parser_shared_checking.add_argument(
+        "--jobs",
+        default=1,
+        type=int,
+        help="number of processes parsing pages (deeds, legalcode) in"
+        " parallel (default: 1)",
+        metavar="N",
+    )
+    parser_shared_checking.add_argument(
+        "--incremental",
+        action="store_true",
+        help="with --local, only read and parse the legalcode files changed"
+        " since the previous run (links are taken from the cache)",
+    )
+    parser_shared_checking.add_argument(
+        "--changed-since",
+        help="with --incremental, consider the legalcode files changed in"
+        " this git revision (range) instead of comparing modification"
+        " times",
+        metavar="REV",
+    )
+    parser_shared_checking.add_argument(
+        "--fail-fast",
+        action="store_true",
+        help="stop checking links once a broken link is found (the links"
+        " that were not checked are not reported)",
+    )
+    parser_shared_checking.add_argument(
+        "--max-duration",
+        type=float,
+        help="stop fetching pages and requesting links once the run took"
+        " this many seconds and write a partial report stating its coverage"
+        " (exit status 3 if no broken link was found)",
+        metavar="SECONDS",
+    )
+    parser_shared_checking.add_argument(
+        "--prioritize-from",
+        help="check the broken links of a previous --output-errors file"
+        " first (links whose last cached status is an error and new links"
+        " are always checked first)",
+        metavar="output_file",
+    )
+    parser_shared_checking.add_argument(
+        "--timeout",
+        type=float,
+        help="timeout of the link checks in seconds (default: derived from"
+        " the response times of each host, see link_checker/hosts.py)",
+        metavar="SECONDS",
+    )
+    parser_shared_checking.add_argument(
+        "--no-recheck",
+        action="store_false",
+        dest="recheck",
+        help="report links that failed transiently (timeouts, connection"
+        " errors, etc.) without checking them again at the end of the run",
+    )
+    parser_shared_checking.add_argument(
+        "--recheck-timeout",
+        default=RECHECK_TIMEOUT,
+        type=float,
+        help="timeout of the re-check of the links that failed transiently"
+        f" in seconds (default: {RECHECK_TIMEOUT})",
+        metavar="SECONDS",
+    )
+    parser_shared_checking.add_argument(
+        "--recheck-concurrency",
+        default=RECHECK_CONCURRENCY,
+        type=int,
+        help="maximum number of re-checks in flight at once (default:"
+        f" {RECHECK_CONCURRENCY})",
+        metavar="N",
+    )
+    parser_shared_checking.add_argument(
+        "--hedge",
+        action="store_true",
+        help="send a duplicate request for links that take longer than the"
+        " 95th percentile of their host to respond (the first response wins)",
+    )
+    parser_shared_checking.add_argument(
+        "--http-as-https",
+        action="store_true",
+        help="check http links as their https equivalent (an http link and"
+        " the same https link are then checked once)",
+    )
+    parser_shared_checking.add_argument(
+        "--host-config",
+        help="per-host link checking configuration file (INI format, see"
+        " link_checker/hosts.py)",
+        metavar="config_file",
+    )
+    parser_shared_checking.add_argument(
+        "--cache-ttl",
+        default=DEFAULT_CACHE_TTL,
+        type=int,
+        help="number of seconds good link statuses are reused from the"
+        f" link status cache (default: {DEFAULT_CACHE_TTL})",
+        metavar="SECONDS",
+    )
+    parser_shared_checking.add_argument(
+        "--cache-error-ttl",
+        default=DEFAULT_CACHE_ERROR_TTL,
+        type=int,
+        help="number of seconds error link statuses are reused from the"
+        f" link status cache (default: {DEFAULT_CACHE_ERROR_TTL})",
+        metavar="SECONDS",
+    )
+    parser_shared_checking.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="do not use the link status cache (uses LINK_CHECKER_CACHE_DIR"
+        " environment variable and falls back to default:"
+        " '$XDG_CACHE_HOME/cc-link-checker')",
+    )
+    parser_shared_checking.add_argument(
+        "--shard",
+        type=parse_shard,
+        help="only check the i-th of n shards of the licenses and index.rdf"
+        " objects (e.g. 1/4) and output the result to a file to be merged"
+        " with the merge subcommand",
+        metavar="i/n",
+    )
+    parser_shared_checking.add_argument(
+        "--shard-output",
+        help="output the result of the shard (--shard) to file (default:"
+        " shard-i-of-n.json)",
+        metavar="output_file",
+    )
+    parser_shared_checking.add_argument(
+        "--profile",
+        nargs="?",
+        const="profile.json",
+        type=argparse.FileType("w", encoding="utf-8"),
+        help="output the time spent in each phase (license discovery, page"
+        " fetching, parsing, cache lookups, link checks, and reporting) per"
+        " check and per license to a JSON file (default: profile.json)",
+        metavar="output_file",
+    )
+    parser_shared_checking.add_argument(
+        "--profile-cpu",
+        nargs="?",
+        const="profile.prof",
+        help="output a cProfile dump of the CPU-bound phases (parsing, cache"
+        " lookups, and reporting) to file (default: profile.prof)",
+        metavar="output_file",
+    )
 
     # Shared RDF parser (optional arguments used by all RDF subcommands)
     parser_shared_rdf = argparse.ArgumentParser(add_help=False)
@@ -140,6 +375,7 @@ def parse_arguments(arguments):
         parents=[
             parser_shared,
             parser_shared_licenses,
+            parser_shared_checking,
             parser_shared_reporting,
         ],
     )
@@ -153,6 +389,7 @@ def parse_arguments(arguments):
         parents=[
             parser_shared,
             parser_shared_licenses,
+            parser_shared_checking,
             parser_shared_reporting,
         ],
     )
@@ -167,6 +404,7 @@ def parse_arguments(arguments):
             parser_shared,
             parser_shared_licenses,
             parser_shared_rdf,
+            parser_shared_checking,
             parser_shared_reporting,
         ],
     )
@@ -177,7 +415,12 @@ def parse_arguments(arguments):
         "index",
         add_help=False,
         help="check the links within index.rdf",
-        parents=[parser_shared, parser_shared_rdf, parser_shared_reporting],
+        parents=[
+            parser_shared,
+            parser_shared_rdf,
+            parser_shared_checking,
+            parser_shared_reporting,
+        ],
     )
     parser_index.set_defaults(func=check_index_rdf)
 
@@ -190,6 +433,7 @@ def parse_arguments(arguments):
             parser_shared,
             parser_shared_licenses,
             parser_shared_rdf,
+            parser_shared_checking,
             parser_shared_reporting,
         ],
     )
@@ -209,6 +453,21 @@ def parse_arguments(arguments):
         help="include GNU licenses in addition to Creative Commons licenses",
     )
 
+    # Merge subcommand: link_checker merge -h
+    parser_merge = subparsers.add_parser(
+        "merge",
+        add_help=False,
+        help="merge the results of sharded checks (--shard)",
+        parents=[parser_shared, parser_shared_reporting],
+    )
+    parser_merge.set_defaults(func=merge_shards)
+    parser_merge.add_argument(
+        "shard_results",
+        nargs="+",
+        help="result files of all the shards (see --shard-output)",
+        metavar="shard_result",
+    )
+
     args = parser.parse_args(arguments)
     args.log_level = WARNING
     if args.verbosity:
@@ -219,8 +478,34 @@ def parse_arguments(arguments):
         elif args.log_level > CRITICAL:
             args.log_level = CRITICAL
     del args.verbosity
+    if "max_concurrency" in args and args.max_concurrency < 1:
+        parser.error("--max-concurrency must be a positive integer")
+    if "fetch_workers" in args and args.fetch_workers < 1:
+        parser.error("--fetch-workers must be a positive integer")
+    if "jobs" in args and args.jobs < 1:
+        parser.error("--jobs must be a positive integer")
+    if "incremental" in args:
+        if args.changed_since and not args.incremental:
+            parser.error("--changed-since requires --incremental")
+        if args.incremental and not getattr(args, "local", False):
+            parser.error("--incremental requires --local")
+        if args.incremental and args.no_cache:
+            parser.error("--incremental cannot be used with --no-cache")
     if "output_errors" not in args or not args.output_errors:
         args.output_errors = None
+    if "shard" in args:
+        if args.shard_output and not args.shard:
+            parser.error("--shard-output requires --shard")
+        if args.shard:
+            if args.output_errors:
+                parser.error(
+                    "--output-errors cannot be used with --shard (use it"
+                    " with the merge subcommand)"
+                )
+            # Errors are kept for the shard result file
+            args.output_errors = io.StringIO()
+            if not args.shard_output:
+                args.shard_output = "shard-{}-of-{}.json".format(*args.shard)
 
     if args.log_level == DEBUG:
         print(f"DEBUG: args: {args}")
@@ -228,182 +513,131 @@ def parse_arguments(arguments):
     return args
 
 
-def check_deeds(args):
-    print("\n\nChecking Deeds...\n\n")
-    license_names = get_legalcode(args)
-    if args.log_level <= INFO:
-        print("Number of files to be checked:", len(license_names))
-    errors_total = 0
-    exit_status = 0
+def get_deed_pages(args, license_names):
+    """Scrape the deed of each license and collect its scrapable links
+
+    Args:
+        license_names (list): List of license file names
+
+    Returns:
+        list: pages - list of page dictionaries (see get_page)
+    """
+    deed_urls = {}
     for license_name in license_names:
-        caught_errors = 0
-        context_printed = False
         filename = license_name[: -len(".html")]
         deed_base_url = create_base_link(args, filename, for_deeds=True)
         # Deeds template:
         # https://github.com/creativecommons/cc.engine/blob/master/cc/engine/templates/licenses/standard_deed.html
-
-        # Scrapping the html found on the active site
         if deed_base_url:
-            context = f"\n\nChecking: deed\nURL: {deed_base_url}"
-            page_url = deed_base_url
-            source_html = request_text(page_url)
-            license_soup = BeautifulSoup(source_html, "lxml")
-            links_found = license_soup.find_all("a")
-            link_count = len(links_found)
-            if args.log_level <= INFO:
-                print(f"{context}\nNumber of links found: {link_count}")
-                context_printed = True
-            base_url = deed_base_url
-            valid_anchors, valid_links, context_printed = get_scrapable_links(
-                args, base_url, links_found, context, context_printed
-            )
-            if valid_links:
-                memoized_results = get_memoized_result(
-                    valid_links, valid_anchors
-                )
-                stored_links = memoized_results[0]
-                stored_anchors = memoized_results[1]
-                stored_result = memoized_results[2]
-
-                check_links = memoized_results[3]
-                check_anchors = memoized_results[4]
-                if check_links:
-                    rs = (
-                        # Since we're only checking for validity,
-                        # we can retreive
-                        # only the headers/metadata
-                        grequests.head(link, timeout=REQUESTS_TIMEOUT)
-                        for link in check_links
-                    )
-                    responses = list()
-                    # Explicitly close connections to free up file handles and
-                    # avoid Connection Errors per:
-                    # https://stackoverflow.com/a/22839550
-                    for response in grequests.map(
-                        rs, exception_handler=exception_handler
-                    ):
-                        try:
-                            responses.append(response.status_code)
-                            response.close()
-                        except AttributeError:
-                            responses.append(response)
-                    memoize_result(check_links, responses)
-                    stored_anchors += check_anchors
-                    stored_result += responses
-                stored_links += check_links
-                caught_errors = write_response(
-                    args,
-                    stored_links,
-                    stored_result,
-                    base_url,
+            deed_urls[license_name] = deed_base_url
+    # Scrapping the html found on the active site
+    source_htmls = profile_iter(
+        prefetch_text(args, deed_urls.values()), "fetch", deed_urls.keys()
+    )
+    results = get_html_links_concurrently(
+        args, list(deed_urls.values()), source_htmls
+    )
+    pages = []
+    for license_name, deed_base_url in iter_until_stopped(
+        list(deed_urls.items())
+    ):
+        context_printed = False
+        context = f"\n\nChecking: deed\nURL: {deed_base_url}"
+        base_url = deed_base_url
+        with phase("parse", license_name):
+            link_count, valid_anchors, valid_links, warnings = next(results)
+        if args.log_level <= INFO:
+            print(f"{context}\nNumber of links found: {link_count}")
+            context_printed = True
+        context_printed = print_warnings(
+            args, warnings, context, context_printed
+        )
+        if valid_links:
+            pages.append(
+                get_page(
                     license_name,
-                    stored_anchors,
+                    base_url,
                     context,
+                    valid_links,
+                    valid_anchors,
                     context_printed,
                 )
+            )
+    # Stop fetching and parsing the remaining pages (see iter_until_stopped)
+    results.close()
+    return pages
 
-            if caught_errors:
-                errors_total += caught_errors
-                exit_status = 1
 
-    return license_names, errors_total, exit_status
+def get_legalcode_pages(args, license_names):
+    """Scrape the legalcode of each license and collect its scrapable links
 
+    Args:
+        license_names (list): List of license file names
 
-def check_legalcode(args):
-    print("\n\nChecking LegalCode License...\n\n")
-    license_names = get_legalcode(args)
-    if args.log_level <= INFO:
-        print("Number of files to be checked:", len(license_names))
-    errors_total = 0
-    exit_status = 0
-    for license_name in license_names:
-        caught_errors = 0
+    Returns:
+        list: pages - list of page dictionaries (see get_page)
+    """
+    base_urls = [
+        create_base_link(args, license_name[: -len(".html")])
+        for license_name in license_names
+    ]
+    if args.local:
+        # Files are read in this process (their content identifies the
+        # cached links) and only parsed in the --jobs worker processes
+        results = get_local_html_links(
+            args, license_names, base_urls, args.local_path
+        )
+    else:
+        page_urls = [
+            "{}{}".format(LICENSE_GITHUB_BASE, license_name)
+            for license_name in license_names
+        ]
+        source_htmls = profile_iter(
+            prefetch_text(args, page_urls), "fetch", license_names
+        )
+        results = get_html_links_concurrently(args, base_urls, source_htmls)
+    pages = []
+    for license_name, base_url in iter_until_stopped(
+        list(zip(license_names, base_urls))
+    ):
         context_printed = False
-        filename = license_name[: -len(".html")]
-        base_url = create_base_link(args, filename)
         context = f"\n\nChecking: legalcode\nURL: {base_url}"
-        if args.local:
-            source_html = request_local_text(LICENSE_LOCAL_PATH, license_name)
-        else:
-            page_url = "{}{}".format(LICENSE_GITHUB_BASE, license_name)
-            source_html = request_text(page_url)
-        license_soup = BeautifulSoup(source_html, "lxml")
-        links_found = license_soup.find_all("a")
-        link_count = len(links_found)
+        with phase("parse", license_name):
+            link_count, valid_anchors, valid_links, warnings = next(results)
         if args.log_level <= INFO:
             print(f"{context}\nNumber of links found: {link_count}")
             context_printed = True
-        valid_anchors, valid_links, context_printed = get_scrapable_links(
-            args, base_url, links_found, context, context_printed
+        context_printed = print_warnings(
+            args, warnings, context, context_printed
         )
         if valid_links:
-            memoized_results = get_memoized_result(valid_links, valid_anchors)
-            stored_links = memoized_results[0]
-            stored_anchors = memoized_results[1]
-            stored_result = memoized_results[2]
-            check_links = memoized_results[3]
-            check_anchors = memoized_results[4]
-            if check_links:
-                rs = (
-                    # Since we're only checking for validity, we can retreive
-                    # only the headers/metadata
-                    grequests.head(link, timeout=REQUESTS_TIMEOUT)
-                    for link in check_links
+            pages.append(
+                get_page(
+                    license_name,
+                    base_url,
+                    context,
+                    valid_links,
+                    valid_anchors,
+                    context_printed,
                 )
-                responses = list()
-                # Explicitly close connections to free up file handles and
-                # avoid Connection Errors per:
-                # https://stackoverflow.com/a/22839550
-                for response in grequests.map(
-                    rs, exception_handler=exception_handler
-                ):
-                    try:
-                        responses.append(response.status_code)
-                        response.close()
-                    except AttributeError:
-                        responses.append(response)
-                memoize_result(check_links, responses)
-                stored_anchors += check_anchors
-                stored_result += responses
-            stored_links += check_links
-            caught_errors = write_response(
-                args,
-                stored_links,
-                stored_result,
-                base_url,
-                license_name,
-                stored_anchors,
-                context,
-                context_printed,
             )
+    # Stop fetching and parsing the remaining pages (see iter_until_stopped)
+    results.close()
+    return pages
 
-        if caught_errors:
-            errors_total += caught_errors
-            exit_status = 1
 
-    return license_names, errors_total, exit_status
+def get_rdf_pages(args, rdf_obj_list, index=False):
+    """Collect the scrapable links of each RDF object
 
+    Args:
+        rdf_obj_list (list): List of RDF objects
+        index (bool): Whether the RDF objects were found in index.rdf
 
-def check_rdfs(args, index=False):
-    if index:
-        print("\n\nChecking index.rdf...\n\n")
-        rdf_obj_list = get_index_rdf(args)
-    else:
-        print("\n\nChecking RDFs...\n\n")
-        rdf_obj_list = get_rdf(args)
-    if args.log_level <= INFO:
-        if not index:
-            print("Number of RDF files to be checked:", len(rdf_obj_list))
-        else:
-            print(
-                "Number of RDF objects/sections to be checked in index.rdf:",
-                len(rdf_obj_list),
-            )
-    errors_total = 0
-    exit_status = 0
-    for rdf_obj in rdf_obj_list:
-        caught_errors = 0
+    Returns:
+        list: pages - list of page dictionaries (see get_page)
+    """
+    pages = []
+    for rdf_obj in iter_until_stopped(rdf_obj_list):
         context_printed = False
         rdf_url = (
             rdf_obj["rdf:about"] if index else f"{rdf_obj['rdf:about']}rdf"
@@ -416,68 +650,216 @@ def check_rdfs(args, index=False):
             print(f"{context}\nNumber of links found: {link_count}")
             context_printed = True
         base_url = rdf_url
-        valid_anchors, valid_links, context_printed = get_scrapable_links(
-            args,
-            base_url,
-            links_found,
-            context,
-            context_printed,
-            rdf=True,
-        )
+        with phase("parse", rdf_url):
+            valid_anchors, valid_links, context_printed = get_scrapable_links(
+                args,
+                base_url,
+                links_found,
+                context,
+                context_printed,
+                rdf=True,
+            )
         if valid_links:
-            memoized_results = get_memoized_result(valid_links, valid_anchors)
-            stored_links = memoized_results[0]
-            stored_anchors = memoized_results[1]
-            stored_result = memoized_results[2]
-            check_links = memoized_results[3]
-            check_anchors = memoized_results[4]
-            if check_links:
-                rs = (
-                    # Since we're only checking for validity,
-                    # we can retreive
-                    # only the headers/metadata
-                    grequests.head(link, timeout=REQUESTS_TIMEOUT)
-                    for link in check_links
+            pages.append(
+                get_page(
+                    rdf_obj,
+                    rdf_url,
+                    context,
+                    valid_links,
+                    valid_anchors,
+                    context_printed,
                 )
-                responses = list()
-                # Explicitly close connections to free up file handles and
-                # avoid Connection Errors per:
-                # https://stackoverflow.com/a/22839550
-                for response in grequests.map(
-                    rs, exception_handler=exception_handler
-                ):
-                    try:
-                        responses.append(response.status_code)
-                        response.close()
-                    except AttributeError:
-                        responses.append(response)
-                memoize_result(check_links, responses)
-                stored_anchors += check_anchors
-                stored_result += responses
-            stored_links += check_links
+            )
+    return pages
+
+
+def check_pages(args, pages):
+    """Check the links of all pages in a single batch and report the results
+
+    Every unique link is checked once, no matter how many pages it is found
+    in, and the results are then written per page.
+
+    Args:
+        pages (list): List of page dictionaries (see get_page)
+
+    Returns:
+        int: errors_total - Number of broken links found in all pages
+        int: exit_status - 1 if any broken link was found, otherwise 0
+    """
+    check_page_links(args, pages)
+    return write_page_responses(args, pages)
+
+
+def check_page_links(args, pages):
+    """Check every unique link of the pages whose result is not memoized yet
+
+    Args:
+        pages (list): List of page dictionaries (see get_page)
+    """
+    with phase("cache"):
+        unique_links = get_unique_links(pages, args.http_as_https)
+        links = list(unique_links.keys())
+        memoized_results = get_memoized_result(
+            links, list(unique_links.values()), args.http_as_https
+        )
+    # Number of pages in which each link was found
+    references = [len(set(page_idx)) for page_idx in memoized_results[4]]
+    check_links = prioritize_links(args, memoized_results[3], references)
+    link_count = sum(len(page["links"]) for page in pages)
+    unique_hrefs = len({link for page in pages for link in page["links"]})
+    LINK_STATISTICS["links"] += link_count
+    LINK_STATISTICS["unique_hrefs"] += unique_hrefs
+    LINK_STATISTICS["unique_links"] += len(links)
+    LINK_STATISTICS["checked_links"] += len(check_links)
+    if args.log_level <= INFO:
+        print(
+            f"\n\nNumber of links found in {len(pages)} pages: {link_count}"
+            f"\nNumber of unique links: {len(links)} ({unique_hrefs} before"
+            f" normalization, {get_dedup_ratio(unique_hrefs, len(links))}"
+            " fewer)"
+            f"\nNumber of unique links to be checked: {len(check_links)}"
+        )
+    if check_links:
+        with phase("check"):
+            responses = get_link_responses(args, check_links)
+            responses = recheck_link_responses(args, check_links, responses)
+        # Links that were not requested (see link_checker.scheduling) are
+        # neither memoized nor reported
+        checked_links = [
+            link
+            for link, response in zip(check_links, responses)
+            if response != NOT_CHECKED
+        ]
+        checked_responses = [
+            response for response in responses if response != NOT_CHECKED
+        ]
+        unchecked = len(check_links) - len(checked_links)
+        LINK_STATISTICS["unchecked_links"] += unchecked
+        output_stop_reason(args, unchecked)
+        with phase("cache"):
+            memoize_result(checked_links, checked_responses)
+
+
+def get_dedup_ratio(unique_hrefs, unique_links):
+    """Returns the share of the unique links removed by normalization"""
+    if not unique_hrefs:
+        return "0%"
+    return f"{1 - unique_links / unique_hrefs:.1%}"
+
+
+def write_page_responses(args, pages):
+    """Report the results of the links of the pages (see check_page_links)
+
+    Args:
+        pages (list): List of page dictionaries (see get_page)
+
+    Returns:
+        int: errors_total - Number of broken links found in all pages
+        int: exit_status - 1 if any broken link was found, otherwise 0
+    """
+    errors_total = 0
+    exit_status = 0
+    with phase("report"):
+        for page in pages:
+            # All links have been checked, so every result is memoized
+            (
+                stored_links,
+                stored_anchors,
+                stored_result,
+                _,
+                _,
+            ) = get_memoized_result(
+                page["links"], page["anchors"], args.http_as_https
+            )
             caught_errors = write_response(
                 args,
                 stored_links,
                 stored_result,
-                rdf_url,
-                rdf_obj,
+                page["base_url"],
+                page["name"],
                 stored_anchors,
-                context,
-                context_printed,
+                page["context"],
+                page["context_printed"],
             )
+            if caught_errors:
+                errors_total += caught_errors
+                exit_status = 1
+    return errors_total, exit_status
 
-        if caught_errors:
-            errors_total += caught_errors
-            exit_status = 1
 
+def check_deeds(args):
+    license_names, pages = collect_deed_pages(args)
+    errors_total, exit_status = check_pages(args, pages)
+    return license_names, errors_total, exit_status
+
+
+def collect_deed_pages(args, license_names=None):
+    set_profile_check("deeds")
+    print("\n\nChecking Deeds...\n\n")
+    if license_names is None:
+        with phase("discovery"):
+            license_names = get_legalcode(args)
+    if args.log_level <= INFO:
+        print("Number of files to be checked:", len(license_names))
+    pages = get_deed_pages(args, license_names)
+    return license_names, pages
+
+
+def check_legalcode(args):
+    license_names, pages = collect_legalcode_pages(args)
+    errors_total, exit_status = check_pages(args, pages)
+    return license_names, errors_total, exit_status
+
+
+def collect_legalcode_pages(args, license_names=None):
+    set_profile_check("legalcode")
+    print("\n\nChecking LegalCode License...\n\n")
+    if license_names is None:
+        with phase("discovery"):
+            license_names = get_legalcode(args)
+    if args.log_level <= INFO:
+        print("Number of files to be checked:", len(license_names))
+    pages = get_legalcode_pages(args, license_names)
+    return license_names, pages
+
+
+def check_rdfs(args, index=False):
+    rdf_obj_list, pages = collect_rdf_pages(args, index)
+    errors_total, exit_status = check_pages(args, pages)
     return rdf_obj_list, errors_total, exit_status
 
 
+def collect_rdf_pages(args, index=False, license_names=None):
+    set_profile_check("index" if index else "rdf")
+    if index:
+        print("\n\nChecking index.rdf...\n\n")
+        rdf_obj_list = get_index_rdf(args)
+    else:
+        print("\n\nChecking RDFs...\n\n")
+        rdf_obj_list = get_rdf(args, license_names)
+    if args.log_level <= INFO:
+        if not index:
+            print("Number of RDF files to be checked:", len(rdf_obj_list))
+        else:
+            print(
+                "Number of RDF objects/sections to be checked in index.rdf:",
+                len(rdf_obj_list),
+            )
+    pages = get_rdf_pages(args, rdf_obj_list, index)
+    return rdf_obj_list, pages
+
+
 def check_index_rdf(args):
     return check_rdfs(args, index=True)
 
 
 def check_combined(args):
+    """Check the links of the legalcode, deeds, RDFs, and index.rdf
+
+    The license list is looked up once, then the pages of the four checks
+    are collected concurrently and all their links are checked in a single
+    batch. The output is still grouped per check.
+    """
     print(
         "Running Full Inspection:"
         " Checking links for LegalCode, Deeds, RDF, and index.rdf"
@@ -486,30 +868,116 @@ def check_combined(args):
     errors_total = 0
     exit_status = 0
 
-    names, total, exit_status_legalcode = check_legalcode(args)
-    license_names += names
-    errors_total += total
+    with phase("discovery"):
+        all_license_names = get_legalcode(args)
+    collectors = [
+        lambda: collect_legalcode_pages(args, all_license_names),
+        lambda: collect_deed_pages(args, all_license_names),
+        lambda: collect_rdf_pages(args, license_names=all_license_names),
+        lambda: collect_rdf_pages(args, index=True),
+    ]
+    results = run_collectors(collectors)
+    check_page_links(
+        args, [page for _, (_, pages) in results for page in pages]
+    )
+    checks = ["legalcode", "deeds", "rdf", "index"]
+    for check, (output, (names, pages)) in zip(checks, results):
+        sys.stdout.write(output)
+        set_profile_check(check)
+        total, exit_status_check = write_page_responses(args, pages)
+        license_names += names
+        errors_total += total
+        if exit_status_check:
+            exit_status = 1
+    set_profile_check(args.subcommand)
+    return license_names, errors_total, exit_status
 
-    names, total, exit_status_deeds = check_deeds(args)
-    license_names += names
-    errors_total += total
 
-    names, total, exit_status_rdf = check_rdfs(args)
-    license_names += names
-    errors_total += total
+def run_collectors(collectors):
+    """Runs page collectors concurrently (in greenlets), buffering what each
+    of them prints (the buffers are printed if a collector fails)
 
-    names, total, exit_status_index_rdf = check_rdfs(args, index=True)
-    license_names += names
-    errors_total += total
+    Args:
+        collectors (list): Functions returning the names and pages of a check
 
-    exit_status_list = [
-        exit_status_legalcode,
-        exit_status_deeds,
-        exit_status_rdf,
-        exit_status_index_rdf,
+    Returns:
+        list: output and result of each collector
+    """
+    stdout = sys.stdout
+    greenlets = [gevent.spawn(collector) for collector in collectors]
+    sys.stdout = GreenletOutput(stdout, greenlets)
+    try:
+        gevent.joinall(greenlets)
+        results = [greenlet.get() for greenlet in greenlets]
+    except BaseException:
+        # Print what the collectors printed (in order) before the error
+        for output in sys.stdout.outputs:
+            stdout.write(output.getvalue())
+        raise
+    finally:
+        outputs = sys.stdout.outputs
+        sys.stdout = stdout
+    return [
+        (output.getvalue(), result) for output, result in zip(outputs, results)
     ]
-    if 1 in exit_status_list:
-        exit_status = 1
+
+
+class GreenletOutput:
+    """File-like object writing what each greenlet prints to its own buffer
+
+    Args:
+        stdout (file): File written to by other greenlets
+        greenlets (list): Greenlets whose output is buffered
+    """
+
+    def __init__(self, stdout, greenlets):
+        self.stdout = stdout
+        self.greenlets = greenlets
+        self.outputs = [io.StringIO() for _ in greenlets]
+
+    def get_output(self):
+        current = gevent.getcurrent()
+        for idx, greenlet in enumerate(self.greenlets):
+            if greenlet is current:
+                return self.outputs[idx]
+        return self.stdout
+
+    def write(self, text):
+        return self.get_output().write(text)
+
+    def flush(self):
+        self.get_output().flush()
+
+
+def merge_shards(args):
+    """Merge the results of all the shards of a check (see --shard)
+
+    The errors of each shard are written to the --output-errors file (in
+    shard order), followed by a single summary of the broken links of all
+    shards.
+    """
+    results = read_shard_results(args.shard_results)
+    license_names = []
+    errors_total = 0
+    exit_status = 0
+    for result in results:
+        license_names += result["license_names"]
+        errors_total += result["errors_total"]
+        exit_status = max(exit_status, result["exit_status"])
+        merge_shard_result(args, result)
+        coverage = result.get("coverage")
+        if coverage:
+            LINK_STATISTICS["unique_links"] += coverage["links"]
+            LINK_STATISTICS["unchecked_links"] += coverage["unchecked"]
+            record_unchecked_pages(coverage.get("unchecked_pages", 0))
+            if coverage["stop_reason"]:
+                stop_checks(coverage["stop_reason"])
+    if args.log_level <= INFO:
+        print(
+            f"Merged {len(results)} shards ({results[0]['subcommand']}):"
+            f" {len(license_names)} files checked, {errors_total} error"
+            " links"
+        )
     return license_names, errors_total, exit_status
 
 
@@ -564,8 +1032,33 @@ def print_canonical(args):
 
 def main():
     args = parse_arguments(sys.argv[1:])
-    license_names, errors_total, exit_status = args.func(args)
-    output_summaries(args, license_names, errors_total)
+    create_session(getattr(args, "max_concurrency", REQUESTS_POOL_SIZE))
+    start_profile(args)
+    start_schedule(args)
+    if "no_cache" in args:
+        load_host_config(args.host_config)
+        open_cache(args)
+    try:
+        license_names, errors_total, exit_status = args.func(args)
+    finally:
+        close_cache()
+    with phase("report"):
+        coverage = get_coverage(get_stop_reason())
+        if "shard" in args and args.shard:
+            output_shard_result(
+                args, license_names, errors_total, exit_status, coverage
+            )
+        else:
+            output_summaries(args, license_names, errors_total, coverage)
+    output_pool_statistics(args)
+    output_http_versions(args)
+    output_host_statistics(args)
+    output_cache_statistics(args)
+    output_profile(args)
+    output_metrics(args, errors_total)
+    if not exit_status and is_partial(coverage):
+        # A partial run did not find any broken link, but is not a pass
+        exit_status = PARTIAL_EXIT_STATUS
     if args.log_level <= INFO:
         print()
         print(f"Completed in: {time.time() - START_TIME:.2f} seconds")
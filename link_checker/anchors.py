@@ -0,0 +1,206 @@
+"""Fast anchor tag extraction
+
+Pages are parsed with lxml directly instead of building a full BeautifulSoup
+tree. Each anchor tag is kept as a lightweight Anchor record, whose text is
+the anchor tag serialized the same way BeautifulSoup does (str(tag)), so that
+warnings and reports are identical.
+"""
+
+# Standard library
+import re
+
+# Third-party
+from bs4.dammit import UnicodeDammit
+from lxml import etree
+
+# Elements rendered as "<tag/>" when empty (see BeautifulSoup's
+# HTMLTreeBuilder)
+VOID_ELEMENTS = {
+    "area",
+    "base",
+    "basefont",
+    "bgsound",
+    "br",
+    "col",
+    "command",
+    "embed",
+    "frame",
+    "hr",
+    "image",
+    "img",
+    "input",
+    "isindex",
+    "keygen",
+    "link",
+    "menuitem",
+    "meta",
+    "nextid",
+    "param",
+    "source",
+    "spacer",
+    "track",
+    "wbr",
+}
+# Attributes whose whitespace separated values are normalized (see
+# BeautifulSoup's HTMLTreeBuilder)
+LIST_ATTRIBUTES = {
+    "*": {"class", "accesskey", "dropzone"},
+    "a": {"rel", "rev"},
+    "link": {"rel", "rev"},
+    "td": {"headers"},
+    "th": {"headers"},
+    "form": {"accept-charset"},
+    "object": {"archive"},
+    "area": {"rel"},
+    "icon": {"sizes"},
+    "iframe": {"sandbox"},
+    "output": {"for"},
+}
+NONWHITESPACE_RE = re.compile(r"\S+")
+# Elements in which whitespace only strings are not collapsed
+PRESERVE_WHITESPACE_ELEMENTS = {"pre", "textarea"}
+ASCII_SPACES = " \n\t\x0c\r"
+
+
+class Anchor:
+    """Anchor tag found in a page
+
+    Attributes are read like those of a BeautifulSoup tag (anchor["href"]
+    raises KeyError if the anchor has no href attribute) and str(anchor)
+    returns the serialized anchor tag.
+    """
+
+    __slots__ = ("href", "id", "name", "text")
+
+    def __init__(self, href, id, name, text):
+        self.href = href
+        self.id = id
+        self.name = name
+        self.text = text
+
+    def __getitem__(self, key):
+        if key not in self.__slots__ or key == "text":
+            raise KeyError(key)
+        value = getattr(self, key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return self.text
+
+    def __eq__(self, other):
+        return isinstance(other, Anchor) and self.text == other.text
+
+    def __hash__(self):
+        return hash(self.text)
+
+
+def get_anchors(source_html):
+    """Finds all the anchor tags of an HTML page
+
+    Args:
+        source_html (str or bytes): HTML of the page
+
+    Returns:
+        list: anchors - list of Anchor records in document order (including
+              the anchors after the end of the html element)
+    """
+    if isinstance(source_html, bytes):
+        # Detect the encoding the same way BeautifulSoup does
+        source_html = UnicodeDammit(source_html, is_html=True).unicode_markup
+    # Anchors are collected from the parser events rather than from the tree
+    # returned by the parser, which misses the markup after </html>
+    parser = etree.HTMLPullParser(events=("start",), tag="a")
+    elements = []
+    try:
+        parser.feed(source_html)
+        elements.extend(element for _, element in parser.read_events())
+        parser.close()
+    except etree.XMLSyntaxError:
+        pass
+    elements.extend(element for _, element in parser.read_events())
+    return [
+        Anchor(
+            element.get("href"),
+            element.get("id"),
+            element.get("name"),
+            serialize_element(
+                element,
+                next(
+                    element.iterancestors(*PRESERVE_WHITESPACE_ELEMENTS), None
+                )
+                is not None,
+            ),
+        )
+        for element in elements
+    ]
+
+
+def serialize_element(element, preserve_whitespace=False):
+    """Serializes an element and its descendants like BeautifulSoup's
+    str(tag) (attributes sorted by name, "minimal" entity substitution and
+    whitespace only strings collapsed)
+
+    Args:
+        element (class 'lxml.etree._Element'): Element to serialize
+        preserve_whitespace (bool): Whether the element is in a pre or
+            textarea element
+
+    Returns:
+        str: serialized element (without its tail text)
+    """
+    if element.tag is etree.Comment:
+        return f"<!--{element.text or ''}-->"
+    if not isinstance(element.tag, str):
+        # Processing instructions and entities are not part of HTML trees
+        return ""
+    attributes = []
+    for key, value in sorted(element.attrib.items()):
+        if key in LIST_ATTRIBUTES["*"] or key in LIST_ATTRIBUTES.get(
+            element.tag, ()
+        ):
+            value = " ".join(NONWHITESPACE_RE.findall(value))
+        attributes.append(f" {key}={quote_attribute(value)}")
+    attributes = "".join(attributes)
+    if element.tag in VOID_ELEMENTS and not len(element) and not element.text:
+        return f"<{element.tag}{attributes}/>"
+    preserve_whitespace = (
+        preserve_whitespace or element.tag in PRESERVE_WHITESPACE_ELEMENTS
+    )
+    content = [get_text(element.text, preserve_whitespace)]
+    for child in element:
+        content.append(serialize_element(child, preserve_whitespace))
+        content.append(get_text(child.tail, preserve_whitespace))
+    return f"<{element.tag}{attributes}>{''.join(content)}</{element.tag}>"
+
+
+def get_text(text, preserve_whitespace):
+    """Escapes a string and, unless whitespace is preserved, collapses it to
+    a single newline or space if it only contains whitespace
+    """
+    if not text:
+        return ""
+    if not preserve_whitespace and not text.strip(ASCII_SPACES):
+        return "\n" if "\n" in text else " "
+    return escape_text(text)
+
+
+def escape_text(text):
+    """Replaces &, < and > with their HTML entities"""
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def quote_attribute(value):
+    """Escapes and quotes an attribute value (double quotes, unless the value
+    only contains double quotes)
+    """
+    value = escape_text(value)
+    if '"' in value:
+        if "'" in value:
+            return '"{}"'.format(value.replace('"', "&quot;"))
+        return f"'{value}'"
+    return f'"{value}"'
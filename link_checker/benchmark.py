@@ -0,0 +1,580 @@
+"""End-to-end throughput benchmark
+
+A local HTTP server stands in for creativecommons.org: it serves synthetic
+deeds and RDFs and the links found in them, with configurable latency,
+errors, redirects, slow hosts and hung requests. Synthetic legalcode files and
+an index.rdf are written to a temporary directory (--local, --local-index).
+The legalcode, deeds, rdf, and combined checks are then run against the
+server (--root-url) and their throughput, request latency and memory usage
+are reported. No network access is needed.
+
+Each check runs in its own (spawned) process, so that its peak memory usage
+does not include that of the test runner or of the checks run before it.
+
+Usage:
+    python -m link_checker.benchmark [options]
+"""
+
+# Standard library
+import argparse
+import contextlib
+import copy
+import io
+import json
+import math
+import multiprocessing
+import os
+import queue
+import random
+import resource
+import sys
+import tempfile
+import time
+import zlib
+
+# Third-party
+import gevent
+import grequests  # noqa: F401 (Always import grequests before requests)
+from gevent.pywsgi import WSGIServer
+
+# Local
+from . import engines, utils
+from .__main__ import (
+    check_combined,
+    check_deeds,
+    check_legalcode,
+    check_rdfs,
+)
+from .__main__ import parse_arguments as parse_checker_arguments
+from .cache import open_cache
+from .constants import REQUESTS_TIMEOUT
+from .engines import ENGINES
+from .hosts import load_host_config
+
+CHECKS = {
+    "legalcode": check_legalcode,
+    "deeds": check_deeds,
+    "rdf": check_rdfs,
+    "combined": check_combined,
+}
+LICENSES = ["by", "by-sa", "by-nd", "by-nc", "by-nc-sa", "by-nc-nd"]
+LANGUAGES = ["de", "es", "fr", "it", "ja", "nl", "pl", "pt", "ru", "uk"]
+JURISDICTIONS = ["at", "br", "ch", "cz", "de", "es", "fr", "it", "nl", "pl"]
+# Host of the links served with --slow-host-delay
+SLOW_HOST = "localhost"
+
+
+def parse_arguments(arguments):
+    """parse arguments from CLI
+
+    Args:
+        arguments (list): list of arguments parsed from command line
+    """
+    parser = argparse.ArgumentParser(
+        prog="link_checker.benchmark",
+        description=(
+            "Benchmark the link checks against a local stand-in for"
+            " creativecommons.org"
+        ),
+    )
+    parser.add_argument(
+        "--checks",
+        nargs="+",
+        default=list(CHECKS),
+        choices=list(CHECKS),
+        help="checks to benchmark (default: all)",
+    )
+    parser.add_argument(
+        "--licenses",
+        default=60,
+        type=int,
+        help="number of legalcode files (default: 60)",
+        metavar="N",
+    )
+    parser.add_argument(
+        "--links",
+        default=50,
+        type=int,
+        help="number of links per page (default: 50)",
+        metavar="N",
+    )
+    parser.add_argument(
+        "--unique-links",
+        default=1000,
+        type=int,
+        help="number of distinct links the pages link to (default: 1000)",
+        metavar="N",
+    )
+    parser.add_argument(
+        "--latency",
+        default=0.05,
+        type=float,
+        help="median response time of the links (default: 0.05)",
+        metavar="SECONDS",
+    )
+    parser.add_argument(
+        "--latency-sigma",
+        default=0.5,
+        type=float,
+        help="shape of the log-normal distribution of the response times"
+        " (default: 0.5)",
+        metavar="SIGMA",
+    )
+    parser.add_argument(
+        "--error-rate",
+        default=0.02,
+        type=float,
+        help="share of links responding with 404 (default: 0.02)",
+        metavar="RATE",
+    )
+    parser.add_argument(
+        "--redirect-rate",
+        default=0.1,
+        type=float,
+        help="share of links responding with 301 (default: 0.1)",
+        metavar="RATE",
+    )
+    parser.add_argument(
+        "--hung-rate",
+        default=0.0,
+        type=float,
+        help="share of links responding after --hung-delay (default: 0)",
+        metavar="RATE",
+    )
+    parser.add_argument(
+        "--hung-delay",
+        default=REQUESTS_TIMEOUT + 1,
+        type=float,
+        help="response time of hung links (default: the request timeout"
+        f" plus one second, {REQUESTS_TIMEOUT + 1})",
+        metavar="SECONDS",
+    )
+    parser.add_argument(
+        "--slow-host-share",
+        default=0.1,
+        type=float,
+        help=f"share of links on the slow host, {SLOW_HOST} (default: 0.1)",
+        metavar="RATE",
+    )
+    parser.add_argument(
+        "--slow-host-delay",
+        default=0.5,
+        type=float,
+        help="delay added to the responses of the slow host (default: 0.5)",
+        metavar="SECONDS",
+    )
+    parser.add_argument(
+        "--seed",
+        default=0,
+        type=int,
+        help="seed of the synthetic pages and links (default: 0)",
+    )
+    parser.add_argument(
+        "--engine",
+        default="grequests",
+        choices=ENGINES,
+        help="link checking engine (default: 'grequests')",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        default=100,
+        type=int,
+        help="maximum number of link checks in flight at once (default: 100)",
+        metavar="N",
+    )
+    parser.add_argument(
+        "--hedge",
+        action="store_true",
+        help="send hedged requests (see the --hedge option of link_checker)",
+    )
+    parser.add_argument(
+        "--output-json",
+        type=argparse.FileType("w", encoding="utf-8"),
+        help="write the results to a JSON file",
+        metavar="output_file",
+    )
+    parser.add_argument(
+        "--min-links-per-second",
+        default=0,
+        type=float,
+        help="exit with an error if a check is slower (default: 0)",
+        metavar="RATE",
+    )
+    return parser.parse_args(arguments)
+
+
+def get_license_names(count):
+    """Returns the names of count synthetic legalcode files (4.0
+    translations, then 3.0 ports)
+    """
+    names = []
+    for license in LICENSES:
+        names.append(f"{license}_4.0.html")
+        names += [f"{license}_4.0_{language}.html" for language in LANGUAGES]
+        names += [
+            f"{license}_3.0_{jurisdiction}.html"
+            for jurisdiction in JURISDICTIONS
+        ]
+    names.sort(key=lambda name: (name.count("_"), "3.0" in name, name))
+    return names[:count]
+
+
+def get_page_links(config, root_url, key):
+    """Returns the links of a synthetic page
+
+    Args:
+        config (argparse.Namespace): Benchmark configuration
+        root_url (str): URL of the local server
+        key (str): Path or file name identifying the page
+
+    Returns:
+        list: absolute links of the page
+    """
+    rng = random.Random(zlib.crc32(f"{config.seed} {key}".encode()))
+    link_ids = rng.sample(
+        range(config.unique_links), min(config.links, config.unique_links)
+    )
+    port = root_url.rsplit(":", 1)[1]
+    links = []
+    for link_id in link_ids:
+        host = "127.0.0.1"
+        if link_id < config.unique_links * config.slow_host_share:
+            host = SLOW_HOST
+        links.append(f"http://{host}:{port}/target/{link_id}")
+    return links
+
+
+def get_html_page(config, root_url, key):
+    """Returns a synthetic deed or legalcode page"""
+    anchors = "\n".join(
+        f"<li><a href='{link}'>Link {idx}</a></li>"
+        for idx, link in enumerate(get_page_links(config, root_url, key))
+    )
+    return (
+        "<!DOCTYPE html><html><head><title>Synthetic page</title></head>"
+        f"<body><a href='#content'>Skip</a><ul id='content'>{anchors}</ul>"
+        "<a href='mailto:info@creativecommons.org'>Contact</a>"
+        "</body></html>"
+    )
+
+
+def get_rdf_license(config, root_url, key):
+    """Returns a synthetic cc:License element of the page's license"""
+    resources = "\n".join(
+        f'    <cc:permits rdf:resource="{link}"/>'
+        for link in get_page_links(config, root_url, key)
+    )
+    return (
+        f'  <cc:License rdf:about="{root_url}{key[: -len("rdf")]}">\n'
+        f"{resources}\n"
+        "  </cc:License>\n"
+    )
+
+
+def get_rdf_page(config, root_url, key, licenses=None):
+    """Returns a synthetic RDF whose subject is the page's license (or, for
+    index.rdf, whose subjects are the licenses at the given keys)
+    """
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        "<rdf:RDF xmlns:cc='http://creativecommons.org/ns#'"
+        " xmlns:rdf='http://www.w3.org/1999/02/22-rdf-syntax-ns#'>\n"
+        + "".join(
+            get_rdf_license(config, root_url, license_key)
+            for license_key in (licenses or [key])
+        )
+        + "</rdf:RDF>\n"
+    )
+
+
+def get_target_response(config, link_id):
+    """Returns the delay and status of a link (the same for every request)
+
+    Returns:
+        float: delay - response time of the link in seconds
+        int: status - status code of the link
+    """
+    rng = random.Random(zlib.crc32(f"{config.seed} target {link_id}".encode()))
+    delay = 0
+    if config.latency:
+        delay = rng.lognormvariate(
+            math.log(config.latency), config.latency_sigma
+        )
+    draw = rng.random()
+    if draw < config.hung_rate:
+        return config.hung_delay, 200
+    draw -= config.hung_rate
+    if draw < config.error_rate:
+        return delay, 404
+    draw -= config.error_rate
+    if draw < config.redirect_rate:
+        return delay, 301
+    return delay, 200
+
+
+def create_site(config, root_url):
+    """Creates the WSGI application serving the synthetic site"""
+
+    def site(environ, start_response):
+        path = environ["PATH_INFO"]
+        headers = [("Content-Type", "text/html; charset=utf-8")]
+        status = 200
+        body = b""
+        if path.startswith("/target/") and path.endswith("/moved"):
+            pass
+        elif path.startswith("/target/"):
+            delay, status = get_target_response(config, path.split("/")[2])
+            if environ.get("HTTP_HOST", "").startswith(SLOW_HOST):
+                delay += config.slow_host_delay
+            gevent.sleep(delay)
+            if status == 301:
+                headers.append(("Location", f"{path}/moved"))
+            elif status == 200 and environ.get("HTTP_RANGE"):
+                status = 206
+        elif path.endswith("/rdf"):
+            headers = [("Content-Type", "application/rdf+xml")]
+            body = get_rdf_page(config, root_url, path).encode()
+        elif path.startswith(("/licenses/", "/publicdomain/")):
+            body = get_html_page(config, root_url, path).encode()
+        else:
+            status = 404
+        if environ["REQUEST_METHOD"] == "HEAD":
+            body = b""
+        headers.append(("Content-Length", str(len(body))))
+        start_response(f"{status} Status", headers)
+        return [body]
+
+    return site
+
+
+def serve(config, port_queue):
+    server = WSGIServer(("127.0.0.1", 0), None, log=None)
+    server.init_socket()
+    root_url = f"http://127.0.0.1:{server.server_port}"
+    server.application = create_site(config, root_url)
+    server.start()
+    port_queue.put(server.server_port)
+    server.serve_forever()
+
+
+@contextlib.contextmanager
+def start_server(config):
+    """Serves the synthetic site from a separate process (so that both the
+    gevent and the asyncio engine can reach it)
+
+    Returns:
+        str: root URL of the site
+    """
+    port_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=serve, args=(config, port_queue), daemon=True
+    )
+    process.start()
+    try:
+        yield f"http://127.0.0.1:{port_queue.get(timeout=10)}"
+    finally:
+        process.terminate()
+        process.join()
+
+
+def get_rdf_key(license_name):
+    """Returns the path of the RDF of a synthetic legalcode file"""
+    license, version, *parts = license_name[: -len(".html")].split("_")
+    path = f"/licenses/{license}/{version}/"
+    if parts and version == "3.0":
+        # Ported license
+        path += f"{parts[0]}/"
+    return f"{path}rdf"
+
+
+def write_legalcode(config, root_url, local_path):
+    """Writes the synthetic legalcode files and index.rdf to local_path"""
+    license_names = get_license_names(config.licenses)
+    for license_name in license_names:
+        with open(os.path.join(local_path, license_name), "w") as lic:
+            lic.write(get_html_page(config, root_url, license_name))
+    rdf_keys = sorted({get_rdf_key(name) for name in license_names})
+    with open(os.path.join(local_path, "index.rdf"), "w") as index_rdf:
+        index_rdf.write(get_rdf_page(config, root_url, "/index.rdf", rdf_keys))
+
+
+def get_percentile(values, percentile):
+    """Returns a percentile (nearest rank) of a sorted list (0 if empty)"""
+    if not values:
+        return 0
+    rank = math.ceil(percentile / 100 * len(values))
+    return values[max(rank, 1) - 1]
+
+
+def get_peak_rss():
+    """Returns the peak resident set size of the process (in MiB)"""
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        # bytes instead of KiB
+        peak_rss /= 1024
+    return peak_rss / 1024
+
+
+def run_check(config, root_url, local_path, check):
+    """Runs a check against the synthetic site
+
+    Args:
+        config (argparse.Namespace): Benchmark configuration
+        root_url (str): URL of the local server
+        local_path (str): Directory of the synthetic legalcode files
+        check (str): Name of the check
+
+    Returns:
+        dict: results of the check
+    """
+    args = parse_checker_arguments(
+        [
+            check,
+            "--local",
+            "--local-path",
+            local_path,
+            "--root-url",
+            root_url,
+            "--no-cache",
+            "--engine",
+            config.engine,
+            "--max-concurrency",
+            str(config.max_concurrency),
+            "-qq",
+        ]
+        + (["--hedge"] if config.hedge else [])
+        + (["--local-index"] if check == "combined" else [])
+    )
+    # The check runs in its own process (see run_check_process)
+    utils.INDEX_RDF_LOCAL_PATH = os.path.join(local_path, "index.rdf")
+    utils.MEMOIZED_LINKS = {}
+    utils.MAP_BROKEN_LINKS = {}
+    engines.LATENCIES.clear()
+    load_host_config(None)
+    open_cache(args)
+    utils.create_session(args.max_concurrency)
+    start_time = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        names, errors_total, _ = CHECKS[check](args)
+    duration = time.perf_counter() - start_time
+    latencies = sorted(seconds for _, seconds in engines.LATENCIES)
+    unique_links = len(utils.MEMOIZED_LINKS)
+    return {
+        "check": check,
+        "pages": len(names),
+        "unique_links": unique_links,
+        "requests": len(latencies),
+        "errors": errors_total,
+        "duration": duration,
+        "links_per_second": unique_links / duration,
+        "latency_p50": get_percentile(latencies, 50),
+        "latency_p99": get_percentile(latencies, 99),
+        "peak_rss_mib": get_peak_rss(),
+    }
+
+
+def put_check_result(result_queue, *arguments):
+    """Runs a check (see run_check) and puts its result (or the exception it
+    raised) in result_queue
+    """
+    try:
+        result_queue.put(run_check(*arguments))
+    except Exception as error:
+        result_queue.put(error)
+
+
+def run_check_process(config, root_url, local_path, check):
+    """Runs a check (see run_check) in a new process
+
+    The process is spawned rather than forked, so that its peak memory usage
+    is that of the check alone.
+
+    Returns:
+        dict: results of the check
+    """
+    # The output file cannot be passed to the process
+    config = copy.copy(config)
+    config.output_json = None
+    context = multiprocessing.get_context("spawn")
+    result_queue = context.Queue()
+    process = context.Process(
+        target=put_check_result,
+        args=(result_queue, config, root_url, local_path, check),
+        daemon=True,
+    )
+    process.start()
+    try:
+        while True:
+            try:
+                result = result_queue.get(timeout=1)
+                break
+            except queue.Empty:
+                if not process.is_alive() and result_queue.empty():
+                    raise RuntimeError(
+                        f"The {check} check exited with code"
+                        f" {process.exitcode}"
+                    )
+    finally:
+        process.join()
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+def run_benchmark(config):
+    """Runs the selected checks against a local synthetic site
+
+    Returns:
+        list: results of each check (see run_check)
+    """
+    results = []
+    with start_server(config) as root_url:
+        with tempfile.TemporaryDirectory() as local_path:
+            write_legalcode(config, root_url, local_path)
+            for check in config.checks:
+                results.append(
+                    run_check_process(config, root_url, local_path, check)
+                )
+    return results
+
+
+def output_results(results):
+    """Prints the results of the checks as a table"""
+    print(
+        f"{'check':<10}{'pages':>7}{'links':>7}{'requests':>9}{'errors':>7}"
+        f"{'seconds':>9}{'links/s':>9}{'p50 ms':>8}{'p99 ms':>8}"
+        f"{'peak MiB':>10}"
+    )
+    for result in results:
+        print(
+            f"{result['check']:<10}{result['pages']:>7}"
+            f"{result['unique_links']:>7}{result['requests']:>9}"
+            f"{result['errors']:>7}{result['duration']:>9.2f}"
+            f"{result['links_per_second']:>9.1f}"
+            f"{result['latency_p50'] * 1000:>8.1f}"
+            f"{result['latency_p99'] * 1000:>8.1f}"
+            f"{result['peak_rss_mib']:>10.1f}"
+        )
+
+
+def main():
+    config = parse_arguments(sys.argv[1:])
+    results = run_benchmark(config)
+    output_results(results)
+    if config.output_json:
+        json.dump(results, config.output_json, indent=2)
+    slow_checks = [
+        result["check"]
+        for result in results
+        if result["links_per_second"] < config.min_links_per_second
+    ]
+    if slow_checks:
+        print(
+            f"\nSlower than {config.min_links_per_second} links/s:",
+            ", ".join(slow_checks),
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
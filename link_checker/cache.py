@@ -0,0 +1,293 @@
+"""Persistent link status cache
+
+The status of checked links is stored in a SQLite database in the cache
+directory (uses LINK_CHECKER_CACHE_DIR environment variable and falls back to
+"$XDG_CACHE_HOME/cc-link-checker") so that subsequent runs only need to check
+links whose cached status has expired.
+
+The same database stores fetched pages with their validators (ETag and
+Last-Modified) for conditional requests and the links scraped from each page,
+so that unchanged pages are neither downloaded nor parsed again.
+
+The manifest table records the size, modification time and content digest of
+the local files parsed by the previous run (see --incremental), so that
+unchanged files are not even read again.
+
+Writes are committed in a single transaction per batch of checked links (see
+cache_statuses) and when the cache is closed, rather than once per page,
+extract or manifest entry.
+"""
+
+# Standard library
+import json
+import os
+import sqlite3
+import time
+
+# Local
+from .constants import CACHE_DIR, GOOD_RESPONSE, INFO
+
+CACHE = None
+CACHE_TTL = {"good": 0, "error": 0}
+CACHE_STATISTICS = {"hits": 0, "misses": 0}
+
+
+def open_cache(args, cache_dir=CACHE_DIR):
+    """Opens the link status cache unless --no-cache is set
+
+    Args:
+        cache_dir (str): Directory in which the cache database is stored
+
+    Returns:
+        class 'sqlite3.Connection': the cache database (or None)
+    """
+    global CACHE
+    if args.no_cache:
+        CACHE = None
+        return CACHE
+    os.makedirs(cache_dir, exist_ok=True)
+    CACHE = sqlite3.connect(os.path.join(cache_dir, "cache.sqlite3"))
+    CACHE.execute(
+        "CREATE TABLE IF NOT EXISTS links ("
+        " url TEXT PRIMARY KEY,"
+        " status INTEGER,"
+        " error TEXT,"
+        " checked REAL NOT NULL"
+        ")"
+    )
+    CACHE.execute(
+        "CREATE TABLE IF NOT EXISTS pages ("
+        " url TEXT PRIMARY KEY,"
+        " etag TEXT,"
+        " last_modified TEXT,"
+        " body BLOB NOT NULL"
+        ")"
+    )
+    CACHE.execute(
+        "CREATE TABLE IF NOT EXISTS extracts ("
+        " key TEXT PRIMARY KEY,"
+        " data TEXT NOT NULL"
+        ")"
+    )
+    CACHE.execute(
+        "CREATE TABLE IF NOT EXISTS manifest ("
+        " path TEXT PRIMARY KEY,"
+        " size INTEGER NOT NULL,"
+        " mtime REAL NOT NULL,"
+        " digest TEXT NOT NULL"
+        ")"
+    )
+    CACHE_TTL["good"] = args.cache_ttl
+    CACHE_TTL["error"] = args.cache_error_ttl
+    CACHE_STATISTICS["hits"] = 0
+    CACHE_STATISTICS["misses"] = 0
+    return CACHE
+
+
+def close_cache():
+    """Commits and closes the link status cache"""
+    global CACHE
+    if CACHE is None:
+        return
+    CACHE.commit()
+    CACHE.close()
+    CACHE = None
+
+
+def get_cached_status(link):
+    """Get the cached status of a link, unless it has expired
+
+    Args:
+        link (str): Link to look up
+
+    Returns:
+        int or str: Response status code/exception of the link (or None)
+    """
+    if CACHE is None:
+        return None
+    row = CACHE.execute(
+        "SELECT status, error, checked FROM links WHERE url = ?", (link,)
+    ).fetchone()
+    if row is not None:
+        status, error, checked = row
+        status = error if error is not None else status
+        ttl = CACHE_TTL["good" if status in GOOD_RESPONSE else "error"]
+        if time.time() - checked < ttl:
+            CACHE_STATISTICS["hits"] += 1
+            return status
+    CACHE_STATISTICS["misses"] += 1
+    return None
+
+
+def get_link_history(links):
+    """Get the last status of links, whether or not it has expired
+
+    Args:
+        links (list): List of links to look up
+
+    Returns:
+        dict: status (response status code/exception) and time of the last
+              check (in seconds since the epoch) of the links in the cache
+    """
+    if CACHE is None:
+        return {}
+    history = {}
+    # SQLite limits the number of parameters of a query
+    for start in range(0, len(links), 500):
+        end = start + 500
+        chunk = links[start:end]
+        rows = CACHE.execute(
+            "SELECT url, status, error, checked FROM links WHERE url IN"
+            f" ({', '.join('?' * len(chunk))})",
+            chunk,
+        )
+        for url, status, error, checked in rows:
+            history[url] = (error if error is not None else status, checked)
+    return history
+
+
+def cache_statuses(links, statuses):
+    """Stores the status of checked links and commits the pending writes
+
+    Args:
+        links (list): List of checked links
+        statuses (list): Response status code/exception corresponding to
+            links
+    """
+    if CACHE is None:
+        return
+    checked = time.time()
+    rows = []
+    for idx, link in enumerate(links):
+        status = getattr(statuses[idx], "status_code", statuses[idx])
+        if isinstance(status, int):
+            rows.append((link, status, None, checked))
+        else:
+            rows.append((link, None, str(status), checked))
+    CACHE.executemany(
+        "INSERT OR REPLACE INTO links (url, status, error, checked)"
+        " VALUES (?, ?, ?, ?)",
+        rows,
+    )
+    CACHE.commit()
+
+
+def get_cached_page(page_url):
+    """Get a previously fetched page and its validators
+
+    Args:
+        page_url (str): URL of the page
+
+    Returns:
+        dict: etag, last_modified and body of the page (or None)
+    """
+    if CACHE is None:
+        return None
+    row = CACHE.execute(
+        "SELECT etag, last_modified, body FROM pages WHERE url = ?",
+        (page_url,),
+    ).fetchone()
+    if row is None:
+        return None
+    etag, last_modified, body = row
+    return {"etag": etag, "last_modified": last_modified, "body": body}
+
+
+def cache_page(page_url, etag, last_modified, body):
+    """Stores a fetched page, if it has validators for conditional requests
+
+    Args:
+        page_url (str): URL of the page
+        etag (str): ETag header of the response
+        last_modified (str): Last-Modified header of the response
+        body (bytes): Content of the response
+    """
+    if CACHE is None or not (etag or last_modified):
+        return
+    CACHE.execute(
+        "INSERT OR REPLACE INTO pages (url, etag, last_modified, body)"
+        " VALUES (?, ?, ?, ?)",
+        (page_url, etag, last_modified, body),
+    )
+
+
+def get_cached_extract(key):
+    """Get the links previously scraped from a page
+
+    Args:
+        key (str): Key identifying the page content and base URL
+
+    Returns:
+        dict: scraped links (or None)
+    """
+    if CACHE is None:
+        return None
+    row = CACHE.execute(
+        "SELECT data FROM extracts WHERE key = ?", (key,)
+    ).fetchone()
+    if row is None:
+        return None
+    return json.loads(row[0])
+
+
+def cache_extract(key, data):
+    """Stores the links scraped from a page
+
+    Args:
+        key (str): Key identifying the page content and base URL
+        data (dict): scraped links (must be JSON serializable)
+    """
+    if CACHE is None:
+        return
+    CACHE.execute(
+        "INSERT OR REPLACE INTO extracts (key, data) VALUES (?, ?)",
+        (key, json.dumps(data)),
+    )
+
+
+def get_manifest_entry(path):
+    """Get the size, modification time and digest a local file had when it
+    was last parsed
+
+    Args:
+        path (str): Absolute path of the file
+
+    Returns:
+        tuple: size, mtime and digest of the file (or None)
+    """
+    if CACHE is None:
+        return None
+    return CACHE.execute(
+        "SELECT size, mtime, digest FROM manifest WHERE path = ?", (path,)
+    ).fetchone()
+
+
+def update_manifest(path, size, mtime, digest):
+    """Stores the size, modification time and digest of a parsed local file
+
+    Args:
+        path (str): Absolute path of the file
+        size (int): Size of the file (in bytes)
+        mtime (float): Modification time of the file
+        digest (str): Digest of the file content (see get_digest)
+    """
+    if CACHE is None:
+        return
+    CACHE.execute(
+        "INSERT OR REPLACE INTO manifest (path, size, mtime, digest)"
+        " VALUES (?, ?, ?, ?)",
+        (path, size, mtime, digest),
+    )
+
+
+def output_cache_statistics(args):
+    """Prints the hit rate of the link status cache"""
+    if args.log_level > INFO:
+        return
+    lookups = CACHE_STATISTICS["hits"] + CACHE_STATISTICS["misses"]
+    if not lookups:
+        return
+    print(
+        f"\nLink cache: {CACHE_STATISTICS['hits']} of {lookups} lookups hit"
+        f" ({CACHE_STATISTICS['hits'] / lookups:.0%})"
+    )
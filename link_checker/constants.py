@@ -13,8 +13,41 @@ HEADER = {
 }
 MEMOIZED_LINKS = {}
 MAP_BROKEN_LINKS = {}
-GOOD_RESPONSE = [200, 300, 301, 302]
+# First and final status of the links re-checked after a transient failure
+RECHECKED_LINKS = {}
+# 206: Partial Content (response to RANGE_HEADER)
+GOOD_RESPONSE = [200, 206, 300, 301, 302]
 REQUESTS_TIMEOUT = 5
+RANGE_HEADER = {"Range": "bytes=0-0"}
+# Link status of links whose host failed too many times in a row
+HOST_UNAVAILABLE = "Host Unavailable"
+# Link status of links that were not requested (see link_checker.scheduling)
+NOT_CHECKED = "Not Checked"
+# Exit status of the runs in which links or pages were not checked (see
+# link_checker.scheduling) and no broken link was found
+PARTIAL_EXIT_STATUS = 3
+# Link statuses (exceptions) of failures that are retried
+RETRY_ERRORS = ["Connection Error", "Timeout Error", "ReadTimeout"]
+# Maximum number of link checks in flight at once
+REQUESTS_POOL_SIZE = 100
+# Request timeout (in seconds) and maximum number of link checks in flight
+# at once of the re-check of the links that failed transiently
+RECHECK_TIMEOUT = 30
+RECHECK_CONCURRENCY = 10
+# Number of pages downloaded concurrently ahead of parsing
+FETCH_WORKERS = 10
+# Maximum number of hosts whose connections are kept alive
+POOL_CONNECTIONS = 100
+CACHE_DIR = os.environ.get(
+    "LINK_CHECKER_CACHE_DIR",
+    os.path.join(
+        os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+        "cc-link-checker",
+    ),
+)
+# Number of seconds good (GOOD_RESPONSE) and error link statuses are cached
+DEFAULT_CACHE_TTL = 24 * 60 * 60
+DEFAULT_CACHE_ERROR_TTL = 0
 LICENSE_GITHUB_BASE = (
     "https://raw.githubusercontent.com/creativecommons/creativecommons.org"
     "/master/docroot/legalcode/"
@@ -0,0 +1,510 @@
+"""Link checking engines
+
+Each engine takes a list of links and returns the response status code or,
+for links that could not be requested, the exception in string format (see
+exception_handler) in the same order as the links.
+
+Links are checked with HEAD requests. Servers that do not support HEAD
+requests (see the head_fallback host option) are checked again with GET
+requests for the first byte only, whose connection is closed as soon as the
+headers are received.
+
+The async and http2 engines use httpx. The http2 engine negotiates HTTP/2
+(ALPN, https links only) and multiplexes all of the checks of a host over a
+single connection, while hosts that do not support HTTP/2 are checked over
+HTTP/1.1 connections (up to --max-concurrency). The HTTP version of the
+responses is recorded in HTTP_VERSIONS.
+
+Transient failures are retried with exponential backoff and, once a host
+failed too many times in a row, its remaining links are not requested at all
+(see link_checker.hosts). Requests wait for the rate limit and connection cap
+of their host before taking one of the --max-concurrency slots.
+
+The host and duration of every request are recorded in LATENCIES (see
+link_checker.benchmark and link_checker.metrics).
+"""
+
+# Standard library
+import asyncio
+import collections
+import copy
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Third-party
+import gevent
+import grequests  # WARNING: Always import grequests before requests
+from gevent import monkey
+from gevent.lock import BoundedSemaphore
+
+# Local
+from .constants import (
+    GOOD_RESPONSE,
+    HOST_UNAVAILABLE,
+    INFO,
+    NOT_CHECKED,
+    RANGE_HEADER,
+    REQUESTS_TIMEOUT,
+)
+from .hosts import (
+    async_host_slot,
+    get_hedge_delay,
+    get_host,
+    get_host_statuses,
+    get_host_timeout,
+    get_retry_delay,
+    host_slot,
+    is_failure,
+    is_host_available,
+    is_retryable,
+    record_hedged_request,
+    record_host_response,
+    reset_host_failures,
+)
+from .scheduling import check_fail_fast, is_stopped
+from .utils import (
+    CheckerError,
+    exception_handler,
+    get_session,
+    record_recheck,
+)
+
+try:
+    # Third-party
+    import httpx
+except ImportError:
+    httpx = None
+try:
+    # Third-party
+    import h2
+except ImportError:
+    h2 = None
+
+
+ENGINES = ["grequests", "async", "http2"]
+# Host and duration (in seconds) of each request
+LATENCIES = []
+# Number of responses per host and HTTP version (httpx engines)
+HTTP_VERSIONS = collections.Counter()
+
+
+def get_link_responses(args, links):
+    """Checks links with the engine selected by the --engine option
+
+    Args:
+        links (list): List of links to be checked
+
+    Returns:
+        list: Response status code/exception of all the links in links
+    """
+    if args.engine == "grequests":
+        engine = get_link_responses_grequests
+    else:
+        engine = get_link_responses_async
+    responses = engine(args, links)
+    fallback_idx = [
+        idx
+        for idx, link in enumerate(links)
+        if responses[idx] in get_host_statuses(link, "head_fallback")
+    ]
+    if fallback_idx:
+        fallback_links = [links[idx] for idx in fallback_idx]
+        fallback_responses = engine(args, fallback_links, method="get")
+        for idx, response in zip(fallback_idx, fallback_responses):
+            responses[idx] = response
+    return responses
+
+
+def recheck_link_responses(args, links, responses):
+    """Checks the links that failed transiently (timeouts, connection errors,
+    retry_statuses, and unavailable hosts) once more, with the
+    --recheck-timeout and --recheck-concurrency options
+
+    The re-check pass runs once all of the links were checked, so that
+    transient failures do not delay the other links, and before any result
+    is reported. Links are only reported as broken if they fail again.
+
+    Args:
+        links (list): List of links checked
+        responses (list): Response status code/exception of all the links in
+            links (see get_link_responses)
+
+    Returns:
+        list: Response status code/exception of all the links in links (the
+              result of the re-check for the links re-checked, the first
+              response for the links that were not re-checked as the checks
+              were stopped)
+    """
+    # Once the checks are stopped, the links would not be requested again
+    if not args.recheck or is_stopped():
+        return responses
+    recheck_idx = [
+        idx
+        for idx, link in enumerate(links)
+        if responses[idx] == HOST_UNAVAILABLE
+        or is_failure(link, responses[idx])
+    ]
+    if not recheck_idx:
+        return responses
+    if args.log_level <= INFO:
+        print(
+            f"\nRe-checking {len(recheck_idx)} links that failed"
+            f" transiently (timeout: {args.recheck_timeout} seconds)"
+        )
+    recheck_args = copy.copy(args)
+    recheck_args.max_concurrency = args.recheck_concurrency
+    recheck_args.timeout = args.recheck_timeout
+    recheck_args.hedge = False
+    # Failures of the re-check are confirmed (see check_fail_fast)
+    recheck_args.recheck = False
+    # Hosts that failed during the first pass get another chance
+    reset_host_failures()
+    recheck_responses = get_link_responses(
+        recheck_args, [links[idx] for idx in recheck_idx]
+    )
+    responses = list(responses)
+    recovered = 0
+    confirmed = 0
+    for idx, response in zip(recheck_idx, recheck_responses):
+        # Links that were not re-checked (see link_checker.scheduling) keep
+        # the response of the first pass
+        if response == NOT_CHECKED:
+            continue
+        if response in GOOD_RESPONSE:
+            recovered += 1
+        else:
+            confirmed += 1
+        record_recheck(links[idx], responses[idx], response)
+        responses[idx] = response
+    if args.log_level <= INFO:
+        print(
+            f"Recovered links: {recovered}, confirmed broken links:"
+            f" {confirmed}"
+        )
+    return responses
+
+
+def get_link_responses_grequests(args, links, method="head"):
+    """Checks links with grequests (gevent)
+
+    Args:
+        links (list): List of links to be checked
+        method (str): "head" or "get" (ranged GET request)
+
+    Returns:
+        list: Response status code/exception of all the links in links
+    """
+    session = get_session()
+    # Every link gets a greenlet, so that links waiting for their host (see
+    # host_slot) do not delay the links of other hosts
+    pool = grequests.Pool()
+    slots = BoundedSemaphore(args.max_concurrency)
+    return pool.map(
+        lambda link: check_link_grequests(args, session, slots, link, method),
+        links,
+    )
+
+
+def check_link_grequests(args, session, slots, link, method="head"):
+    """Checks a link with grequests, retrying transient failures (see
+    is_retryable)
+
+    Args:
+        slots (class 'gevent.lock.BoundedSemaphore'): --max-concurrency
+            requests in flight at once
+
+    Returns:
+        int or str: Response status code/exception of the link
+    """
+    attempt = 0
+    while True:
+        timeout = args.timeout or get_host_timeout(link, attempt)
+        with host_slot(link), slots:
+            if is_stopped():
+                return NOT_CHECKED
+            # The host may have failed while the request was waiting
+            if not is_host_available(link):
+                return HOST_UNAVAILABLE
+            start_time = time.perf_counter()
+            request, duration = send_grequests(
+                session, link, method, timeout, get_hedge_delay(args, link)
+            )
+            LATENCIES.append(
+                (get_host(link), time.perf_counter() - start_time)
+            )
+        if request.response is None:
+            response = exception_handler(request, request.exception)
+        else:
+            response = request.response.status_code
+            # Explicitly close responses to release their connections back
+            # to the session's pool and avoid Connection Errors per:
+            # https://stackoverflow.com/a/22839550
+            request.response.close()
+        record_host_response(link, response, duration)
+        attempt += 1
+        if not is_retryable(link, response, attempt):
+            check_fail_fast(args, link, response, method)
+            return response
+        gevent.sleep(get_retry_delay(link, attempt))
+
+
+def get_grequests_request(session, link, method, timeout):
+    """Returns an unsent grequests request
+
+    Args:
+        method (str): "head" or "get" (ranged GET request)
+        timeout (float): Timeout in seconds (see get_host_timeout)
+
+    Returns:
+        class 'grequests.AsyncRequest': request
+    """
+    if method == "get":
+        # Only the headers are read before the connection is closed
+        return grequests.get(
+            link,
+            headers=RANGE_HEADER,
+            allow_redirects=False,
+            stream=True,
+            timeout=timeout,
+            session=session,
+        )
+    # Since we're only checking for validity, we can retreive only the
+    # headers/metadata
+    return grequests.head(link, timeout=timeout, session=session)
+
+
+def send_grequests(session, link, method, timeout, hedge_delay):
+    """Sends a request and, if it is still in flight after hedge_delay
+    seconds, a duplicate (hedged) request
+
+    The hedged request is sent in the slots (see host_slot) of the first
+    request, so that it is not held back by the request it duplicates. The
+    first response wins, unless the other request fails: a response is
+    preferred to an exception (e.g. a fast Connection Error).
+
+    Returns:
+        tuple: the request that won and its duration in seconds
+    """
+    start_time = time.perf_counter()
+    request = get_grequests_request(session, link, method, timeout)
+    if hedge_delay is None:
+        request.send()
+        return request, time.perf_counter() - start_time
+    primary = gevent.spawn(request.send)
+    primary.join(hedge_delay)
+    if primary.ready():
+        return request, time.perf_counter() - start_time
+    hedge_start_time = time.perf_counter()
+    hedge_request = get_grequests_request(session, link, method, timeout)
+    hedge = gevent.spawn(hedge_request.send)
+    requests = {primary: request, hedge: hedge_request}
+    winner = gevent.wait([primary, hedge], count=1)[0]
+    loser = hedge if winner is primary else primary
+    if requests[winner].response is None:
+        loser.join()
+        if requests[loser].response is not None:
+            winner, loser = loser, winner
+    duration = time.perf_counter() - (
+        start_time if winner is primary else hedge_start_time
+    )
+    loser.kill()
+    if requests[loser].response is not None:
+        # Release the connection of the losing request
+        requests[loser].response.close()
+    record_hedged_request(winner is hedge)
+    return requests[winner], duration
+
+
+def get_link_responses_async(args, links, method="head"):
+    """Checks links with asyncio and httpx (async and http2 engines)
+
+    Args:
+        links (list): List of links to be checked
+        method (str): "head" or "get" (ranged GET request)
+
+    Returns:
+        list: Response status code/exception of all the links in links
+    """
+    if httpx is None:
+        raise CheckerError(
+            "The async engine requires httpx (pip install httpx)", 1
+        )
+    if args.engine == "http2" and h2 is None:
+        raise CheckerError(
+            "The http2 engine requires httpx with HTTP/2 support (pip install"
+            " httpx[http2])",
+            1,
+        )
+    return asyncio.run(check_links_async(args, links, method))
+
+
+async def check_links_async(args, links, method="head"):
+    """Coroutine checking links with at most --max-concurrency requests in
+    flight at once
+    """
+    # asyncio resolves host names in its default executor
+    asyncio.get_running_loop().set_default_executor(NativeThreadPoolExecutor())
+    semaphore = asyncio.Semaphore(args.max_concurrency)
+    host_semaphores = {}
+    limits = httpx.Limits(max_connections=args.max_concurrency)
+    async with httpx.AsyncClient(
+        limits=limits,
+        timeout=REQUESTS_TIMEOUT,
+        http2=args.engine == "http2",
+    ) as client:
+        return await asyncio.gather(
+            *(
+                check_link_async(
+                    args, client, semaphore, host_semaphores, link, method
+                )
+                for link in links
+            )
+        )
+
+
+async def check_link_async(
+    args, client, semaphore, host_semaphores, link, method="head"
+):
+    """Coroutine checking a link with httpx, retrying transient failures (see
+    is_retryable)
+
+    Returns:
+        int or str: Response status code/exception of the link
+    """
+    attempt = 0
+    while True:
+        timeout = args.timeout or get_host_timeout(link, attempt)
+        duration = None
+        async with async_host_slot(link, host_semaphores), semaphore:
+            if is_stopped():
+                return NOT_CHECKED
+            if not is_host_available(link):
+                return HOST_UNAVAILABLE
+            start_time = time.perf_counter()
+            try:
+                response, duration = await send_async(
+                    client, link, method, timeout, get_hedge_delay(args, link)
+                )
+                HTTP_VERSIONS[get_host(link), response.http_version] += 1
+                response = response.status_code
+            except Exception as exception:
+                response = async_exception_handler(exception)
+            LATENCIES.append(
+                (get_host(link), time.perf_counter() - start_time)
+            )
+        record_host_response(link, response, duration)
+        attempt += 1
+        if not is_retryable(link, response, attempt):
+            check_fail_fast(args, link, response, method)
+            return response
+        await asyncio.sleep(get_retry_delay(link, attempt))
+
+
+async def request_async(client, link, method, timeout):
+    """Coroutine sending a request with httpx
+
+    Returns:
+        tuple: response and its duration in seconds
+    """
+    start_time = time.perf_counter()
+    if method == "get":
+        # Only the headers are read before the connection is closed
+        async with client.stream(
+            "GET", link, headers=RANGE_HEADER, timeout=timeout
+        ) as response:
+            pass
+    else:
+        # Since we're only checking for validity, we can retreive only the
+        # headers/metadata
+        response = await client.head(link, timeout=timeout)
+    return response, time.perf_counter() - start_time
+
+
+async def send_async(client, link, method, timeout, hedge_delay):
+    """Coroutine sending a request and, if it is still in flight after
+    hedge_delay seconds, a duplicate (hedged) request (see send_grequests)
+
+    Returns:
+        tuple: response that won and its duration in seconds
+    """
+    if hedge_delay is None:
+        return await request_async(client, link, method, timeout)
+    primary = asyncio.ensure_future(
+        request_async(client, link, method, timeout)
+    )
+    done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+    if done:
+        return primary.result()
+    hedge = asyncio.ensure_future(request_async(client, link, method, timeout))
+    done, _ = await asyncio.wait(
+        {primary, hedge}, return_when=asyncio.FIRST_COMPLETED
+    )
+    winner = primary if primary in done else hedge
+    loser = hedge if winner is primary else primary
+    if winner.exception() is not None:
+        await asyncio.wait({loser})
+        if loser.exception() is None:
+            winner, loser = loser, winner
+    if loser.done():
+        # Retrieve the exception of the loser (if any)
+        loser.exception()
+    else:
+        loser.cancel()
+        # Wait for the cancelled request to release its connection
+        await asyncio.wait({loser})
+    record_hedged_request(winner is hedge)
+    return winner.result()
+
+
+def output_http_versions(args):
+    """Prints the number of responses and hosts per HTTP version (httpx
+    engines)
+    """
+    if args.log_level > INFO or not HTTP_VERSIONS:
+        return
+    responses = collections.Counter()
+    hosts = collections.defaultdict(set)
+    for (host, version), count in HTTP_VERSIONS.items():
+        responses[version] += count
+        hosts[version].add(host)
+    print(
+        "\nHTTP versions:",
+        ", ".join(
+            f"{version} ({responses[version]} responses from"
+            f" {len(hosts[version])} hosts)"
+            for version in sorted(responses)
+        ),
+    )
+
+
+def async_exception_handler(exception):
+    """Handles httpx exceptions the same way exception_handler handles
+    requests exceptions
+
+    Args:
+        exception (class 'httpx.HTTPError'): Exception occured
+
+    Returns:
+        str: Exception occured in string format
+    """
+    if isinstance(
+        exception,
+        (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError),
+    ):
+        return "Connection Error"
+    elif isinstance(exception, httpx.UnsupportedProtocol):
+        return "Invalid Schema"
+    else:
+        return type(exception).__name__
+
+
+class NativeThreadPoolExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor whose work queue is not monkey patched by gevent
+
+    grequests monkey patches queue.SimpleQueue and gevent queues cannot be
+    waited on by the idle worker threads of a regular ThreadPoolExecutor.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._work_queue = monkey.get_original("queue", "SimpleQueue")()
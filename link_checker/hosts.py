@@ -0,0 +1,465 @@
+"""Per-host link checking configuration
+
+Options can be set per host in an INI file (--host-config). Each section is
+named after a host and applies to that host and its subdomains. Options that
+are not set for a host fall back to the [DEFAULT] section and then to
+HOST_DEFAULTS. For example:
+
+    [DEFAULT]
+    head_fallback = 403, 405, 501
+
+    [example.com]
+    # never retry HEAD requests to example.com with GET requests
+    head_fallback =
+    retries = 5
+    # at most 2 requests per second and 4 connections at once
+    rate_limit = 2
+    max_connections = 4
+    # slow but working host
+    timeout_max = 30
+
+The state of each host (consecutive failures, rate limit, latencies) is kept
+for the whole run. Rate limits and connection caps apply to each host name
+(e.g. to en.wikipedia.org and fr.wikipedia.org separately) and to both link
+checks and page fetches. Requests waiting for their host do not hold any of the
+--max-concurrency slots, so other hosts are still checked meanwhile.
+
+The timeout of a request is derived from the latencies of the previous
+requests to its host (TIMEOUT_FACTOR times their 95th percentile, within the
+timeout_min and timeout_max host options), so that a slow host does not
+delay the check for long, while retries get the full timeout_max. With
+--hedge, a duplicate request is sent once a request has been in flight for
+longer than the 95th percentile of its host (in the same host and
+--max-concurrency slots), and the first response wins.
+"""
+
+# Standard library
+import asyncio
+import collections
+import configparser
+import contextlib
+import random
+import time
+from urllib.parse import urlsplit
+
+# Third-party
+import gevent
+from gevent.lock import BoundedSemaphore
+
+# Local
+from .constants import INFO, REQUESTS_TIMEOUT, RETRY_ERRORS
+from .utils import CheckerError
+
+HOST_DEFAULTS = {
+    # Status codes of HEAD requests that are retried with a ranged GET
+    # request (servers that do not support HEAD)
+    "head_fallback": "403, 405, 501",
+    # Number of times the retry_statuses are retried
+    "retries": "2",
+    # Number of times connection errors and timeouts (RETRY_ERRORS) are
+    # retried (with the timeout_max timeout, so that the links of a dead
+    # host do not take long until the breaker trips)
+    "error_retries": "1",
+    # Status codes that are retried
+    "retry_statuses": "429, 502, 503, 504",
+    # Delay (in seconds) before the first retry, doubled for every retry
+    "retry_backoff": "0.5",
+    # Number of consecutive failures after which the remaining links of a
+    # host are not requested anymore (0 to never stop requesting)
+    "breaker_threshold": "10",
+    # Maximum number of requests per second (token bucket refilled at this
+    # rate, 0 for no limit)
+    "rate_limit": "0",
+    # Number of requests that can be sent at once after the host was idle
+    # (size of the token bucket)
+    "rate_burst": "1",
+    # Maximum number of requests in flight at once (0 for no limit other
+    # than --max-concurrency)
+    "max_connections": "0",
+    # Bounds (in seconds) of the request timeout derived from the latencies
+    # of the host
+    "timeout_min": "1",
+    "timeout_max": "15",
+}
+# Latency percentile used for the timeouts and hedged requests
+LATENCY_PERCENTILE = 95
+# Timeout of a request relative to the latency percentile of its host
+TIMEOUT_FACTOR = 4
+# Number of latencies kept per host (the most recent ones)
+LATENCY_WINDOW = 200
+# Number of latencies needed before they are used (REQUESTS_TIMEOUT is used
+# until then)
+LATENCY_MIN_SAMPLES = 10
+HOST_CONFIG = configparser.ConfigParser(defaults=HOST_DEFAULTS)
+# Consecutive failures per host
+HOST_FAILURES = {}
+# Rate limit and connection cap per host (see get_host_limiter)
+HOST_LIMITERS = {}
+# Latencies (in seconds) of the recent responses per host
+HOST_LATENCIES = {}
+HOST_STATISTICS = {
+    "retries": 0,
+    "throttled": 0,
+    "throttle_time": 0.0,
+    "hedged": 0,
+    "hedge_wins": 0,
+}
+
+
+def load_host_config(path):
+    """Loads the per-host configuration file
+
+    Args:
+        path (str): Path to the INI file (or None to use the defaults)
+    """
+    global HOST_CONFIG
+    HOST_CONFIG = configparser.ConfigParser(defaults=HOST_DEFAULTS)
+    HOST_FAILURES.clear()
+    HOST_LIMITERS.clear()
+    HOST_LATENCIES.clear()
+    HOST_STATISTICS["retries"] = 0
+    HOST_STATISTICS["throttled"] = 0
+    HOST_STATISTICS["throttle_time"] = 0.0
+    HOST_STATISTICS["hedged"] = 0
+    HOST_STATISTICS["hedge_wins"] = 0
+    if not path:
+        return
+    try:
+        with open(path) as host_config:
+            HOST_CONFIG.read_file(host_config)
+    except FileNotFoundError:
+        raise CheckerError(f"Host config path({path}) does not exist")
+    except configparser.Error as e:
+        raise CheckerError(f"Invalid host config ({path}): {e}")
+
+
+def get_host(link):
+    """Returns the lowercase host name of a link (empty if it has none)"""
+    try:
+        return (urlsplit(link).hostname or "").lower()
+    except ValueError:
+        return ""
+
+
+def get_host_option(link, option):
+    """Get a configuration option for the host of a link
+
+    The section of the host itself is used first, then those of its parent
+    domains and finally the defaults.
+
+    Args:
+        link (str): Link whose host is looked up
+        option (str): Name of the option
+
+    Returns:
+        str: value of the option
+    """
+    section = get_host_section(get_host(link))
+    if section:
+        return HOST_CONFIG.get(section, option)
+    return HOST_CONFIG.defaults()[option]
+
+
+def get_host_section(host):
+    """Get the configuration section of a host: its own or that of its
+    closest parent domain
+
+    Returns:
+        str: name of the section (None if the host has no section)
+    """
+    labels = host.split(".")
+    for idx in range(len(labels)):
+        section = ".".join(labels[idx:])
+        if HOST_CONFIG.has_section(section):
+            return section
+    return None
+
+
+def get_host_statuses(link, option):
+    """Get a configuration option holding a list of status codes
+
+    Returns:
+        list: status codes
+    """
+    value = get_host_option(link, option)
+    try:
+        return [int(status) for status in value.split(",") if status.strip()]
+    except ValueError:
+        raise CheckerError(f"Invalid host config {option}: {value}")
+
+
+def get_host_number(link, option, type_=int):
+    """Get a numeric configuration option for the host of a link
+
+    Returns:
+        int or float: value of the option
+    """
+    value = get_host_option(link, option)
+    try:
+        return type_(value)
+    except ValueError:
+        raise CheckerError(f"Invalid host config {option}: {value}")
+
+
+def is_failure(link, response):
+    """Whether a link status is a transient failure (an exception in
+    RETRY_ERRORS or a status code in the retry_statuses host option)
+    """
+    return response in RETRY_ERRORS or response in get_host_statuses(
+        link, "retry_statuses"
+    )
+
+
+def is_retryable(link, response, attempt):
+    """Whether a link should be requested again after the given number of
+    attempts
+    """
+    if not is_failure(link, response):
+        return False
+    if response in RETRY_ERRORS:
+        retries = get_host_number(link, "error_retries")
+    else:
+        retries = get_host_number(link, "retries")
+    if attempt > retries:
+        return False
+    HOST_STATISTICS["retries"] += 1
+    return True
+
+
+def get_retry_delay(link, attempt):
+    """Get the delay before retrying a link (exponential backoff with jitter)
+
+    Returns:
+        float: delay in seconds
+    """
+    backoff = get_host_number(link, "retry_backoff", float)
+    return backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+
+
+def record_host_response(link, response, duration=None):
+    """Records the result of a request to the host of a link (see
+    is_host_available and get_host_percentile)
+
+    Args:
+        link (str): Link requested
+        response (int or str): Response status code/exception of the link
+        duration (float): Duration of the request in seconds (only recorded
+            for responses, as the duration of timeouts and connection errors
+            is not the latency of the host)
+    """
+    host = get_host(link)
+    if is_failure(link, response):
+        HOST_FAILURES[host] = HOST_FAILURES.get(host, 0) + 1
+    else:
+        HOST_FAILURES[host] = 0
+    if duration is not None and isinstance(response, int):
+        latencies = HOST_LATENCIES.get(host)
+        if latencies is None:
+            latencies = collections.deque(maxlen=LATENCY_WINDOW)
+            HOST_LATENCIES[host] = latencies
+        latencies.append(duration)
+
+
+def get_host_percentile(link, percentile=LATENCY_PERCENTILE):
+    """Get a percentile of the recent latencies of the host of a link
+
+    Returns:
+        float: latency in seconds (None until LATENCY_MIN_SAMPLES responses
+               were recorded)
+    """
+    latencies = HOST_LATENCIES.get(get_host(link))
+    if latencies is None or len(latencies) < LATENCY_MIN_SAMPLES:
+        return None
+    latencies = sorted(latencies)
+    return latencies[
+        min(len(latencies) * percentile // 100, len(latencies) - 1)
+    ]
+
+
+def get_host_timeout(link, attempt=0):
+    """Get the timeout of a request to the host of a link
+
+    Args:
+        link (str): Link to be requested
+        attempt (int): Number of previous attempts (retries get the
+            timeout_max host option)
+
+    Returns:
+        float: timeout in seconds
+    """
+    timeout_min = get_host_number(link, "timeout_min", float)
+    timeout_max = get_host_number(link, "timeout_max", float)
+    if attempt:
+        return timeout_max
+    latency = get_host_percentile(link)
+    if latency is None:
+        timeout = REQUESTS_TIMEOUT
+    else:
+        timeout = latency * TIMEOUT_FACTOR
+    return min(max(timeout, timeout_min), timeout_max)
+
+
+def record_hedged_request(won):
+    """Records a hedged request (see get_hedge_delay)
+
+    Args:
+        won (bool): Whether the hedged request responded first
+    """
+    HOST_STATISTICS["hedged"] += 1
+    if won:
+        HOST_STATISTICS["hedge_wins"] += 1
+
+
+def get_hedge_delay(args, link):
+    """Get the delay after which a hedged request is sent (--hedge)
+
+    Returns:
+        float: delay in seconds (None if no hedged request is sent)
+    """
+    if not args.hedge:
+        return None
+    return get_host_percentile(link)
+
+
+def reset_host_failures():
+    """Forgets the consecutive failures of all hosts (see
+    is_host_available)
+    """
+    HOST_FAILURES.clear()
+
+
+def is_host_available(link):
+    """Whether the host of a link has failed less than breaker_threshold
+    times in a row
+    """
+    threshold = get_host_number(link, "breaker_threshold")
+    return not threshold or HOST_FAILURES.get(get_host(link), 0) < threshold
+
+
+class HostLimiter:
+    """Token bucket (rate_limit and rate_burst host options) and connection
+    cap (max_connections host option) of a host
+    """
+
+    def __init__(self, rate, burst, max_connections):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.max_connections = max_connections
+        self.semaphore = (
+            BoundedSemaphore(max_connections) if max_connections else None
+        )
+
+    def reserve(self):
+        """Takes a token from the bucket
+
+        Tokens are reserved in advance: once the bucket is empty, each
+        request waits for the token after that of the previous request.
+
+        Returns:
+            float: delay (in seconds) before the request can be sent
+        """
+        if not self.rate:
+            return 0
+        now = time.monotonic()
+        self.tokens = min(
+            self.burst, self.tokens + (now - self.updated) * self.rate
+        )
+        self.updated = now
+        self.tokens -= 1
+        delay = -self.tokens / self.rate if self.tokens < 0 else 0
+        if delay:
+            HOST_STATISTICS["throttled"] += 1
+            HOST_STATISTICS["throttle_time"] += delay
+        return delay
+
+
+def get_host_limiter(link):
+    """Get the rate limit and connection cap of the host of a link
+
+    Returns:
+        HostLimiter: limiter shared by all the links of the host
+    """
+    host = get_host(link)
+    limiter = HOST_LIMITERS.get(host)
+    if limiter is None:
+        limiter = HostLimiter(
+            get_host_number(link, "rate_limit", float),
+            get_host_number(link, "rate_burst", float),
+            get_host_number(link, "max_connections"),
+        )
+        HOST_LIMITERS[host] = limiter
+    return limiter
+
+
+@contextlib.contextmanager
+def host_slot(link):
+    """Context manager waiting (in a greenlet) until a request can be sent to
+    the host of a link without exceeding its connection cap and rate limit
+    """
+    limiter = get_host_limiter(link)
+    if limiter.semaphore is not None:
+        limiter.semaphore.acquire()
+    try:
+        delay = limiter.reserve()
+        if delay:
+            gevent.sleep(delay)
+        yield
+    finally:
+        if limiter.semaphore is not None:
+            limiter.semaphore.release()
+
+
+@contextlib.asynccontextmanager
+async def async_host_slot(link, semaphores):
+    """Asynchronous version of host_slot
+
+    Args:
+        link (str): Link to be requested
+        semaphores (dict): asyncio semaphores of the hosts (asyncio
+            semaphores cannot be shared between event loops)
+    """
+    limiter = get_host_limiter(link)
+    semaphore = None
+    if limiter.max_connections:
+        host = get_host(link)
+        semaphore = semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(limiter.max_connections)
+            semaphores[host] = semaphore
+        await semaphore.acquire()
+    try:
+        delay = limiter.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+        yield
+    finally:
+        if semaphore is not None:
+            semaphore.release()
+
+
+def output_host_statistics(args):
+    """Prints the number of retries and the unavailable hosts"""
+    if args.log_level > INFO:
+        return
+    if HOST_STATISTICS["retries"]:
+        print(f"\nRetried requests: {HOST_STATISTICS['retries']}")
+    if HOST_STATISTICS["hedged"]:
+        print(
+            f"\nHedged requests: {HOST_STATISTICS['hedged']}"
+            f" ({HOST_STATISTICS['hedge_wins']} responded first)"
+        )
+    if HOST_STATISTICS["throttled"]:
+        print(
+            f"\nRate limited requests: {HOST_STATISTICS['throttled']}"
+            f" (waited {HOST_STATISTICS['throttle_time']:.2f} seconds in"
+            " total)"
+        )
+    unavailable_hosts = sorted(
+        host
+        for host in HOST_FAILURES
+        if not is_host_available(f"http://{host}/")
+    )
+    if unavailable_hosts:
+        print("\nUnavailable hosts:", ", ".join(unavailable_hosts))
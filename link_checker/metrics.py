@@ -0,0 +1,315 @@
+"""Prometheus metrics (--metrics)
+
+At the end of a run, its metrics are written in the Prometheus text format,
+for example to the directory read by the node exporter's textfile collector:
+
+    link_checker legalcode --metrics /var/lib/node_exporter/link_checker.prom
+
+Every series is labeled with the subcommand, so that the metrics of several
+scheduled subcommands can be exported side by side (in separate files). The
+counters cover a single run (they start from zero in every run).
+"""
+
+# Standard library
+import os
+import time
+
+# Local
+from . import cache, engines, hosts, profiling, scheduling, utils
+
+# Upper bounds (in seconds) of the request duration histogram buckets
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+# Number of hosts (with the most requests) labeled in the request duration
+# histogram besides those of the --host-config sections, the other hosts are
+# labeled "other" (see get_latency_host)
+LATENCY_TOP_HOSTS = 10
+# Links found in the pages, unique links (before and after normalization),
+# unique links to be requested (not memoized or cached), and unique links
+# that were not requested (see link_checker.scheduling)
+LINK_STATISTICS = {
+    "links": 0,
+    "unique_hrefs": 0,
+    "unique_links": 0,
+    "checked_links": 0,
+    "unchecked_links": 0,
+}
+
+
+def get_metrics(args, errors_total):
+    """Returns the metrics of the run in the Prometheus text format
+
+    Args:
+        errors_total (int): Number of broken links found in all pages
+
+    Returns:
+        str: metrics (one sample per line)
+    """
+    labels = {"subcommand": args.subcommand}
+    lines = []
+
+    def add_metric(name, metric_type, help_text, samples):
+        lines.append(f"# HELP link_checker_{name} {help_text}")
+        lines.append(f"# TYPE link_checker_{name} {metric_type}")
+        for suffix, sample_labels, value in samples:
+            sample_labels = format_labels({**labels, **sample_labels})
+            lines.append(f"link_checker_{name}{suffix}{sample_labels} {value}")
+
+    add_metric(
+        "last_run_timestamp_seconds",
+        "gauge",
+        "Time the run ended (in seconds since the epoch)",
+        [("", {}, f"{time.time():.3f}")],
+    )
+    add_metric(
+        "links_found_total",
+        "counter",
+        "Links found in all pages",
+        [("", {}, LINK_STATISTICS["links"])],
+    )
+    add_metric(
+        "unique_hrefs_total",
+        "counter",
+        "Unique links found in all pages (before normalization)",
+        [("", {}, LINK_STATISTICS["unique_hrefs"])],
+    )
+    add_metric(
+        "unique_links_total",
+        "counter",
+        "Unique normalized links found in all pages",
+        [("", {}, LINK_STATISTICS["unique_links"])],
+    )
+    add_metric(
+        "links_checked_total",
+        "counter",
+        "Unique links requested (not memoized or cached)",
+        [("", {}, LINK_STATISTICS["checked_links"])],
+    )
+    add_metric(
+        "links_not_checked_total",
+        "counter",
+        "Unique links that were not requested (see --fail-fast and"
+        " --max-duration)",
+        [("", {}, LINK_STATISTICS["unchecked_links"])],
+    )
+    add_metric(
+        "pages_not_checked_total",
+        "counter",
+        "Pages that were not fetched or parsed (see --fail-fast and"
+        " --max-duration)",
+        [("", {}, scheduling.UNCHECKED_PAGES)],
+    )
+    add_metric(
+        "requests_total",
+        "counter",
+        "Requests sent (including retries and GET fallbacks)",
+        [("", {}, len(engines.LATENCIES))],
+    )
+    add_metric(
+        "retries_total",
+        "counter",
+        "Requests retried after a transient failure",
+        [("", {}, hosts.HOST_STATISTICS["retries"])],
+    )
+    add_metric(
+        "hedged_requests_total",
+        "counter",
+        "Hedged requests sent (see --hedge)",
+        [("", {}, hosts.HOST_STATISTICS["hedged"])],
+    )
+    hits = cache.CACHE_STATISTICS["hits"]
+    add_metric(
+        "cache_lookups_total",
+        "counter",
+        "Link status cache lookups",
+        [("", {}, hits + cache.CACHE_STATISTICS["misses"])],
+    )
+    add_metric(
+        "cache_hits_total",
+        "counter",
+        "Link status cache lookups that hit",
+        [("", {}, hits)],
+    )
+    add_metric(
+        "errors_total",
+        "counter",
+        "Broken links found in all pages (a link is counted once per page)",
+        [("", {}, errors_total)],
+    )
+    add_metric(
+        "broken_links",
+        "gauge",
+        "Unique broken links by status class (error for connection errors,"
+        " timeouts, etc.)",
+        [
+            ("", {"status_class": status_class}, count)
+            for status_class, count in get_broken_links().items()
+        ],
+    )
+    recovered, confirmed = utils.get_rechecked_links()
+    add_metric(
+        "rechecked_links",
+        "gauge",
+        "Unique links re-checked after a transient failure by result"
+        " (recovered or confirmed broken)",
+        [
+            ("", {"result": "recovered"}, len(recovered)),
+            ("", {"result": "confirmed"}, len(confirmed)),
+        ],
+    )
+    add_metric(
+        "request_duration_seconds",
+        "histogram",
+        "Duration of the requests by host",
+        get_latency_samples(),
+    )
+    if profiling.PROFILE is not None:
+        report = profiling.get_profile_report()
+        add_metric(
+            "phase_duration_seconds",
+            "gauge",
+            "Time spent in each phase of the run by check (see --profile)",
+            [
+                (
+                    "",
+                    {"check": check, "phase": name},
+                    f"{timing['seconds']:.6f}",
+                )
+                for check, timings in report["checks"].items()
+                for name, timing in timings.items()
+            ],
+        )
+        add_metric(
+            "run_duration_seconds",
+            "gauge",
+            "Duration of the run",
+            [("", {}, f"{report['duration']:.6f}")],
+        )
+    return "\n".join(lines) + "\n"
+
+
+def get_coverage(stop_reason=None):
+    """Returns the coverage of the run (see link_checker.scheduling)
+
+    Args:
+        stop_reason (str): Why links were not checked
+
+    Returns:
+        dict: number of unique links (links), number of them that were not
+              checked (unchecked), number of pages that were not fetched or
+              parsed (unchecked_pages), and stop_reason (None if there are
+              neither links nor unchecked pages)
+    """
+    if not LINK_STATISTICS["unique_links"] and not scheduling.UNCHECKED_PAGES:
+        return None
+    return {
+        "links": LINK_STATISTICS["unique_links"],
+        "unchecked": LINK_STATISTICS["unchecked_links"],
+        "unchecked_pages": scheduling.UNCHECKED_PAGES,
+        "stop_reason": stop_reason,
+    }
+
+
+def get_broken_links():
+    """Counts the unique broken links by status class
+
+    Returns:
+        dict: number of broken links per status class ("4xx", "5xx", etc. or
+              "error"), sorted by class
+    """
+    counts = {}
+    for link in utils.MAP_BROKEN_LINKS:
+        status = utils.MEMOIZED_LINKS.get(link)
+        status = getattr(status, "status_code", status)
+        if isinstance(status, int):
+            status_class = f"{status // 100}xx"
+        else:
+            status_class = "error"
+        counts[status_class] = counts.get(status_class, 0) + 1
+    return dict(sorted(counts.items()))
+
+
+def get_latency_samples():
+    """Returns the samples of the request duration histogram (see
+    engines.LATENCIES)
+
+    The number of host labels is bounded (see get_latency_host), so that
+    the number of series does not grow with the external hosts linked to.
+
+    Returns:
+        list: suffix, labels, and value of each sample
+    """
+    requests = {}
+    for host, _ in engines.LATENCIES:
+        requests[host] = requests.get(host, 0) + 1
+    unconfigured = [
+        host for host in requests if not hosts.get_host_section(host)
+    ]
+    ranked = sorted(unconfigured, key=lambda host: (-requests[host], host))
+    top_hosts = set(ranked[:LATENCY_TOP_HOSTS])
+    latencies = {}
+    for host, seconds in engines.LATENCIES:
+        label = get_latency_host(host, top_hosts)
+        latencies.setdefault(label, []).append(seconds)
+    samples = []
+    for host, seconds in sorted(latencies.items()):
+        for bucket in LATENCY_BUCKETS:
+            count = sum(1 for duration in seconds if duration <= bucket)
+            samples.append(
+                ("_bucket", {"host": host, "le": str(bucket)}, count)
+            )
+        samples.append(("_bucket", {"host": host, "le": "+Inf"}, len(seconds)))
+        samples.append(("_sum", {"host": host}, f"{sum(seconds):.6f}"))
+        samples.append(("_count", {"host": host}, len(seconds)))
+    return samples
+
+
+def get_latency_host(host, top_hosts):
+    """Get the host label of a request duration
+
+    Args:
+        host (str): Host the request was sent to
+        top_hosts (set): Hosts with the most requests (without a
+            --host-config section)
+
+    Returns:
+        str: the --host-config section of the host, the host if it is one of
+             top_hosts, or "other"
+    """
+    section = hosts.get_host_section(host)
+    if section:
+        return section
+    if host in top_hosts:
+        return host
+    return "other"
+
+
+def format_labels(labels):
+    """Formats the labels of a sample ({name="value",...})"""
+    labels = ",".join(
+        f'{name}="{escape_label_value(value)}"'
+        for name, value in labels.items()
+    )
+    return f"{{{labels}}}"
+
+
+def escape_label_value(value):
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+    )
+
+
+def output_metrics(args, errors_total):
+    """Writes the metrics of the run to the --metrics file
+
+    The file is replaced atomically, so that a collector never reads a
+    partial file.
+    """
+    if "metrics" not in args or not args.metrics:
+        return
+    temp_path = f"{args.metrics}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as metrics_file:
+        metrics_file.write(get_metrics(args, errors_total))
+    os.replace(temp_path, args.metrics)
@@ -0,0 +1,196 @@
+"""Per-phase timing and profiling (--profile and --profile-cpu)
+
+The time spent in each phase of a run is aggregated per check (legalcode,
+deeds, rdf, index, or combined for the phases shared by all the checks of the
+combined subcommand) and per license:
+
+- discovery: listing the license files
+- fetch: downloading or reading the pages
+- parse: scraping the links of the pages
+- cache: looking up and storing link statuses
+- check: checking the links (network requests)
+- report: writing the results
+
+Phases can be nested (a page is fetched while it is being parsed); the time
+of a phase excludes that of the phases nested in it. Times are measured per
+greenlet, so the phases of checks running concurrently overlap.
+
+With --profile-cpu, the CPU-bound phases (parse, cache, and report) are also
+profiled with cProfile. The phase durations are also exported by --metrics.
+"""
+
+# Standard library
+import contextlib
+import cProfile
+import json
+import time
+
+# Third-party
+from gevent.local import local
+
+# Local
+from .constants import INFO
+
+PHASES = ["discovery", "fetch", "parse", "cache", "check", "report"]
+CPU_PHASES = ["parse", "cache", "report"]
+PROFILE = None
+CPU_PROFILER = None
+
+
+class ProfileContext(local):
+    """Check and phases in progress in the current greenlet"""
+
+    def __init__(self):
+        self.check = None
+        self.stack = []
+
+
+CONTEXT = ProfileContext()
+
+
+def start_profile(args):
+    """Starts recording phase timings if --profile, --profile-cpu, or
+    --metrics (phase durations) is set
+    """
+    global CPU_PROFILER, PROFILE
+    PROFILE = None
+    CPU_PROFILER = None
+    if "profile" not in args or not (
+        args.profile or args.profile_cpu or args.metrics
+    ):
+        return
+    PROFILE = {
+        "subcommand": args.subcommand,
+        "start_time": time.perf_counter(),
+        "checks": {},
+        "licenses": {},
+    }
+    CONTEXT.check = args.subcommand
+    if args.profile_cpu:
+        CPU_PROFILER = cProfile.Profile()
+
+
+def set_profile_check(check):
+    """Sets the check to which the phases of the current greenlet belong"""
+    CONTEXT.check = check
+
+
+@contextlib.contextmanager
+def phase(name, license_name=None):
+    """Context manager timing a phase of the run
+
+    Args:
+        name (str): Name of the phase (see PHASES)
+        license_name (str): License the phase is about (if any)
+    """
+    if PROFILE is None:
+        yield
+        return
+    stack = CONTEXT.stack
+    # name, license, start time, time spent in nested phases
+    frame = [name, license_name, time.perf_counter(), 0.0]
+    stack.append(frame)
+    update_cpu_profiler()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - frame[2]
+        stack.pop()
+        if stack:
+            stack[-1][3] += elapsed
+        record_phase(CONTEXT.check, name, license_name, elapsed - frame[3])
+        update_cpu_profiler()
+
+
+def profile_iter(iterable, name, license_names=None):
+    """Times each item of an iterator as a phase
+
+    Args:
+        iterable (iterable): Items to time (e.g. pages being fetched)
+        name (str): Name of the phase (see PHASES)
+        license_names (iterable): License of each item
+
+    Returns:
+        iterator: items of iterable (closing it closes iterable)
+    """
+    iterator = iter(iterable)
+    license_names = iter(license_names or [])
+    try:
+        while True:
+            with phase(name, next(license_names, None)):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+    finally:
+        if hasattr(iterator, "close"):
+            iterator.close()
+
+
+def record_phase(check, name, license_name, seconds):
+    """Adds the duration of a phase to the profile"""
+    timing = (
+        PROFILE["checks"]
+        .setdefault(check, {})
+        .setdefault(name, {"seconds": 0.0, "count": 0})
+    )
+    timing["seconds"] += seconds
+    timing["count"] += 1
+    if license_name:
+        license_timings = PROFILE["licenses"].setdefault(license_name, {})
+        license_timings[name] = license_timings.get(name, 0.0) + seconds
+
+
+def update_cpu_profiler():
+    """Enables the CPU profiler only while a CPU-bound phase is running"""
+    if CPU_PROFILER is None:
+        return
+    stack = CONTEXT.stack
+    if stack and stack[-1][0] in CPU_PHASES:
+        CPU_PROFILER.enable()
+    else:
+        CPU_PROFILER.disable()
+
+
+def get_profile_report():
+    """Returns the profile of the run
+
+    Returns:
+        dict: subcommand, duration, phases (totals), checks (phase timings
+              per check), and licenses (phase timings per license)
+    """
+    phases = {}
+    for timings in PROFILE["checks"].values():
+        for name, timing in timings.items():
+            total = phases.setdefault(name, {"seconds": 0.0, "count": 0})
+            total["seconds"] += timing["seconds"]
+            total["count"] += timing["count"]
+    order = {name: idx for idx, name in enumerate(PHASES)}
+    return {
+        "subcommand": PROFILE["subcommand"],
+        "duration": time.perf_counter() - PROFILE["start_time"],
+        "phases": dict(sorted(phases.items(), key=lambda x: order[x[0]])),
+        "checks": PROFILE["checks"],
+        "licenses": PROFILE["licenses"],
+    }
+
+
+def output_profile(args):
+    """Writes the profile report (--profile) and the CPU profile
+    (--profile-cpu)
+    """
+    if PROFILE is None or not (args.profile or args.profile_cpu):
+        return
+    report = get_profile_report()
+    if args.profile:
+        json.dump(report, args.profile, indent=2)
+        args.profile.write("\n")
+        args.profile.close()
+    if CPU_PROFILER is not None:
+        CPU_PROFILER.disable()
+        CPU_PROFILER.dump_stats(args.profile_cpu)
+    if args.log_level <= INFO:
+        print(f"\nTime per phase (of {report['duration']:.2f} seconds):")
+        for name, timing in report["phases"].items():
+            print(f"  {name:<12}{timing['seconds']:>10.2f}")
@@ -0,0 +1,135 @@
+"""Streaming RDF parsing
+
+RDF documents (index.rdf is several megabytes) are parsed incrementally with
+lxml's iterparse. Only the rdf:about of each cc:License and its rdf:resource
+links are kept; every element is freed as soon as it has been read, so the
+memory used does not grow with the size of the document.
+"""
+
+# Standard library
+import io
+
+# Third-party
+from lxml import etree
+
+# Local
+from .anchors import Anchor, get_text, quote_attribute
+
+CC_NS = "http://creativecommons.org/ns#"
+RDF_NS = "http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+LICENSE_TAG = f"{{{CC_NS}}}License"
+ABOUT_ATTRIBUTE = f"{{{RDF_NS}}}about"
+RESOURCE_ATTRIBUTE = f"{{{RDF_NS}}}resource"
+
+
+class RdfLicense:
+    """cc:License object found in an RDF document
+
+    rdf_license["rdf:about"] returns the URL the object is about and links
+    holds an Anchor record for each element with an rdf:resource attribute.
+    """
+
+    __slots__ = ("about", "links")
+
+    def __init__(self, about, links):
+        self.about = about
+        self.links = links
+
+    def __getitem__(self, key):
+        if key != "rdf:about" or self.about is None:
+            raise KeyError(key)
+        return self.about
+
+    def __str__(self):
+        return f"<cc:License rdf:about={quote_attribute(self.about or '')}/>"
+
+    def __repr__(self):
+        return str(self)
+
+
+def iter_rdf_licenses(source, limit=0):
+    """Parses the cc:License objects of an RDF document one at a time
+
+    Args:
+        source (str, bytes or file): Path to the RDF document, its content or
+            a file object
+        limit (int): Maximum number of objects to parse (0 for all objects)
+
+    Returns:
+        iterator: RdfLicense records in document order
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    count = 0
+    context = etree.iterparse(
+        source, events=("end",), tag=LICENSE_TAG, recover=True
+    )
+    try:
+        for _, element in context:
+            links = [
+                Anchor(
+                    child.get(RESOURCE_ATTRIBUTE),
+                    None,
+                    None,
+                    serialize_rdf_element(child),
+                )
+                for child in element.iterdescendants()
+                if isinstance(child.tag, str)
+                and child.get(RESOURCE_ATTRIBUTE) is not None
+            ]
+            rdf_license = RdfLicense(element.get(ABOUT_ATTRIBUTE), links)
+            # Free the object and the elements (titles, etc.) preceding it
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+            yield rdf_license
+            count += 1
+            if count == limit:
+                return
+    except etree.XMLSyntaxError:
+        # Nothing (more) can be recovered from the document
+        return
+
+
+def serialize_rdf_element(element):
+    """Serializes an element and its descendants like BeautifulSoup's
+    str(tag) in XML documents (qualified names, attributes sorted by name)
+
+    Args:
+        element (class 'lxml.etree._Element'): Element to serialize
+
+    Returns:
+        str: serialized element (without its tail text)
+    """
+    if not isinstance(element.tag, str):
+        # Comments and processing instructions are not links
+        return ""
+    prefixes = {uri: prefix for prefix, uri in element.nsmap.items()}
+    name = get_qualified_name(element.tag, prefixes)
+    attributes = sorted(
+        (get_qualified_name(key, prefixes), value)
+        for key, value in element.attrib.items()
+    )
+    attributes = "".join(
+        f" {key}={quote_attribute(value)}" for key, value in attributes
+    )
+    if not len(element) and not element.text:
+        return f"<{name}{attributes}/>"
+    content = [get_text(element.text, False)]
+    for child in element:
+        content.append(serialize_rdf_element(child))
+        content.append(get_text(child.tail, False))
+    return f"<{name}{attributes}>{''.join(content)}</{name}>"
+
+
+def get_qualified_name(tag, prefixes):
+    """Replaces the namespace URI of a tag or attribute name
+    ("{uri}local") with its prefix ("prefix:local")
+    """
+    if not tag.startswith("{"):
+        return tag
+    uri, local = tag[1:].split("}", 1)
+    if uri == "http://www.w3.org/XML/1998/namespace":
+        return f"xml:{local}"
+    prefix = prefixes.get(uri)
+    return f"{prefix}:{local}" if prefix else local
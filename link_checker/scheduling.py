@@ -0,0 +1,206 @@
+"""Link check scheduling (--fail-fast, --max-duration and --prioritize-from)
+
+The links of a batch are checked in priority order (see prioritize_links), so
+that failures surface early:
+- links broken in the previous run (listed in the --prioritize-from error
+  file, or whose last status in the link status cache is an error)
+- links that were never checked before (new links)
+- the other links
+
+Within each priority, links found in the most pages are checked first, then
+the least recently checked links, so that a run stopped early covers as
+much as possible.
+
+With --fail-fast, no more links are requested once a link is confirmed
+broken (see check_fail_fast), and with --max-duration, once the time budget
+of the run is used. The links that were not requested get the NOT_CHECKED
+status: they are neither memoized nor reported, and the report states the
+coverage of the run instead. Once the checks are stopped, no more pages are
+fetched or parsed either (see iter_until_stopped), as their links would not
+be checked.
+"""
+
+# Standard library
+import functools
+import re
+import time
+
+# Local
+from .cache import get_link_history
+from .constants import (
+    GOOD_RESPONSE,
+    HOST_UNAVAILABLE,
+    INFO,
+    NOT_CHECKED,
+    START_TIME,
+)
+from .hosts import get_host_statuses, is_failure
+from .utils import CheckerError
+
+# Priorities of the links (lowest first)
+PRIORITY_BROKEN = 0
+PRIORITY_NEW = 1
+PRIORITY_KNOWN = 2
+# Broken links listed in an --output-errors file (see output_issues_summary)
+BROKEN_LINK_REGEX = re.compile(r"^Broken link - (\S+)(?: \(.*\))? found in:$")
+# Why no more links are requested (None while links are checked)
+STOP_REASON = None
+# Time (in seconds since the epoch) after which no more links are requested
+# (--max-duration)
+DEADLINE = None
+# Number of pages that were not fetched or parsed, as the checks were stopped
+UNCHECKED_PAGES = 0
+
+
+def start_schedule(args):
+    """Starts checking links (see is_stopped)
+
+    The --max-duration time budget starts with the run (START_TIME).
+    """
+    global STOP_REASON, DEADLINE, UNCHECKED_PAGES
+    STOP_REASON = None
+    DEADLINE = None
+    UNCHECKED_PAGES = 0
+    if "max_duration" in args and args.max_duration:
+        DEADLINE = START_TIME + args.max_duration
+
+
+def stop_checks(reason):
+    """Stops requesting links
+
+    Args:
+        reason (str): Why the remaining links are not checked
+    """
+    global STOP_REASON
+    if STOP_REASON is None:
+        STOP_REASON = reason
+
+
+def is_stopped():
+    """Whether no more links are requested (see stop_checks), stopping the
+    checks once the --max-duration time budget is used
+    """
+    if STOP_REASON is None and DEADLINE is not None:
+        if time.time() >= DEADLINE:
+            stop_checks("the time budget of the run was used (--max-duration)")
+    return STOP_REASON is not None
+
+
+def get_stop_reason():
+    """Returns why no more links are requested (None if they all were)"""
+    return STOP_REASON
+
+
+def iter_until_stopped(pages):
+    """Yields the pages to be fetched or parsed until the checks are stopped
+    (see is_stopped)
+
+    Args:
+        pages (list): Pages (e.g. their names or URLs), whose content is
+            fetched and parsed as they are yielded
+
+    Returns:
+        iterator: pages, up to the first one found once the checks were
+                  stopped (the remaining pages are counted in
+                  UNCHECKED_PAGES)
+    """
+    for idx, page in enumerate(pages):
+        if is_stopped():
+            record_unchecked_pages(len(pages) - idx)
+            return
+        yield page
+
+
+def record_unchecked_pages(count):
+    """Records pages that were not fetched or parsed (see UNCHECKED_PAGES)"""
+    global UNCHECKED_PAGES
+    UNCHECKED_PAGES += count
+
+
+def check_fail_fast(args, link, response, method="head"):
+    """Stops the checks once a link is confirmed broken (--fail-fast)
+
+    Responses that are checked again are not confirmed yet: HEAD responses
+    checked again with GET requests (head_fallback host option) and
+    transient failures re-checked at the end of the batch (unless
+    --no-recheck is set).
+    """
+    if not args.fail_fast or response in GOOD_RESPONSE:
+        return
+    if response == NOT_CHECKED:
+        return
+    if method == "head" and response in get_host_statuses(
+        link, "head_fallback"
+    ):
+        return
+    if args.recheck and (
+        response == HOST_UNAVAILABLE or is_failure(link, response)
+    ):
+        return
+    stop_checks(f"a broken link was found (--fail-fast): {link}")
+
+
+@functools.lru_cache(maxsize=None)
+def read_previous_errors(path):
+    """Reads the broken links of a previous --output-errors file
+
+    Args:
+        path (str): Path to the error file
+
+    Returns:
+        set: broken links
+    """
+    try:
+        with open(path, encoding="utf-8") as error_file:
+            return {
+                match.group(1)
+                for match in map(BROKEN_LINK_REGEX.match, error_file)
+                if match
+            }
+    except FileNotFoundError:
+        raise CheckerError(f"Previous error file({path}) does not exist")
+
+
+def prioritize_links(args, links, references=None):
+    """Orders links by priority and value (see the module docstring)
+
+    Args:
+        links (list): List of (normalized) links to be checked
+        references (list): Number of pages in which each link was found
+
+    Returns:
+        list: the links in the order in which they are checked
+    """
+    previous_errors = set()
+    if args.prioritize_from:
+        previous_errors = read_previous_errors(args.prioritize_from)
+    history = get_link_history(links)
+    if references is None:
+        references = [0] * len(links)
+
+    def get_priority(item):
+        link, pages = item
+        if link in previous_errors:
+            return PRIORITY_BROKEN, -pages, 0
+        if link not in history:
+            return PRIORITY_NEW, -pages, 0
+        status, checked = history[link]
+        if status not in GOOD_RESPONSE:
+            return PRIORITY_BROKEN, -pages, 0
+        return PRIORITY_KNOWN, -pages, checked
+
+    return [
+        link for link, _ in sorted(zip(links, references), key=get_priority)
+    ]
+
+
+def output_stop_reason(args, unchecked):
+    """Prints why links were not checked
+
+    Args:
+        unchecked (int): Number of links that were not checked
+    """
+    if args.log_level > INFO or not unchecked:
+        return
+    print(f"\nStopped checking links, as {STOP_REASON}")
+    print(f"Number of unique links not checked: {unchecked}")
@@ -0,0 +1,79 @@
+"""Sharded runs (--shard i/n)
+
+The license list (see get_legalcode) and the RDF objects of index.rdf (see
+get_index_rdf) are partitioned into n shards, which can be checked on
+separate nodes. The result of each shard is written to a JSON file and the
+results of all shards are combined by the merge subcommand.
+
+The shards have the same size (+/- 1 item). Licenses sharing most of their
+links (the jurisdiction ports and translations of a license version, e.g.
+by-sa_3.0_*) are kept on the same shard as much as possible, so that each
+link is checked by as few shards as possible. The partition only depends on
+the list being partitioned, so every node computes the same shards.
+"""
+
+# Standard library
+import argparse
+from urllib.parse import urlsplit
+
+
+def parse_shard(value):
+    """Parses a --shard value ("i/n", 1 <= i <= n)
+
+    Returns:
+        tuple: index (1 to count) and count of shards
+    """
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"invalid shard '{value}' (expected i/n, e.g. 1/4)"
+        )
+    if count < 1 or not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(
+            f"invalid shard '{value}' (i must be between 1 and n)"
+        )
+    return index, count
+
+
+def get_license_group(license_name):
+    """Returns the group of a license file (unit and version, e.g.
+    "by-sa_3.0" for "by-sa_3.0_de.html")
+    """
+    return "_".join(license_name[: -len(".html")].split("_")[:2])
+
+
+def get_rdf_group(rdf_obj):
+    """Returns the group of an index.rdf object (unit and version, e.g.
+    "by-sa_3.0" for http://creativecommons.org/licenses/by-sa/3.0/de/)
+    """
+    try:
+        about = rdf_obj["rdf:about"]
+    except KeyError:
+        return ""
+    return "_".join(urlsplit(about).path.strip("/").split("/")[1:3])
+
+
+def get_shard(items, groups, shard):
+    """Returns the items of a shard
+
+    The items are ordered by group and the i-th of n equal slices is
+    returned, so that each group is in a single shard, except for the groups
+    at the boundaries of the shards (at most n - 1 groups are split).
+
+    Args:
+        items (list): Items to partition
+        groups (list): Group of each item
+        shard (tuple): Index (1 to count) and count of shards
+
+    Returns:
+        list: items of the shard (in the order of items)
+    """
+    index, count = shard
+    order = sorted(range(len(items)), key=lambda position: groups[position])
+    start = (index - 1) * len(items) // count
+    end = index * len(items) // count
+    selected = set(order[start:end])
+    return [
+        item for position, item in enumerate(items) if position in selected
+    ]
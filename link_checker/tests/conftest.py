@@ -0,0 +1,78 @@
+# Standard library
+import multiprocessing
+import time
+
+# Third-party
+import grequests  # noqa: F401 (Always import grequests before requests)
+import pytest
+from gevent.pywsgi import WSGIServer
+
+FLAKY_REQUESTS = {}
+SLOW_REQUESTS = set()
+
+
+def status_app(environ, start_response):
+    """WSGI application responding like httpbin.org
+
+    - /status/<code> responds with the status code
+    - /delay/<seconds> responds with 200 after the delay
+    - /head-status/<code> responds to HEAD requests with the status code
+      and to GET requests with 200 (or 206 for range requests)
+    - /flaky/<key>/<count> responds with 503 to the first <count> requests
+      for <key> and with 200 afterwards
+    - /slow-first/<key>/<seconds> responds with 200 after the delay to the
+      first request for <key> and immediately afterwards
+    - /etag/<etag> responds with a page with the ETag (or with 304 Not
+      Modified if the ETag matches If-None-Match)
+    """
+    parts = environ["PATH_INFO"].strip("/").split("/")
+    status = 200
+    headers = []
+    body = b""
+    if parts[0] == "status":
+        status = int(parts[1])
+    elif parts[0] == "head-status":
+        if environ["REQUEST_METHOD"] == "HEAD":
+            status = int(parts[1])
+        elif environ.get("HTTP_RANGE"):
+            status = 206
+    elif parts[0] == "delay":
+        time.sleep(float(parts[1]))
+    elif parts[0] == "flaky":
+        FLAKY_REQUESTS[parts[1]] = FLAKY_REQUESTS.get(parts[1], 0) + 1
+        if FLAKY_REQUESTS[parts[1]] <= int(parts[2]):
+            status = 503
+    elif parts[0] == "slow-first":
+        if parts[1] not in SLOW_REQUESTS:
+            SLOW_REQUESTS.add(parts[1])
+            time.sleep(float(parts[2]))
+    elif parts[0] == "etag":
+        headers.append(("ETag", parts[1]))
+        if environ.get("HTTP_IF_NONE_MATCH") == parts[1]:
+            status = 304
+        else:
+            body = f"<a href='/{parts[1]}'>{parts[1]}</a>".encode()
+    headers.append(("Content-Length", str(len(body))))
+    start_response(f"{status} Status", headers)
+    return [body]
+
+
+def serve(port_queue):
+    server = WSGIServer(("127.0.0.1", 0), status_app, log=None)
+    server.start()
+    port_queue.put(server.server_port)
+    server.serve_forever()
+
+
+@pytest.fixture(scope="session")
+def http_server():
+    """Local stand-in for httpbin.org, served from a separate process so
+    that both the gevent and the asyncio engine can reach it
+    """
+    port_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=serve, args=(port_queue,), daemon=True
+    )
+    process.start()
+    yield f"http://127.0.0.1:{port_queue.get(timeout=10)}"
+    process.terminate()
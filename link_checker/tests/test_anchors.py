@@ -0,0 +1,109 @@
+# Standard library
+import gc
+import time
+import tracemalloc
+
+# Third-party
+import pytest
+from bs4 import BeautifulSoup
+
+# First-party/Local
+from link_checker.anchors import Anchor, get_anchors
+from link_checker.utils import filter_scrapable_links
+
+BASE_URL = "https://creativecommons.org/licenses/by/4.0/legalcode"
+LEGALCODE = (
+    "<!DOCTYPE html><html><head><meta charset='utf-8'></head><body>"
+    + "".join(
+        f"<p id='s{idx}'><strong>Section {idx}</strong> &ndash; the"
+        f" <a href='#s{idx}'>Licensed Material</a> and"
+        f" <a href='/licenses/by/4.0/deed.{idx}'>\n  the deed\n</a>,"
+        f" <a class=' footnote  ref ' href='https://example.org/{idx}'"
+        f" title='It&apos;s \"{idx}\"'>footnote <sup>{idx}</sup></a>"
+        f" <a name='n{idx}'></a> <a id='i{idx}'></a> <a href=''>empty</a>"
+        " <a href='mailto:info@creativecommons.org'>mail</a><br>"
+        "</p>\n"
+        for idx in range(2000)
+    )
+    + "</body></html>"
+)
+
+
+def parse_soup(source_html):
+    links_found = BeautifulSoup(source_html, "lxml").find_all("a")
+    return links_found, filter_scrapable_links(BASE_URL, links_found)
+
+
+def parse_anchors(source_html):
+    links_found = get_anchors(source_html)
+    return links_found, filter_scrapable_links(BASE_URL, links_found)
+
+
+def measure(function):
+    """Returns the best time of 3 runs and the peak and retained memory"""
+    timings = []
+    for _ in range(3):
+        start_time = time.perf_counter()
+        function(LEGALCODE)
+        timings.append(time.perf_counter() - start_time)
+    gc.collect()
+    tracemalloc.start()
+    result = function(LEGALCODE)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return min(timings), peak, retained
+
+
+def test_anchor():
+    anchor = Anchor("/index", None, "", '<a href="/index" name="">Index</a>')
+    assert anchor["href"] == "/index"
+    assert anchor["name"] == ""
+    with pytest.raises(KeyError):
+        anchor["id"]
+    with pytest.raises(KeyError):
+        anchor["text"]
+    assert str(anchor) == '<a href="/index" name="">Index</a>'
+    assert str([anchor]) == '[<a href="/index" name="">Index</a>]'
+
+
+@pytest.mark.parametrize(
+    "source_html",
+    [
+        LEGALCODE,
+        LEGALCODE.encode("utf-8"),
+        "<a title='x\"y' href='/a?b=1&amp;c=<2>' class=' z  y ' id=q>"
+        'T&lt;x&nbsp;<br><img src=i.png alt="it\'s &quot;q&quot;">'
+        "<!-- c --> <b>bold</b>\n\n  </a><pre><a href=1>  </a></pre>"
+        "<a download>e</a><a><a href=1>nested</a></a>",
+        # Markup after the end of the html element
+        "<html><body><a href=a>1</a></body></html>\n"
+        "<footer><a href=b>2</a></footer>",
+        "",
+    ],
+)
+def test_get_anchors(source_html):
+    links_found, results = parse_anchors(source_html)
+    soup_links_found, soup_results = parse_soup(source_html)
+    assert [str(anchor) for anchor in links_found] == [
+        str(tag) for tag in soup_links_found
+    ]
+    valid_anchors, valid_links, warnings = results
+    soup_valid_anchors, soup_valid_links, soup_warnings = soup_results
+    assert str(valid_anchors) == str(soup_valid_anchors)
+    assert valid_links == soup_valid_links
+    assert warnings == soup_warnings
+
+
+def test_get_anchors_benchmark():
+    soup_time, soup_peak, soup_retained = measure(parse_soup)
+    anchors_time, anchors_peak, anchors_retained = measure(parse_anchors)
+    print(
+        f"\nBeautifulSoup: {soup_time:.3f}s, peak {soup_peak / 2**20:.1f}MiB,"
+        f" retained {soup_retained / 2**20:.1f}MiB"
+        f"\nlxml anchors:  {anchors_time:.3f}s,"
+        f" peak {anchors_peak / 2**20:.1f}MiB,"
+        f" retained {anchors_retained / 2**20:.1f}MiB"
+    )
+    # The timings are only reported, as they vary on shared CI runners
+    assert anchors_peak < soup_peak
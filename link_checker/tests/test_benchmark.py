@@ -0,0 +1,96 @@
+# First-party/Local
+from link_checker import benchmark, utils
+
+
+def test_get_license_names():
+    license_names = benchmark.get_license_names(20)
+    assert len(license_names) == 20
+    assert license_names[:2] == ["by-nc-nd_4.0.html", "by-nc-sa_4.0.html"]
+    assert len(set(license_names)) == 20
+    assert len(benchmark.get_license_names(1000)) == 126
+
+
+def test_get_target_response():
+    config = benchmark.parse_arguments(
+        ["--error-rate", "0.2", "--redirect-rate", "0.3", "--hung-rate", "0.1"]
+    )
+    responses = [
+        benchmark.get_target_response(config, link_id)
+        for link_id in range(1000)
+    ]
+    # Responses are the same for every request
+    assert responses[0] == benchmark.get_target_response(config, 0)
+    statuses = [status for _, status in responses]
+    assert 150 < statuses.count(404) < 250
+    assert 250 < statuses.count(301) < 350
+    hung = [delay for delay, _ in responses if delay == config.hung_delay]
+    assert 50 < len(hung) < 150
+
+
+def test_run_benchmark(capsys):
+    license_local_path = utils.LICENSE_LOCAL_PATH
+    config = benchmark.parse_arguments(
+        [
+            "--licenses",
+            "5",
+            "--links",
+            "10",
+            "--unique-links",
+            "40",
+            "--latency",
+            "0",
+            "--slow-host-delay",
+            "0",
+        ]
+    )
+    results = benchmark.run_benchmark(config)
+    assert utils.LICENSE_LOCAL_PATH == license_local_path
+    assert [result["check"] for result in results] == [
+        "legalcode",
+        "deeds",
+        "rdf",
+        "combined",
+    ]
+    # legalcode, deeds, RDFs and index.rdf
+    assert [result["pages"] for result in results] == [5, 5, 5, 20]
+    for result in results:
+        assert 10 <= result["unique_links"] <= 40
+        assert result["requests"] >= result["unique_links"]
+        assert result["links_per_second"] > 0
+        assert 0 < result["latency_p50"] <= result["latency_p99"]
+        assert result["peak_rss_mib"] > 0
+    benchmark.output_results(results)
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split()[:3] == ["check", "pages", "links"]
+    assert [line.split()[0] for line in lines[1:]] == [
+        "legalcode",
+        "deeds",
+        "rdf",
+        "combined",
+    ]
+
+
+def test_peak_rss():
+    def run_combined(licenses):
+        config = benchmark.parse_arguments(
+            [
+                "--checks",
+                "combined",
+                "--licenses",
+                str(licenses),
+                "--links",
+                "500",
+                "--latency",
+                "0",
+                "--slow-host-delay",
+                "0",
+            ]
+        )
+        return benchmark.run_benchmark(config)[0]
+
+    small, large = run_combined(6), run_combined(126)
+    # The pages only keep their (shared) links and rendered anchors: about
+    # 220 bytes per link found, or 310 if each page kept its own copies
+    link_occurrences = (large["pages"] - small["pages"]) * 500
+    peak_rss_growth = (large["peak_rss_mib"] - small["peak_rss_mib"]) * 2**20
+    assert peak_rss_growth / link_occurrences < 256
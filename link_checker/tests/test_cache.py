@@ -0,0 +1,187 @@
+# Standard library
+import subprocess
+
+# Third-party
+import pytest
+
+# First-party/Local
+from link_checker import __main__ as link_checker
+from link_checker import cache, utils
+from link_checker.cache import (
+    cache_extract,
+    cache_page,
+    cache_statuses,
+    close_cache,
+    get_cached_extract,
+    get_cached_page,
+    get_cached_status,
+    open_cache,
+)
+
+
+@pytest.fixture
+def link_cache(tmpdir):
+    args = link_checker.parse_arguments(
+        ["deeds", "--cache-ttl", "60", "--cache-error-ttl", "0"]
+    )
+    open_cache(args, cache_dir=tmpdir.strpath)
+    yield cache.CACHE
+    close_cache()
+
+
+def test_open_cache(tmpdir):
+    args = link_checker.parse_arguments(["deeds", "--no-cache"])
+    assert open_cache(args, cache_dir=tmpdir.strpath) is None
+    assert tmpdir.listdir() == []
+    args = link_checker.parse_arguments(["deeds"])
+    assert open_cache(args, cache_dir=tmpdir.strpath) is not None
+    close_cache()
+    assert tmpdir.join("cache.sqlite3").check()
+
+
+def test_get_cached_status(link_cache):
+    cache_statuses(["link1", "link2", "link3"], [200, 404, "Connection Error"])
+    assert get_cached_status("link1") == 200
+    # Error statuses expire immediately (--cache-error-ttl 0)
+    assert get_cached_status("link2") is None
+    assert get_cached_status("link3") is None
+    assert get_cached_status("link4") is None
+    assert cache.CACHE_STATISTICS == {"hits": 1, "misses": 3}
+    # Good statuses expire after --cache-ttl
+    link_cache.execute("UPDATE links SET checked = checked - 61")
+    assert get_cached_status("link1") is None
+
+
+def test_cache_transactions(tmpdir):
+    args = link_checker.parse_arguments(["deeds"])
+    open_cache(args, cache_dir=tmpdir.strpath)
+    cache_page("https://example.com/", "abc", None, b"page")
+    cache_extract("key", {"links": []})
+    # Pages and extracts are committed with the next batch of statuses
+    assert cache.CACHE.in_transaction
+    cache_statuses(["link1"], [200])
+    assert not cache.CACHE.in_transaction
+    cache_extract("other", {"links": []})
+    close_cache()
+    open_cache(args, cache_dir=tmpdir.strpath)
+    assert get_cached_page("https://example.com/")["body"] == b"page"
+    assert get_cached_extract("other") == {"links": []}
+    close_cache()
+
+
+def test_get_memoized_result_cached(link_cache):
+    utils.MEMOIZED_LINKS = {}
+    cache_statuses(["link1"], [200])
+    stored_links, _, stored_result, check_links, _ = utils.get_memoized_result(
+        ["link1", "link2"], ["a1", "a2"]
+    )
+    assert stored_links == ["link1"]
+    assert stored_result == [200]
+    assert check_links == ["link2"]
+    assert utils.MEMOIZED_LINKS == {"link1": 200}
+
+
+def test_request_text_conditional(link_cache, http_server):
+    page_url = f"{http_server}/etag/abc"
+    assert utils.request_text(page_url) == b"<a href='/abc'>abc</a>"
+    assert get_cached_page(page_url) == {
+        "etag": "abc",
+        "last_modified": None,
+        "body": b"<a href='/abc'>abc</a>",
+    }
+    # The cached page is returned when the server responds 304 Not Modified
+    link_cache.execute("UPDATE pages SET body = ?", (b"cached",))
+    assert utils.request_text(page_url) == b"cached"
+    # Pages without validators are not cached
+    utils.request_text(f"{http_server}/status/200")
+    assert get_cached_page(f"{http_server}/status/200") is None
+
+
+def test_get_html_links_cached(link_cache):
+    source_html = "<a href='/index'>\nIndex</a> <a name='top'>Top</a>"
+    base_url = "https://www.demourl.com/dir1/dir2"
+    link_count, valid_anchors, valid_links, warnings = utils.get_html_links(
+        base_url, source_html
+    )
+    assert link_count == 2
+    assert valid_anchors == ['<a href="/index">Index</a>']
+    assert valid_links == ["https://www.demourl.com/index"]
+    assert warnings == [f"  {'Anchor uses name':<24}<a name=\"top\">Top</a>"]
+    # Identical pages are not parsed again
+    assert utils.get_html_links(base_url, source_html.encode()) == (
+        2,
+        ['<a href="/index">Index</a>'],
+        ["https://www.demourl.com/index"],
+        warnings,
+    )
+    assert len(link_cache.execute("SELECT * FROM extracts").fetchall()) == 1
+    assert get_cached_extract("unknown") is None
+
+
+def test_get_local_html_links_incremental(link_cache, tmpdir, monkeypatch):
+    local_path = tmpdir.mkdir("legalcode")
+    local_path.join("by_4.0.html").write("<a href='/by'>BY</a>")
+    local_path.join("by-sa_4.0.html").write("<a href='/by-sa'>BY-SA</a>")
+    license_names = ["by_4.0.html", "by-sa_4.0.html"]
+    base_urls = ["https://example.org/by", "https://example.org/by-sa"]
+    read_names = []
+
+    def request_local_text(local_path, license_name):
+        read_names.append(license_name)
+        with open(f"{local_path}/{license_name}") as lic:
+            return lic.read()
+
+    monkeypatch.setattr(utils, "request_local_text", request_local_text)
+
+    def get_links(*options):
+        args = link_checker.parse_arguments(
+            ["legalcode", "--local", "--incremental", *options]
+        )
+        read_names.clear()
+        results = utils.get_local_html_links(
+            args, license_names, base_urls, local_path.strpath
+        )
+        return [result[2] for result in results]
+
+    assert get_links() == [
+        ["https://example.org/by"],
+        ["https://example.org/by-sa"],
+    ]
+    assert read_names == license_names
+    # Unchanged files are not read again
+    assert get_links() == [
+        ["https://example.org/by"],
+        ["https://example.org/by-sa"],
+    ]
+    assert read_names == []
+    local_path.join("by-sa_4.0.html").write("<a href='/by-sa/4.0'>4.0</a>")
+    assert get_links() == [
+        ["https://example.org/by"],
+        ["https://example.org/by-sa/4.0"],
+    ]
+    assert read_names == ["by-sa_4.0.html"]
+
+    # With --changed-since, only the files changed in git are read again
+    def git(*arguments):
+        subprocess.run(
+            ["git", "-c", "user.name=test", "-c", "user.email=test@test"]
+            + list(arguments),
+            cwd=local_path.strpath,
+            check=True,
+            capture_output=True,
+        )
+
+    git("init")
+    git("add", ".")
+    git("commit", "-m", "Add legalcode")
+    local_path.join("by_4.0.html").write("<a href='/by/4.0'>4.0</a>")
+    git("commit", "-am", "Update BY")
+    # Checking out files changes their modification time
+    local_path.join("by-sa_4.0.html").setmtime(0)
+    assert get_links("--changed-since", "HEAD~1") == [
+        ["https://example.org/by/4.0"],
+        ["https://example.org/by-sa/4.0"],
+    ]
+    assert read_names == ["by_4.0.html"]
+    with pytest.raises(utils.CheckerError):
+        get_links("--changed-since", "unknown-revision")
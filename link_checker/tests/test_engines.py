@@ -0,0 +1,245 @@
+# Standard library
+import collections
+import time
+
+# Third-party
+import pytest
+
+# First-party/Local
+from link_checker import __main__ as link_checker
+from link_checker import engines, hosts, utils
+from link_checker.engines import (
+    ENGINES,
+    get_link_responses,
+    recheck_link_responses,
+)
+
+
+@pytest.fixture(params=ENGINES)
+def engine(request):
+    """Link checking engine, with the default host configuration restored
+    after the test
+    """
+    if request.param != "grequests":
+        pytest.importorskip("httpx")
+    hosts.load_host_config(None)
+    yield request.param
+    hosts.load_host_config(None)
+
+
+def test_get_link_responses(engine, http_server):
+    args = link_checker.parse_arguments(
+        ["deeds", "--engine", engine, "--max-concurrency", "2"]
+    )
+    links = [
+        f"{http_server}/status/200",
+        f"{http_server}/status/404",
+        "file://link3",
+        "http://invalid-example.creativecommons.org:81",
+        f"{http_server}/status/301",
+    ]
+    responses = get_link_responses(args, links)
+    assert responses == [
+        200,
+        404,
+        "Invalid Schema",
+        "Connection Error",
+        301,
+    ]
+
+
+def test_get_link_responses_head_fallback(engine, http_server, tmpdir):
+    args = link_checker.parse_arguments(["deeds", "--engine", engine])
+    links = [
+        f"{http_server}/head-status/405",
+        f"{http_server}/head-status/403",
+        f"{http_server}/head-status/404",
+        f"{http_server}/status/405",
+    ]
+    responses = get_link_responses(args, links)
+    assert responses == [206, 206, 404, 405]
+    # Disable the fallback for the local server
+    host_config = tmpdir.join("hosts.ini")
+    host_config.write("[127.0.0.1]\nhead_fallback = 403\n")
+    hosts.load_host_config(host_config.strpath)
+    responses = get_link_responses(args, links)
+    assert responses == [405, 206, 404, 405]
+
+
+def test_get_link_responses_retry(engine, http_server, tmpdir):
+    args = link_checker.parse_arguments(
+        ["deeds", "--engine", engine, "--max-concurrency", "1"]
+    )
+    host_config = tmpdir.join("hosts.ini")
+    host_config.write(
+        "[DEFAULT]\n"
+        "retries = 1\n"
+        "retry_backoff = 0.01\n"
+        "breaker_threshold = 0\n"
+        "[invalid]\n"
+        "error_retries = 0\n"
+        "breaker_threshold = 2\n"
+    )
+    hosts.load_host_config(host_config.strpath)
+    links = [
+        # Recovers on retry
+        f"{http_server}/flaky/{engine}-1/1",
+        # Fails on retry
+        f"{http_server}/flaky/{engine}-2/2",
+    ]
+    responses = get_link_responses(args, links)
+    assert responses == [200, 503]
+    assert hosts.HOST_STATISTICS["retries"] == 2
+    # Host is unavailable after 2 consecutive failures
+    links = [f"http://doesnotexist.invalid/{idx}" for idx in range(3)]
+    responses = get_link_responses(args, links)
+    assert responses == ["Connection Error"] * 2 + ["Host Unavailable"]
+
+
+def test_get_link_responses_rate_limit(engine, http_server, tmpdir):
+    args = link_checker.parse_arguments(
+        ["deeds", "--engine", engine, "--max-concurrency", "1"]
+    )
+    host_config = tmpdir.join("hosts.ini")
+    host_config.write("[127.0.0.1]\nrate_limit = 10\n")
+    hosts.load_host_config(host_config.strpath)
+    # The same server is reached with a host name that is not rate limited
+    other_server = http_server.replace("127.0.0.1", "localhost")
+    links = [f"{http_server}/status/200?{idx}" for idx in range(5)] + [
+        f"{other_server}/status/200?{idx}" for idx in range(5)
+    ]
+    start_time = time.perf_counter()
+    responses = get_link_responses(args, links)
+    assert responses == [200] * 10
+    assert time.perf_counter() - start_time >= 0.4
+    # Only the requests to the rate limited host waited
+    assert hosts.HOST_STATISTICS["throttled"] == 4
+
+
+def test_get_link_responses_http2(http_server, monkeypatch, capsys):
+    pytest.importorskip("h2")
+    monkeypatch.setattr(engines, "HTTP_VERSIONS", collections.Counter())
+    args = link_checker.parse_arguments(["deeds", "--engine", "http2", "-v"])
+    links = [f"{http_server}/status/200", f"{http_server}/status/404"]
+    assert get_link_responses(args, links) == [200, 404]
+    # HTTP/2 is only negotiated over TLS: the local server falls back to
+    # HTTP/1.1
+    assert engines.HTTP_VERSIONS == {("127.0.0.1", "HTTP/1.1"): 2}
+    engines.output_http_versions(args)
+    assert capsys.readouterr().out == (
+        "\nHTTP versions: HTTP/1.1 (2 responses from 1 hosts)\n"
+    )
+
+
+def test_get_link_responses_adaptive_timeout(engine, http_server, tmpdir):
+    host_config = tmpdir.join("hosts.ini")
+    host_config.write(
+        "[127.0.0.1]\ntimeout_min = 0.2\nretries = 1\nretry_backoff = 0.01\n"
+    )
+    hosts.load_host_config(host_config.strpath)
+    for _ in range(hosts.LATENCY_MIN_SAMPLES):
+        hosts.record_host_response(f"{http_server}/", 200, 0.05)
+    args = link_checker.parse_arguments(["deeds", "--engine", engine])
+    # Times out with the timeout derived from the latency of the host (0.2
+    # seconds) and succeeds when retried with timeout_max
+    responses = get_link_responses(args, [f"{http_server}/delay/0.5"])
+    assert responses == [200]
+    assert hosts.HOST_STATISTICS["retries"] == 1
+
+
+def test_get_link_responses_hedge(engine, http_server, tmpdir):
+    # The hedged request does not wait for the connection of the request it
+    # duplicates
+    host_config = tmpdir.join("hosts.ini")
+    host_config.write("[DEFAULT]\nmax_connections = 1\n")
+    hosts.load_host_config(host_config.strpath)
+    for _ in range(hosts.LATENCY_MIN_SAMPLES):
+        hosts.record_host_response(f"{http_server}/", 200, 0.05)
+    args = link_checker.parse_arguments(
+        ["deeds", "--engine", engine, "--hedge"]
+    )
+    links = [f"{http_server}/slow-first/hedge-{engine}/0.8"]
+    start_time = time.perf_counter()
+    responses = get_link_responses(args, links)
+    # The hedged request sent after 0.05 seconds responds first
+    assert responses == [200]
+    assert time.perf_counter() - start_time < 0.6
+    assert hosts.HOST_STATISTICS["hedged"] == 1
+    assert hosts.HOST_STATISTICS["hedge_wins"] == 1
+
+
+def test_get_link_responses_hedge_failure(engine, http_server, monkeypatch):
+    for _ in range(hosts.LATENCY_MIN_SAMPLES):
+        hosts.record_host_response(f"{http_server}/", 200, 0.05)
+    # The hedged requests fail at once (nothing listens on port 1)
+    requested = []
+    get_grequests_request = engines.get_grequests_request
+    request_async = engines.request_async
+
+    def get_link(link):
+        requested.append(link)
+        return link if len(requested) == 1 else "http://127.0.0.1:1/"
+
+    monkeypatch.setattr(
+        engines,
+        "get_grequests_request",
+        lambda session, link, *args: get_grequests_request(
+            session, get_link(link), *args
+        ),
+    )
+    monkeypatch.setattr(
+        engines,
+        "request_async",
+        lambda client, link, *args: request_async(
+            client, get_link(link), *args
+        ),
+    )
+    args = link_checker.parse_arguments(
+        ["deeds", "--engine", engine, "--hedge"]
+    )
+    responses = get_link_responses(args, [f"{http_server}/delay/0.3"])
+    # The response of the first request wins over the Connection Error
+    assert responses == [200]
+    assert len(requested) == 2
+    assert hosts.HOST_STATISTICS["hedged"] == 1
+    assert hosts.HOST_STATISTICS["hedge_wins"] == 0
+
+
+def test_recheck_link_responses(engine, http_server, tmpdir, monkeypatch):
+    monkeypatch.setattr(utils, "RECHECKED_LINKS", {})
+    host_config = tmpdir.join("hosts.ini")
+    host_config.write(
+        "[DEFAULT]\n"
+        "retries = 0\n"
+        "error_retries = 0\n"
+        "[invalid]\n"
+        "breaker_threshold = 1\n"
+    )
+    hosts.load_host_config(host_config.strpath)
+    links = [
+        # Fails once, then recovers
+        f"{http_server}/flaky/recheck-{engine}/1",
+        f"{http_server}/status/404",
+        "http://doesnotexist.invalid/1",
+        "http://doesnotexist.invalid/2",
+    ]
+    args = link_checker.parse_arguments(
+        ["deeds", "--engine", engine, "--max-concurrency", "1"]
+    )
+    responses = get_link_responses(args, links)
+    assert responses == [503, 404, "Connection Error", "Host Unavailable"]
+    args_no_recheck = link_checker.parse_arguments(
+        ["deeds", "--engine", engine, "--no-recheck"]
+    )
+    assert (
+        recheck_link_responses(args_no_recheck, links, responses) == responses
+    )
+    responses = recheck_link_responses(args, links, responses)
+    # The unavailable host is requested again (and fails again)
+    assert responses[:3] == [200, 404, "Connection Error"]
+    assert responses[3] in ["Connection Error", "Host Unavailable"]
+    assert utils.RECHECKED_LINKS[links[0]] == {"first": 503, "status": 200}
+    assert list(utils.RECHECKED_LINKS) == [links[0], links[2], links[3]]
+    recovered, confirmed = utils.get_rechecked_links()
+    assert recovered == [links[0]]
+    assert confirmed == [links[2], links[3]]
@@ -0,0 +1,200 @@
+# Third-party
+import gevent
+import pytest
+
+# First-party/Local
+from link_checker import __main__ as link_checker
+from link_checker import hosts
+from link_checker.constants import REQUESTS_TIMEOUT
+from link_checker.hosts import (
+    get_host,
+    get_host_limiter,
+    get_host_option,
+    get_host_section,
+    get_host_statuses,
+    get_retry_delay,
+    host_slot,
+    is_host_available,
+    is_retryable,
+    load_host_config,
+    record_host_response,
+)
+from link_checker.utils import CheckerError
+
+
+@pytest.fixture
+def host_config(tmpdir):
+    config = tmpdir.join("hosts.ini")
+    config.write(
+        "[DEFAULT]\n"
+        "head_fallback = 405\n"
+        "[creativecommons.org]\n"
+        "head_fallback =\n"
+        "[wiki.creativecommons.org]\n"
+        "head_fallback = 403, 405\n"
+    )
+    load_host_config(config.strpath)
+    yield config
+    load_host_config(None)
+
+
+def test_get_host():
+    assert get_host("https://WIKI.CreativeCommons.org:443/a") == (
+        "wiki.creativecommons.org"
+    )
+    assert get_host("mailto:abc@gmail.com") == ""
+    assert get_host("http://[invalid") == ""
+
+
+def test_get_host_option(host_config):
+    assert get_host_option("https://example.com/", "head_fallback") == "405"
+    assert (
+        get_host_option("https://creativecommons.org/", "head_fallback") == ""
+    )
+    assert (
+        get_host_statuses(
+            "https://i.creativecommons.org/l/by/4.0/88x31.png", "head_fallback"
+        )
+        == []
+    )
+    assert get_host_statuses(
+        "https://wiki.creativecommons.org/wiki/", "head_fallback"
+    ) == [403, 405]
+
+
+def test_get_host_section(host_config):
+    assert get_host_section("i.creativecommons.org") == "creativecommons.org"
+    assert get_host_section("wiki.creativecommons.org") == (
+        "wiki.creativecommons.org"
+    )
+    assert get_host_section("example.com") is None
+
+
+def test_load_host_config(tmpdir):
+    load_host_config(None)
+    assert get_host_statuses("https://example.com/", "head_fallback") == [
+        403,
+        405,
+        501,
+    ]
+    with pytest.raises(CheckerError):
+        load_host_config(tmpdir.join("missing.ini").strpath)
+    invalid_config = tmpdir.join("invalid.ini")
+    invalid_config.write("head_fallback = 405\n")
+    with pytest.raises(CheckerError):
+        load_host_config(invalid_config.strpath)
+    load_host_config(None)
+
+
+def test_is_retryable():
+    load_host_config(None)
+    link = "https://creativecommons.org/"
+    assert is_retryable(link, "Connection Error", 1)
+    # Connection errors and timeouts are only retried once (error_retries)
+    assert not is_retryable(link, "Connection Error", 2)
+    assert is_retryable(link, 503, 2)
+    assert not is_retryable(link, 503, 3)
+    assert not is_retryable(link, 404, 1)
+    assert not is_retryable(link, "Invalid Schema", 1)
+    assert hosts.HOST_STATISTICS["retries"] == 2
+
+
+def test_get_retry_delay():
+    load_host_config(None)
+    link = "https://creativecommons.org/"
+    assert 0.25 <= get_retry_delay(link, 1) <= 0.75
+    assert 1 <= get_retry_delay(link, 3) <= 3
+
+
+def test_is_host_available():
+    load_host_config(None)
+    link = "https://creativecommons.org/"
+    for _ in range(9):
+        record_host_response(link, "Connection Error")
+    assert is_host_available(link)
+    record_host_response(link, 200)
+    for _ in range(10):
+        record_host_response(link, 502)
+    assert not is_host_available(link)
+    assert is_host_available("https://wiki.creativecommons.org/")
+    load_host_config(None)
+
+
+def test_get_host_limiter(tmpdir):
+    config = tmpdir.join("hosts.ini")
+    config.write(
+        "[example.com]\n"
+        "rate_limit = 10\n"
+        "rate_burst = 2\n"
+        "max_connections = 2\n"
+    )
+    load_host_config(config.strpath)
+    limiter = get_host_limiter("https://example.com/a")
+    assert limiter is get_host_limiter("https://example.com/b")
+    delays = [limiter.reserve() for _ in range(4)]
+    assert delays[:2] == [0, 0]
+    assert 0.09 <= delays[2] <= 0.1
+    assert 0.19 <= delays[3] <= 0.2
+    assert hosts.HOST_STATISTICS["throttled"] == 2
+    # Other hosts are not limited
+    limiter = get_host_limiter("https://www.example.org/")
+    assert limiter.semaphore is None
+    assert [limiter.reserve() for _ in range(4)] == [0] * 4
+    load_host_config(None)
+
+
+def test_host_slot(tmpdir):
+    config = tmpdir.join("hosts.ini")
+    config.write("[example.com]\nmax_connections = 2\n")
+    load_host_config(config.strpath)
+    in_flight = []
+    entered = []
+
+    def request(link):
+        with host_slot(link):
+            in_flight.append(get_host(link))
+            entered.append(list(in_flight))
+            gevent.sleep(0.01)
+            in_flight.remove(get_host(link))
+
+    greenlets = [
+        gevent.spawn(request, f"https://example.com/{idx}") for idx in range(5)
+    ] + [
+        gevent.spawn(request, f"https://example.org/{idx}") for idx in range(3)
+    ]
+    gevent.joinall(greenlets)
+    assert len(entered) == 8
+    # At most 2 requests to example.com at once, while those to example.org
+    # did not wait for them
+    assert max(hosts_.count("example.com") for hosts_ in entered) == 2
+    assert entered[4] == ["example.com"] * 2 + ["example.org"] * 3
+    load_host_config(None)
+
+
+def test_get_host_timeout(tmpdir):
+    host_config = tmpdir.join("hosts.ini")
+    host_config.write("[slow.example.com]\ntimeout_max = 30\n")
+    hosts.load_host_config(host_config.strpath)
+    link = "https://example.com/"
+    assert hosts.get_host_percentile(link) is None
+    assert hosts.get_host_timeout(link) == REQUESTS_TIMEOUT
+    for idx in range(100):
+        hosts.record_host_response(link, 200, (idx + 1) / 100)
+    # Errors are not latencies
+    hosts.record_host_response(link, "Timeout Error", 60)
+    assert hosts.get_host_percentile(link) == 0.96
+    assert hosts.get_host_timeout(link) == 0.96 * hosts.TIMEOUT_FACTOR
+    assert hosts.get_host_timeout(link, attempt=1) == 15
+    slow_link = "https://slow.example.com/"
+    for _ in range(hosts.LATENCY_MIN_SAMPLES):
+        hosts.record_host_response(slow_link, 200, 10)
+    assert hosts.get_host_timeout(slow_link) == 30
+    fast_link = "https://fast.example.com/"
+    for _ in range(hosts.LATENCY_MIN_SAMPLES):
+        hosts.record_host_response(fast_link, 200, 0.01)
+    assert hosts.get_host_timeout(fast_link) == 1
+    args = link_checker.parse_arguments(["deeds"])
+    assert hosts.get_hedge_delay(args, link) is None
+    args = link_checker.parse_arguments(["deeds", "--hedge"])
+    assert hosts.get_hedge_delay(args, link) == 0.96
+    hosts.load_host_config(None)
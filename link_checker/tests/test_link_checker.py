@@ -1,6 +1,14 @@
-# Local/library specific
+# Standard library
+import time
+
+# Third-party
+import gevent
+import pytest
+
 # First-party/Local
 from link_checker import __main__ as link_checker
+from link_checker import utils
+from link_checker.utils import get_page
 
 
 def test_parser_shared():
@@ -59,12 +67,98 @@ def test_parser_shared_licenses():
     for subcmd in subcmds:
         args = link_checker.parse_arguments([subcmd])
         assert args.local is False
+        assert args.local_path is None
 
     # Test argumetns
     for subcmd in subcmds:
         # Test --local
         args = link_checker.parse_arguments([subcmd, "--local"])
         assert args.local is True
+        # Test --local-path
+        args = link_checker.parse_arguments(
+            [subcmd, "--local", "--local-path", "legalcode"]
+        )
+        assert args.local_path == "legalcode"
+
+
+def test_parser_shared_checking(tmpdir):
+    subcmds = ["deeds", "legalcode", "rdf", "index", "combined"]
+
+    # Test defaults
+    for subcmd in subcmds:
+        args = link_checker.parse_arguments([subcmd])
+        assert args.engine == "grequests"
+        assert args.max_concurrency == 100
+        assert args.cache_ttl == 86400
+        assert args.cache_error_ttl == 0
+        assert args.no_cache is False
+        assert args.host_config is None
+        assert args.fetch_workers == 10
+        assert args.jobs == 1
+        assert args.incremental is False
+        assert args.changed_since is None
+        assert args.profile is None
+        assert args.profile_cpu is None
+
+    # Test arguments
+    for subcmd in subcmds:
+        # Test --engine
+        args = link_checker.parse_arguments([subcmd, "--engine", "async"])
+        assert args.engine == "async"
+        # Test --max-concurrency
+        args = link_checker.parse_arguments([subcmd, "--max-concurrency=5"])
+        assert args.max_concurrency == 5
+        with pytest.raises(SystemExit):
+            link_checker.parse_arguments([subcmd, "--max-concurrency=0"])
+        # Test --cache-ttl, --cache-error-ttl, and --no-cache
+        args = link_checker.parse_arguments(
+            [subcmd, "--cache-ttl=60", "--cache-error-ttl=10", "--no-cache"]
+        )
+        assert args.cache_ttl == 60
+        assert args.cache_error_ttl == 10
+        assert args.no_cache is True
+        # Test --fetch-workers
+        args = link_checker.parse_arguments([subcmd, "--fetch-workers=2"])
+        assert args.fetch_workers == 2
+        with pytest.raises(SystemExit):
+            link_checker.parse_arguments([subcmd, "--fetch-workers=0"])
+        # Test --jobs
+        args = link_checker.parse_arguments([subcmd, "--jobs=4"])
+        assert args.jobs == 4
+        with pytest.raises(SystemExit):
+            link_checker.parse_arguments([subcmd, "--jobs=0"])
+        # Test --incremental and --changed-since (index has no --local)
+        if subcmd != "index":
+            args = link_checker.parse_arguments(
+                [
+                    subcmd,
+                    "--local",
+                    "--incremental",
+                    "--changed-since",
+                    "HEAD~1",
+                ]
+            )
+            assert args.incremental is True
+            assert args.changed_since == "HEAD~1"
+            with pytest.raises(SystemExit):
+                link_checker.parse_arguments(
+                    [subcmd, "--local", "--incremental", "--no-cache"]
+                )
+        with pytest.raises(SystemExit):
+            link_checker.parse_arguments([subcmd, "--changed-since=HEAD"])
+        with pytest.raises(SystemExit):
+            link_checker.parse_arguments([subcmd, "--incremental"])
+        # Test --host-config
+        args = link_checker.parse_arguments([subcmd, "--host-config=h.ini"])
+        assert args.host_config == "h.ini"
+        # Test --profile and --profile-cpu
+        profile = tmpdir.join("profile.json")
+        args = link_checker.parse_arguments(
+            [subcmd, "--profile", profile.strpath, "--profile-cpu"]
+        )
+        assert args.profile.name == profile.strpath
+        assert args.profile_cpu == "profile.prof"
+        args.profile.close()
 
 
 def test_parser_shared_rdf():
@@ -89,6 +183,7 @@ def test_parser_shared_reporting(tmpdir):
     for subcmd in subcmds:
         args = link_checker.parse_arguments([subcmd])
         assert bool(args.output_errors) is False
+        assert args.metrics is None
 
     # Test arguments
     for subcmd in subcmds:
@@ -103,3 +198,61 @@ def test_parser_shared_reporting(tmpdir):
         )
         assert bool(args.output_errors) is True
         assert args.output_errors.name == output_file.strpath
+        # Test --metrics
+        args = link_checker.parse_arguments([subcmd, "--metrics", "lc.prom"])
+        assert args.metrics == "lc.prom"
+
+
+def test_run_collectors(capsys):
+    def collector(name):
+        for idx in range(3):
+            print(f"{name} {idx}")
+            gevent.sleep(0.1)
+        return name
+
+    start_time = time.time()
+    results = link_checker.run_collectors(
+        [lambda: collector("legalcode"), lambda: collector("deeds")]
+    )
+    # The collectors run concurrently
+    assert time.time() - start_time < 0.5
+    assert results == [
+        ("legalcode 0\nlegalcode 1\nlegalcode 2\n", "legalcode"),
+        ("deeds 0\ndeeds 1\ndeeds 2\n", "deeds"),
+    ]
+    assert capsys.readouterr().out == ""
+
+    def failing_collector():
+        print("rdf 0")
+        gevent.sleep(0.1)
+        raise link_checker.CheckerError("Collector failed")
+
+    # The output of the other collectors is not lost
+    with pytest.raises(link_checker.CheckerError):
+        link_checker.run_collectors(
+            [lambda: collector("legalcode"), failing_collector]
+        )
+    print("restored")
+    assert capsys.readouterr().out == (
+        "legalcode 0\nlegalcode 1\nlegalcode 2\nrdf 0\nrestored\n"
+    )
+
+
+@pytest.mark.parametrize("context_printed", [False, True])
+def test_write_page_responses(monkeypatch, capsys, context_printed):
+    monkeypatch.setattr(utils, "MEMOIZED_LINKS", {"https://a/": 404})
+    monkeypatch.setattr(utils, "MAP_BROKEN_LINKS", {})
+    args = link_checker.parse_arguments(["deeds"])
+    page = get_page(
+        "by_4.0",
+        "https://base/",
+        "\n\nChecking: deed",
+        ["https://a/"],
+        ["<a href='https://a/'>a</a>"],
+        context_printed,
+    )
+    assert link_checker.write_page_responses(args, [page]) == (1, 1)
+    # The context is printed once, while scraping or with the errors
+    output = capsys.readouterr().out
+    assert output.count("Checking: deed") == (0 if context_printed else 1)
+    assert "404" in output
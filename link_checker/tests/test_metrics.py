@@ -0,0 +1,176 @@
+# Third-party
+import pytest
+
+# First-party/Local
+from link_checker import __main__ as link_checker
+from link_checker import cache, engines, hosts, metrics, profiling, utils
+
+
+@pytest.fixture
+def run_state(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE", None)
+    monkeypatch.setattr(
+        metrics,
+        "LINK_STATISTICS",
+        {
+            "links": 12,
+            "unique_hrefs": 7,
+            "unique_links": 5,
+            "checked_links": 4,
+            "unchecked_links": 1,
+        },
+    )
+    monkeypatch.setattr(
+        engines,
+        "LATENCIES",
+        [
+            ("example.com", 0.02),
+            ("example.com", 0.3),
+            ("example.com", 12.0),
+            ("slow.example.org", 4.0),
+        ],
+    )
+    monkeypatch.setattr(cache, "CACHE_STATISTICS", {"hits": 1, "misses": 4})
+    monkeypatch.setattr(hosts, "HOST_STATISTICS", {"retries": 2, "hedged": 1})
+    monkeypatch.setattr(
+        utils,
+        "MEMOIZED_LINKS",
+        {
+            "https://example.com/": 200,
+            "https://example.com/missing": 404,
+            "https://example.com/gone": 410,
+            "https://example.com/error": 503,
+            "https://slow.example.org/": "Timeout",
+        },
+    )
+    monkeypatch.setattr(
+        utils,
+        "RECHECKED_LINKS",
+        {
+            "https://example.com/": {"first": "ReadTimeout", "status": 200},
+            "https://slow.example.org/": {
+                "first": "ReadTimeout",
+                "status": "Timeout",
+            },
+        },
+    )
+    monkeypatch.setattr(
+        utils,
+        "MAP_BROKEN_LINKS",
+        {
+            "https://example.com/missing": {"a": None},
+            "https://example.com/gone": {"a": None, "b": None},
+            "https://example.com/error": {"a": None},
+            "https://slow.example.org/": {"b": None},
+        },
+    )
+
+
+def get_samples(text):
+    """Returns the samples of metrics in the Prometheus text format"""
+    samples = {}
+    for line in text.splitlines():
+        if not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = value
+    return samples
+
+
+def test_get_broken_links(run_state):
+    assert metrics.get_broken_links() == {"4xx": 2, "5xx": 1, "error": 1}
+
+
+def test_output_metrics(run_state, tmpdir):
+    metrics_file = tmpdir.join("link_checker.prom")
+    args = link_checker.parse_arguments(
+        ["legalcode", "--metrics", metrics_file.strpath]
+    )
+    profiling.start_profile(args)
+    with profiling.phase("parse"):
+        pass
+    metrics.output_metrics(args, 5)
+    assert tmpdir.listdir() == [metrics_file]
+    text = metrics_file.read()
+    assert "# TYPE link_checker_request_duration_seconds histogram" in text
+    samples = get_samples(text)
+    label = '{subcommand="legalcode"}'
+    assert samples[f"link_checker_links_found_total{label}"] == "12"
+    assert samples[f"link_checker_unique_hrefs_total{label}"] == "7"
+    assert samples[f"link_checker_unique_links_total{label}"] == "5"
+    assert samples[f"link_checker_links_checked_total{label}"] == "4"
+    assert samples[f"link_checker_links_not_checked_total{label}"] == "1"
+    assert samples[f"link_checker_requests_total{label}"] == "4"
+    assert samples[f"link_checker_retries_total{label}"] == "2"
+    assert samples[f"link_checker_hedged_requests_total{label}"] == "1"
+    assert samples[f"link_checker_cache_lookups_total{label}"] == "5"
+    assert samples[f"link_checker_cache_hits_total{label}"] == "1"
+    assert samples[f"link_checker_errors_total{label}"] == "5"
+    assert (
+        samples[
+            'link_checker_broken_links{subcommand="legalcode",'
+            'status_class="4xx"}'
+        ]
+        == "2"
+    )
+    assert (
+        samples[
+            'link_checker_rechecked_links{subcommand="legalcode",'
+            'result="recovered"}'
+        ]
+        == "1"
+    )
+    latency = (
+        "link_checker_request_duration_seconds_bucket{subcommand="
+        '"legalcode",host="example.com",le="{}"}'
+    )
+    assert samples[latency.replace("{}", "0.05")] == "1"
+    assert samples[latency.replace("{}", "0.5")] == "2"
+    assert samples[latency.replace("{}", "10")] == "2"
+    assert samples[latency.replace("{}", "+Inf")] == "3"
+    assert (
+        samples[
+            "link_checker_request_duration_seconds_count{subcommand="
+            '"legalcode",host="slow.example.org"}'
+        ]
+        == "1"
+    )
+    assert (
+        'link_checker_phase_duration_seconds{subcommand="legalcode",'
+        'check="legalcode",phase="parse"}'
+    ) in samples
+    assert float(samples[f"link_checker_run_duration_seconds{label}"]) >= 0
+
+
+def test_get_latency_samples(monkeypatch, tmpdir):
+    config = tmpdir.join("hosts.ini")
+    config.write("[example.org]\nmax_connections = 2\n")
+    hosts.load_host_config(config.strpath)
+    monkeypatch.setattr(metrics, "LATENCY_TOP_HOSTS", 1)
+    monkeypatch.setattr(
+        engines,
+        "LATENCIES",
+        [
+            ("a.example.org", 0.1),
+            ("b.example.org", 0.2),
+            ("busy.example.com", 0.1),
+            ("busy.example.com", 0.1),
+            ("rare.example.com", 0.3),
+            ("other.example.net", 0.4),
+        ],
+    )
+    try:
+        counts = {
+            labels["host"]: value
+            for suffix, labels, value in metrics.get_latency_samples()
+            if suffix == "_count"
+        }
+    finally:
+        hosts.load_host_config(None)
+    # Configured hosts, then the hosts with the most requests
+    assert counts == {"example.org": 2, "busy.example.com": 2, "other": 2}
+
+
+def test_format_labels():
+    assert metrics.format_labels({"host": "a", "error": 'say "hi"\n\\'}) == (
+        '{host="a",error="say \\"hi\\"\\n\\\\"}'
+    )
@@ -0,0 +1,99 @@
+# Standard library
+import json
+import pstats
+import time
+
+# Third-party
+import pytest
+
+# First-party/Local
+from link_checker import __main__ as link_checker
+from link_checker import profiling, utils
+
+
+@pytest.fixture
+def reset_profile(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE", None)
+    monkeypatch.setattr(profiling, "CPU_PROFILER", None)
+    monkeypatch.setattr(utils, "MEMOIZED_LINKS", {})
+    monkeypatch.setattr(utils, "MAP_BROKEN_LINKS", {})
+
+
+def test_phase(reset_profile):
+    # Nothing is recorded without --profile
+    args = link_checker.parse_arguments(["legalcode"])
+    profiling.start_profile(args)
+    with profiling.phase("parse"):
+        pass
+    assert profiling.PROFILE is None
+
+    args = link_checker.parse_arguments(["legalcode", "--profile-cpu"])
+    profiling.start_profile(args)
+    with profiling.phase("parse", "by_4.0.html"):
+        time.sleep(0.05)
+        # The time of nested phases is not counted twice
+        with profiling.phase("fetch", "by_4.0.html"):
+            time.sleep(0.1)
+    pages = profiling.profile_iter(
+        iter(["page1", "page2"]), "fetch", ["by-sa_4.0.html", "by-nd_4.0.html"]
+    )
+    assert list(pages) == ["page1", "page2"]
+    profiling.set_profile_check("deeds")
+    with profiling.phase("report"):
+        pass
+    report = profiling.get_profile_report()
+    assert report["subcommand"] == "legalcode"
+    assert list(report["phases"]) == ["fetch", "parse", "report"]
+    assert report["phases"]["fetch"]["count"] == 4
+    assert report["phases"]["report"]["count"] == 1
+    legalcode = report["checks"]["legalcode"]
+    assert 0.05 <= legalcode["parse"]["seconds"] < 0.1
+    assert 0.1 <= legalcode["fetch"]["seconds"]
+    assert list(report["checks"]["deeds"]) == ["report"]
+    assert sorted(report["licenses"]) == [
+        "by-nd_4.0.html",
+        "by-sa_4.0.html",
+        "by_4.0.html",
+    ]
+    assert sorted(report["licenses"]["by_4.0.html"]) == ["fetch", "parse"]
+    assert report["duration"] >= 0.15
+
+
+def test_profile_legalcode(reset_profile, http_server, tmpdir, monkeypatch):
+    local_path = tmpdir.mkdir("legalcode")
+    for license_name in ["by_4.0.html", "by-sa_4.0.html"]:
+        local_path.join(license_name).write(
+            f"<a href='{http_server}/status/200'>OK</a>"
+            f"<a href='{http_server}/status/404'>Not Found</a>"
+        )
+    monkeypatch.setattr(utils, "LICENSE_LOCAL_PATH", local_path.strpath)
+    profile = tmpdir.join("profile.json")
+    profile_cpu = tmpdir.join("profile.prof")
+    args = link_checker.parse_arguments(
+        [
+            "legalcode",
+            "--local",
+            "--no-cache",
+            "-qq",
+            "--profile",
+            profile.strpath,
+            "--profile-cpu",
+            profile_cpu.strpath,
+        ]
+    )
+    profiling.start_profile(args)
+    license_names, errors_total, _ = link_checker.check_legalcode(args)
+    assert errors_total == 2
+    profiling.output_profile(args)
+
+    report = json.loads(profile.read())
+    assert list(report["checks"]) == ["legalcode"]
+    assert list(report["phases"]) == profiling.PHASES
+    assert report["phases"]["check"]["count"] == 1
+    assert sorted(report["licenses"]) == sorted(license_names)
+    assert sorted(report["licenses"]["by_4.0.html"]) == ["fetch", "parse"]
+    # Only the CPU-bound phases are profiled
+    stats = pstats.Stats(profile_cpu.strpath)
+    functions = {function for _, _, function in stats.stats}
+    assert "parse_html_links" in functions
+    assert "get_link_responses" not in functions
@@ -0,0 +1,102 @@
+# Standard library
+import subprocess
+import sys
+
+# Third-party
+import pytest
+
+# First-party/Local
+from link_checker import __main__ as link_checker
+from link_checker import constants
+from link_checker.rdf import iter_rdf_licenses
+from link_checker.utils import get_index_rdf
+
+with open(constants.TEST_RDF_LOCAL_PATH) as test_rdf:
+    TEST_RDF = test_rdf.read()
+HEADER, LICENSE = TEST_RDF.split("<cc:License", 1)
+LICENSE = "<cc:License" + LICENSE.split("</cc:License>")[0] + "</cc:License>"
+
+
+def write_index_rdf(path, count):
+    """Writes an index.rdf file with count copies of the test RDF object"""
+    with open(path, "w") as index_rdf:
+        index_rdf.write(HEADER)
+        for idx in range(count):
+            index_rdf.write(LICENSE.replace("/ch/", f"/c{idx}/"))
+        index_rdf.write("</rdf:RDF>\n")
+
+
+def test_iter_rdf_licenses(tmpdir):
+    index_rdf = tmpdir.join("index.rdf")
+    write_index_rdf(index_rdf.strpath, 3)
+    rdf_licenses = list(iter_rdf_licenses(index_rdf.strpath))
+    assert [rdf_license["rdf:about"] for rdf_license in rdf_licenses] == [
+        "http://creativecommons.org/licenses/by-nc-sa/2.5/c0/",
+        "http://creativecommons.org/licenses/by-nc-sa/2.5/c1/",
+        "http://creativecommons.org/licenses/by-nc-sa/2.5/c2/",
+    ]
+    assert str(rdf_licenses[0]) == (
+        '<cc:License rdf:about="http://creativecommons.org/licenses/'
+        'by-nc-sa/2.5/c0/"/>'
+    )
+    assert len(rdf_licenses[0].links) == 14
+    assert rdf_licenses[0].links[0].href == (
+        "http://creativecommons.org/ns#DerivativeWorks"
+    )
+    assert str(rdf_licenses[0].links[0]) == (
+        '<cc:permits rdf:resource="http://creativecommons.org/ns#'
+        'DerivativeWorks"/>'
+    )
+    with pytest.raises(KeyError):
+        rdf_licenses[0]["rdf:resource"]
+    # Parsing stops after limit objects
+    with open(index_rdf.strpath, "rb") as source:
+        rdf_licenses = list(iter_rdf_licenses(source, limit=2))
+    assert len(rdf_licenses) == 2
+    rdf_licenses = list(iter_rdf_licenses(TEST_RDF.encode("utf-8"), 5))
+    assert [rdf_license["rdf:about"] for rdf_license in rdf_licenses] == [
+        "http://creativecommons.org/licenses/by-nc-sa/2.5/ch/"
+    ]
+    assert list(iter_rdf_licenses(b"")) == []
+    assert list(iter_rdf_licenses(b"<html>Not Found</html>")) == []
+
+
+def test_get_index_rdf_limit():
+    args = link_checker.parse_arguments(
+        ["index", "--local-index", "--limit", "1"]
+    )
+    rdf_obj_list = get_index_rdf(
+        args, local_path=constants.TEST_RDF_LOCAL_PATH
+    )
+    assert len(rdf_obj_list) == 1
+
+
+def get_max_rss(path):
+    """Parses an index.rdf file in a new process and returns its peak
+    resident set size (in KiB)
+    """
+    return int(
+        subprocess.check_output(
+            [
+                sys.executable,
+                "-c",
+                "import resource, sys;"
+                "from link_checker.rdf import iter_rdf_licenses;"
+                "assert sum(1 for _ in iter_rdf_licenses(sys.argv[1]));"
+                "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)",
+                path,
+            ]
+        )
+    )
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="requires resource")
+def test_iter_rdf_licenses_memory(tmpdir):
+    small_rdf = tmpdir.join("small.rdf")
+    write_index_rdf(small_rdf.strpath, 100)
+    large_rdf = tmpdir.join("large.rdf")
+    write_index_rdf(large_rdf.strpath, 2000)
+    # Parsing a 20 times larger file (about 20MiB) uses about as much memory
+    assert get_max_rss(large_rdf.strpath) - get_max_rss(small_rdf.strpath) < (
+        5 * 2**10
+    )
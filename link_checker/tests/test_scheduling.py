@@ -0,0 +1,261 @@
+# Standard library
+import time
+
+# Third-party
+import pytest
+
+# First-party/Local
+from link_checker import __main__ as link_checker
+from link_checker import cache, engines, metrics, scheduling, utils
+from link_checker.cache import cache_statuses, close_cache, open_cache
+from link_checker.scheduling import (
+    check_fail_fast,
+    is_stopped,
+    iter_until_stopped,
+    prioritize_links,
+    read_previous_errors,
+    start_schedule,
+    stop_checks,
+)
+from link_checker.utils import CheckerError
+
+
+@pytest.fixture
+def reset_schedule(monkeypatch):
+    monkeypatch.setattr(scheduling, "STOP_REASON", None)
+    monkeypatch.setattr(scheduling, "DEADLINE", None)
+    monkeypatch.setattr(scheduling, "UNCHECKED_PAGES", 0)
+    monkeypatch.setitem(metrics.LINK_STATISTICS, "unique_links", 0)
+    monkeypatch.setitem(metrics.LINK_STATISTICS, "unchecked_links", 0)
+    monkeypatch.setattr(utils, "MEMOIZED_LINKS", {})
+    monkeypatch.setattr(utils, "MAP_BROKEN_LINKS", {})
+
+
+def test_read_previous_errors(tmpdir):
+    error_file = tmpdir.join("errorlog.txt")
+    error_file.write(
+        "Number of unique broken links: 2\n\n"
+        "\nBroken link - https://example.com/a found in:\n"
+        "https://creativecommons.org/licenses/by/4.0/\n"
+        "\nBroken link - https://example.com/b (confirmed broken on re-check)"
+        " found in:\n"
+        "https://creativecommons.org/licenses/by/4.0/\n"
+    )
+    assert read_previous_errors(error_file.strpath) == {
+        "https://example.com/a",
+        "https://example.com/b",
+    }
+    with pytest.raises(CheckerError, match="does not exist"):
+        read_previous_errors(tmpdir.join("missing.txt").strpath)
+
+
+def test_prioritize_links(tmpdir):
+    error_file = tmpdir.join("errorlog.txt")
+    error_file.write("Broken link - https://example.com/listed found in:\n")
+    args = link_checker.parse_arguments(
+        ["deeds", "--prioritize-from", error_file.strpath]
+    )
+    links = [
+        "https://example.com/recent",
+        "https://example.com/old",
+        "https://example.com/new",
+        "https://example.com/broken",
+        "https://example.com/listed",
+    ]
+    # Without history, the links are checked in their original order
+    no_history_args = link_checker.parse_arguments(["deeds"])
+    assert prioritize_links(no_history_args, links) == links
+    open_cache(args, cache_dir=tmpdir.strpath)
+    cache_statuses(["https://example.com/old"], [200])
+    cache.CACHE.execute("UPDATE links SET checked = checked - 3600")
+    cache_statuses(
+        ["https://example.com/recent", "https://example.com/broken"],
+        [200, 404],
+    )
+    assert prioritize_links(args, links) == [
+        "https://example.com/broken",
+        "https://example.com/listed",
+        "https://example.com/new",
+        "https://example.com/old",
+        "https://example.com/recent",
+    ]
+    # Links found in more pages are checked first
+    assert prioritize_links(args, links, [1, 1, 1, 1, 1]) == [
+        "https://example.com/broken",
+        "https://example.com/listed",
+        "https://example.com/new",
+        "https://example.com/old",
+        "https://example.com/recent",
+    ]
+    assert prioritize_links(args, links, [1, 1, 1, 1, 2])[0] == (
+        "https://example.com/listed"
+    )
+    assert prioritize_links(args, links, [3, 1, 1, 1, 1])[3:] == [
+        "https://example.com/recent",
+        "https://example.com/old",
+    ]
+    close_cache()
+
+
+def test_check_fail_fast(reset_schedule):
+    link = "https://example.com/"
+    args = link_checker.parse_arguments(["deeds"])
+    check_fail_fast(args, link, 404)
+    assert not is_stopped()
+    args = link_checker.parse_arguments(["deeds", "--fail-fast"])
+    # Not confirmed yet: checked again with a GET request or re-checked
+    for response in [200, 405, "Connection Error", 503, "Host Unavailable"]:
+        check_fail_fast(args, link, response)
+    assert not is_stopped()
+    check_fail_fast(args, link, 405, method="get")
+    assert is_stopped()
+    assert scheduling.STOP_REASON.endswith(link)
+    start_schedule(args)
+    assert not is_stopped()
+    args = link_checker.parse_arguments(
+        ["deeds", "--fail-fast", "--no-recheck"]
+    )
+    check_fail_fast(args, link, "Connection Error")
+    assert is_stopped()
+
+
+def test_fail_fast(reset_schedule, http_server, tmpdir, monkeypatch):
+    local_path = tmpdir.mkdir("legalcode")
+    local_path.join("by_4.0.html").write(
+        f"<a href='{http_server}/status/404'>Not Found</a>"
+        + "".join(
+            f"<a href='{http_server}/status/200?{idx}'>OK</a>"
+            for idx in range(20)
+        )
+    )
+    monkeypatch.setattr(utils, "LICENSE_LOCAL_PATH", local_path.strpath)
+    args = link_checker.parse_arguments(
+        [
+            "legalcode",
+            "--local",
+            "--no-cache",
+            "--fail-fast",
+            "--max-concurrency",
+            "1",
+            "-qq",
+        ]
+    )
+    _, errors_total, exit_status = link_checker.check_legalcode(args)
+    assert errors_total == 1
+    assert exit_status == 1
+    assert is_stopped()
+    # The links after the broken link were not requested (nor reported)
+    assert len(utils.MEMOIZED_LINKS) < 21
+    assert all(
+        status != "Not Checked" for status in utils.MEMOIZED_LINKS.values()
+    )
+
+
+def test_max_duration(reset_schedule, http_server, tmpdir, monkeypatch):
+    local_path = tmpdir.mkdir("legalcode")
+    local_path.join("by_4.0.html").write(
+        "".join(
+            f"<a href='{http_server}/delay/0.1?{idx}'>Slow</a>"
+            for idx in range(10)
+        )
+    )
+    monkeypatch.setattr(utils, "LICENSE_LOCAL_PATH", local_path.strpath)
+    monkeypatch.chdir(tmpdir)
+    args = link_checker.parse_arguments(
+        [
+            "legalcode",
+            "--local",
+            "--no-cache",
+            "--max-duration",
+            "0.25",
+            "--max-concurrency",
+            "1",
+            "--output-errors",
+            "-qq",
+        ]
+    )
+    monkeypatch.setattr(scheduling, "START_TIME", time.time())
+    start_schedule(args)
+    license_names, errors_total, exit_status = link_checker.check_legalcode(
+        args
+    )
+    assert (errors_total, exit_status) == (0, 0)
+    assert is_stopped()
+    checked = len(utils.MEMOIZED_LINKS)
+    assert 0 < checked < 10
+    coverage = metrics.get_coverage(scheduling.get_stop_reason())
+    assert coverage["links"] == 10
+    assert coverage["unchecked"] == 10 - checked
+    # The partial report states the coverage of the run
+    utils.output_summaries(args, license_names, errors_total, coverage)
+    args.output_errors.close()
+    error_log = tmpdir.join("errorlog.txt").read()
+    assert (
+        f"Coverage: {checked} of 10 unique links checked ({checked / 10:.1%}),"
+        " stopped as the time budget of the run was used (--max-duration)\n"
+    ) in error_log
+    junit = tmpdir.join("test-summary", "junit-xml-report.xml").read()
+    assert f'<property name="links_checked" value="{checked}"/>' in junit
+    unchecked = 10 - checked
+    assert f'<skipped type="skipped" message="{unchecked} of 10' in junit
+
+
+def test_iter_until_stopped(reset_schedule):
+    pages = []
+    for page in iter_until_stopped(["a", "b", "c", "d"]):
+        pages.append(page)
+        if page == "b":
+            stop_checks("test")
+    assert pages == ["a", "b"]
+    assert scheduling.UNCHECKED_PAGES == 2
+
+
+def test_recheck_stopped(reset_schedule, monkeypatch):
+    links = ["https://example.com/a", "https://example.com/b"]
+    responses = [503, "Connection Error"]
+    args = link_checker.parse_arguments(["deeds"])
+    # Links that are not re-checked keep the response of the first pass
+    monkeypatch.setattr(
+        engines,
+        "get_link_responses",
+        lambda args, links: [200] + ["Not Checked"] * (len(links) - 1),
+    )
+    assert engines.recheck_link_responses(args, links, responses) == [
+        200,
+        "Connection Error",
+    ]
+    stop_checks("test")
+    assert engines.recheck_link_responses(args, links, responses) == responses
+
+
+def test_max_duration_pages(reset_schedule, tmpdir, monkeypatch):
+    local_path = tmpdir.mkdir("legalcode")
+    for name in ["by_4.0.html", "by-sa_4.0.html", "by-nd_4.0.html"]:
+        local_path.join(name).write("<a href='https://example.com/'>A</a>")
+    monkeypatch.chdir(tmpdir)
+    monkeypatch.setattr(
+        "sys.argv",
+        [
+            "link_checker",
+            "legalcode",
+            "--local",
+            "--local-path",
+            local_path.strpath,
+            "--no-cache",
+            "--max-duration",
+            "0.001",
+            "-qq",
+        ],
+    )
+    # The time budget is used before the first page is parsed, so no page
+    # is parsed and the partial run exits with PARTIAL_EXIT_STATUS
+    with pytest.raises(SystemExit) as exit_info:
+        link_checker.main()
+    assert exit_info.value.code == 3
+    assert scheduling.UNCHECKED_PAGES == 3
+    assert utils.MEMOIZED_LINKS == {}
+    coverage = metrics.get_coverage(scheduling.get_stop_reason())
+    assert utils.get_coverage_summary(coverage) == (
+        "Coverage: 0 of 0 unique links checked, 3 pages not checked, stopped"
+        " as the time budget of the run was used (--max-duration)"
+    )
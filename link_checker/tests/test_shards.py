@@ -0,0 +1,170 @@
+# Standard library
+import argparse
+import json
+
+# Third-party
+import pytest
+
+# First-party/Local
+from link_checker import __main__ as link_checker
+from link_checker import utils
+from link_checker.rdf import RdfLicense
+from link_checker.shards import (
+    get_license_group,
+    get_rdf_group,
+    get_shard,
+    parse_shard,
+)
+from link_checker.utils import CheckerError, read_shard_results
+
+LICENSE_NAMES = [
+    f"{unit}_{version}{suffix}.html"
+    for version in ["4.0", "3.0", "2.5"]
+    for unit in ["by", "by-sa", "by-nc"]
+    for suffix in ["", "_de", "_fr", "_it", "_nl"][: len(unit) + 1]
+]
+
+
+def test_parse_shard():
+    assert parse_shard("1/4") == (1, 4)
+    assert parse_shard("4/4") == (4, 4)
+    for value in ["0/4", "5/4", "1/0", "1", "a/b", "1/2/3"]:
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_shard(value)
+
+
+def test_get_groups():
+    assert get_license_group("by-sa_3.0_de.html") == "by-sa_3.0"
+    assert get_license_group("by_4.0.html") == "by_4.0"
+    assert get_license_group("zero_1.0.html") == "zero_1.0"
+    rdf_obj = RdfLicense("http://creativecommons.org/licenses/by/2.5/ch/", [])
+    assert get_rdf_group(rdf_obj) == "by_2.5"
+    assert get_rdf_group(RdfLicense(None, [])) == ""
+
+
+@pytest.mark.parametrize("count", [1, 2, 3, 5, 40])
+def test_get_shard(count):
+    groups = [get_license_group(name) for name in LICENSE_NAMES]
+    shards = [
+        get_shard(LICENSE_NAMES, groups, (index, count))
+        for index in range(1, count + 1)
+    ]
+    # Every license is in exactly one shard, in the original order
+    assert sorted(name for shard in shards for name in shard) == sorted(
+        LICENSE_NAMES
+    )
+    for shard in shards:
+        assert shard == [name for name in LICENSE_NAMES if name in shard]
+    # Shards are balanced
+    sizes = [len(shard) for shard in shards]
+    assert max(sizes) - min(sizes) <= 1
+    # Licenses of the same group are kept together, except for the groups at
+    # the boundaries of the shards
+    split_groups = {
+        get_license_group(name)
+        for idx, shard in enumerate(shards)
+        for name in shard
+        for other_shard in shards[idx + 1 :]  # noqa: E203
+        if get_license_group(name) in map(get_license_group, other_shard)
+    }
+    assert len(split_groups) <= count - 1
+    # The partition is deterministic
+    assert shards[0] == get_shard(LICENSE_NAMES, groups, (1, count))
+
+
+def test_shard_arguments():
+    args = link_checker.parse_arguments(["combined", "--shard", "2/3"])
+    assert args.shard == (2, 3)
+    assert args.shard_output == "shard-2-of-3.json"
+    assert args.output_errors.getvalue() == ""
+    args = link_checker.parse_arguments(
+        ["legalcode", "--shard=1/2", "--shard-output", "legalcode.json"]
+    )
+    assert args.shard_output == "legalcode.json"
+    with pytest.raises(SystemExit):
+        link_checker.parse_arguments(["legalcode", "--shard-output=s.json"])
+    with pytest.raises(SystemExit):
+        link_checker.parse_arguments(
+            ["legalcode", "--shard=1/2", "--output-errors"]
+        )
+    args = link_checker.parse_arguments(["merge", "s1.json", "s2.json"])
+    assert args.shard_results == ["s1.json", "s2.json"]
+
+
+def test_read_shard_results(tmpdir):
+    paths = []
+    for index in [2, 1, 3]:
+        path = tmpdir.join(f"shard-{index}.json")
+        path.write(json.dumps({"shard": [index, 3]}))
+        paths.append(path.strpath)
+    results = read_shard_results(paths)
+    assert [result["shard"] for result in results] == [[1, 3], [2, 3], [3, 3]]
+    with pytest.raises(CheckerError, match=r"found: 1/3, 2/3\)$"):
+        read_shard_results(paths[:2])
+    with pytest.raises(CheckerError, match="does not exist"):
+        read_shard_results([tmpdir.join("missing.json").strpath])
+    # Shards of different subcommands or options are not merged
+    tmpdir.join("shard-3.json").write(
+        json.dumps({"shard": [3, 3], "subcommand": "deeds"})
+    )
+    with pytest.raises(CheckerError, match=r"\(subcommand: None in shard 1"):
+        read_shard_results(paths)
+    tmpdir.join("shard-3.json").write(
+        json.dumps({"shard": [3, 3], "options": {"limit": 10}})
+    )
+    with pytest.raises(CheckerError, match="different runs"):
+        read_shard_results(paths)
+    tmpdir.join("invalid.json").write("{")
+    with pytest.raises(CheckerError, match="Invalid shard result"):
+        read_shard_results([tmpdir.join("invalid.json").strpath])
+
+
+def test_merge_shards(http_server, tmpdir, monkeypatch):
+    local_path = tmpdir.mkdir("legalcode")
+    for license_name in LICENSE_NAMES:
+        local_path.join(license_name).write(
+            f"<a href='{http_server}/status/200'>OK</a>"
+            f"<a href='{http_server}/status/404'>Not Found</a>"
+            f"<a href='{http_server}/status/{license_name[:2]}'>Error</a>"
+        )
+    monkeypatch.setattr(utils, "LICENSE_LOCAL_PATH", local_path.strpath)
+    monkeypatch.chdir(tmpdir)
+    shard_results = []
+    for index in [1, 2]:
+        monkeypatch.setattr(utils, "MEMOIZED_LINKS", {})
+        monkeypatch.setattr(utils, "MAP_BROKEN_LINKS", {})
+        args = link_checker.parse_arguments(
+            ["legalcode", "--local", "--shard", f"{index}/2", "-qq"]
+        )
+        (
+            license_names,
+            errors_total,
+            exit_status,
+        ) = link_checker.check_legalcode(args)
+        assert 0 < len(license_names) < len(LICENSE_NAMES)
+        utils.output_shard_result(
+            args, license_names, errors_total, exit_status
+        )
+        shard_results.append(args.shard_output)
+    assert shard_results == ["shard-1-of-2.json", "shard-2-of-2.json"]
+
+    monkeypatch.setattr(utils, "MEMOIZED_LINKS", {})
+    monkeypatch.setattr(utils, "MAP_BROKEN_LINKS", {})
+    args = link_checker.parse_arguments(
+        ["merge", *shard_results, "--output-errors", "-qq"]
+    )
+    license_names, errors_total, exit_status = link_checker.merge_shards(args)
+    assert sorted(license_names) == sorted(LICENSE_NAMES)
+    # The 404 link and the invalid status links (/status/by) are broken
+    assert errors_total == 2 * len(LICENSE_NAMES)
+    assert exit_status == 1
+    assert len(utils.MAP_BROKEN_LINKS[f"{http_server}/status/404"]) == len(
+        LICENSE_NAMES
+    )
+    utils.output_summaries(args, license_names, errors_total)
+    args.output_errors.close()
+    error_log = tmpdir.join("errorlog.txt").read()
+    assert error_log.count("\nURL: ") == len(LICENSE_NAMES)
+    assert f"Total files checked: {len(LICENSE_NAMES)}" in error_log
+    assert "Number of unique broken links: 2\n" in error_log
+    assert tmpdir.join("test-summary", "junit-xml-report.xml").check()
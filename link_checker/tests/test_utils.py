@@ -1,4 +1,6 @@
 # Standard library
+import array
+import time
 from urllib.parse import urlsplit
 
 # Third-party
@@ -14,17 +16,26 @@ from ..utils import (
     CheckerError,
     create_absolute_link,
     create_base_link,
+    create_session,
     exception_handler,
     get_github_legalcode,
+    get_html_links_concurrently,
     get_index_rdf,
     get_links_from_rdf,
     get_memoized_result,
+    get_page,
+    get_pool_statistics,
+    get_rechecked_links,
     get_scrapable_links,
+    get_unique_links,
     map_links_file,
     memoize_result,
+    normalize_link,
     output_issues_summary,
     output_test_summary,
     output_write,
+    prefetch_text,
+    record_recheck,
     request_local_text,
     request_text,
     write_response,
@@ -35,6 +46,7 @@ from ..utils import (
 def reset_global():
     utils.MEMOIZED_LINKS = {}
     utils.MAP_BROKEN_LINKS = {}
+    utils.RECHECKED_LINKS = {}
     return
 
 
@@ -185,6 +197,41 @@ def test_output_issues_summary(reset_global, tmpdir):
     assert lines[i] == "https://file4.url/here\n"
 
 
+def test_output_issues_summary_rechecked(reset_global, tmpdir):
+    output_file = tmpdir.join("errorlog.txt")
+    args = link_checker.parse_arguments(
+        ["deeds", "--output-errors", output_file.strpath]
+    )
+    utils.MAP_BROKEN_LINKS = {
+        "https://link1.demo": ["https://file1.url/here"],
+        "https://link2.demo": ["https://file2.url/here"],
+    }
+    record_recheck("https://link1.demo", "Timeout Error", "Connection Error")
+    record_recheck("https://link3.demo", "ReadTimeout", 200)
+    assert get_rechecked_links() == (
+        ["https://link3.demo"],
+        ["https://link1.demo"],
+    )
+    output_issues_summary(args, ["some link"], 2)
+    args.output_errors.close()
+    text = output_file.read()
+    assert (
+        "Number of error links: 2\n"
+        "Number of links re-checked after a transient failure: 2 (1 failed"
+        " once and recovered, 1 confirmed broken)\n"
+        "Number of unique broken links: 2\n"
+    ) in text
+    assert (
+        "Broken link - https://link1.demo (confirmed broken on re-check)"
+        " found in:\n"
+    ) in text
+    assert "Broken link - https://link2.demo found in:\n" in text
+    assert text.endswith(
+        "\nRecovered links (failed once, then responded):\n"
+        "https://link3.demo (first check: ReadTimeout, re-check: 200)\n"
+    )
+
+
 @pytest.mark.parametrize(
     "link, result",
     [
@@ -205,6 +252,35 @@ def test_create_absolute_link(link, result):
     assert res == result
 
 
+@pytest.mark.parametrize(
+    "link, https, result",
+    [
+        ("https://example.com/a/#foo", False, "https://example.com/a/"),
+        ("HTTPS://Example.COM/A/", False, "https://example.com/A/"),
+        ("https://example.com:443/a", False, "https://example.com/a"),
+        ("http://example.com:80/a", False, "http://example.com/a"),
+        ("http://example.com:443/a", False, "http://example.com:443/a"),
+        ("https://example.com", False, "https://example.com/"),
+        ("https://example.com/%7euser", False, "https://example.com/~user"),
+        ("https://example.com/a%2fb", False, "https://example.com/a%2Fb"),
+        (
+            "https://example.com/?q=%41%3d",
+            False,
+            "https://example.com/?q=A%3D",
+        ),
+        ("https://User@Example.com/", False, "https://User@example.com/"),
+        # Trailing slashes are kept (they may identify different resources)
+        ("https://example.com/a", False, "https://example.com/a"),
+        ("http://example.com/a", True, "https://example.com/a"),
+        ("http://example.com:8080/a", True, "https://example.com:8080/a"),
+        ("mailto:Someone@Example.com", True, "mailto:Someone@Example.com"),
+        ("http://example.com:port/", False, "http://example.com:port/"),
+    ],
+)
+def test_normalize_link(link, https, result):
+    assert normalize_link(link, https) == result
+
+
 def test_get_scrapable_links():
     args = link_checker.parse_arguments(["deeds"])
     test_file = (
@@ -315,7 +391,10 @@ def test_map_links_file(reset_global):
     for idx, link in enumerate(links):
         file_url = file_urls[idx]
         map_links_file(link, file_url)
-    assert utils.MAP_BROKEN_LINKS == {
+    assert {
+        link: list(file_urls)
+        for link, file_urls in utils.MAP_BROKEN_LINKS.items()
+    } == {
         "link1": ["file1", "file3"],
         "link2": ["file1"],
     }
@@ -411,6 +490,36 @@ def test_get_memoized_result(reset_global):
     )
 
 
+def test_get_memoized_result_normalized(reset_global):
+    valid_links = [
+        "https://creativecommons.org/licenses/by/4.0/#foo",
+        "HTTPS://CreativeCommons.org:443/licenses/by/4.0/",
+        "http://creativecommons.org/licenses/by/4.0/",
+        "http://creativecommons.org/licenses/by/3.0/",
+    ]
+    valid_anchors = ["a1", "a2", "a3", "a4"]
+    utils.MEMOIZED_LINKS = {
+        "https://creativecommons.org/licenses/by/4.0/": 200,
+    }
+    (
+        stored_links,
+        _,
+        stored_result,
+        check_links,
+        check_anchors,
+    ) = get_memoized_result(valid_links, valid_anchors)
+    # The original links are reported, the normalized links are checked
+    assert stored_links == valid_links[:2]
+    assert stored_result == [200, 200]
+    assert check_links == valid_links[2:]
+    assert check_anchors == ["a3", "a4"]
+    stored_links, _, _, check_links, _ = get_memoized_result(
+        valid_links, valid_anchors, https=True
+    )
+    assert stored_links == valid_links[:3]
+    assert check_links == ["https://creativecommons.org/licenses/by/3.0/"]
+
+
 def test_memoize_result(reset_global):
     check_links = [
         # Good response
@@ -492,3 +601,112 @@ def test_output_test_summary(errors_total, map_links, tmpdir):
                 test_summary.readline()
                 == "Number of unique broken links: 2</failure>\n"
             )
+
+
+def test_get_page():
+    text = "<a href='link1'>\nLink 1</a>, <a href='link2'>Link 2</a>"
+    soup = BeautifulSoup(text, "lxml")
+    valid_anchors = soup.find_all("a")
+    page = get_page(
+        "by_4.0.html",
+        "https://baseurl/goes/here",
+        "context",
+        ["link1", "link2"],
+        valid_anchors,
+        True,
+    )
+    assert page == {
+        "name": "by_4.0.html",
+        "base_url": "https://baseurl/goes/here",
+        "context": "context",
+        "context_printed": True,
+        "links": ["link1", "link2"],
+        "anchors": [
+            '<a href="link1">Link 1</a>',
+            '<a href="link2">Link 2</a>',
+        ],
+    }
+
+
+def test_get_unique_links():
+    pages = [
+        {"links": ["link1", "link2", "link1"]},
+        {"links": ["link2", "link3"]},
+    ]
+    unique_links = get_unique_links(pages)
+    assert unique_links == {
+        "link1": array.array("I", [0, 0]),
+        "link2": array.array("I", [0, 1]),
+        "link3": array.array("I", [1]),
+    }
+
+
+def test_get_unique_links_normalized():
+    pages = [
+        {
+            "links": [
+                "https://creativecommons.org/licenses/by/4.0/#foo",
+                "https://creativecommons.org/licenses/by/4.0/",
+                "http://creativecommons.org/licenses/by/4.0/",
+            ]
+        },
+        {"links": ["https://CREATIVECOMMONS.ORG/licenses/by/4.0/"]},
+    ]
+    assert get_unique_links(pages) == {
+        "https://creativecommons.org/licenses/by/4.0/": array.array(
+            "I", [0, 0, 1]
+        ),
+        "http://creativecommons.org/licenses/by/4.0/": array.array("I", [0]),
+    }
+    assert list(get_unique_links(pages, https=True)) == [
+        "https://creativecommons.org/licenses/by/4.0/"
+    ]
+
+
+def test_get_pool_statistics(http_server):
+    session = create_session(pool_maxsize=2)
+    assert utils.get_session() is session
+    for _ in range(3):
+        request_text(f"{http_server}/status/200")
+    statistics = get_pool_statistics()
+    assert statistics == {
+        "hosts": 1,
+        "requests": 3,
+        "connections": 1,
+        "open_sockets": 1,
+    }
+
+
+def test_prefetch_text(http_server):
+    args = link_checker.parse_arguments(["deeds", "--fetch-workers", "2"])
+    page_urls = [f"{http_server}/delay/0.2"] * 4 + [f"{http_server}/etag/a"]
+    start_time = time.time()
+    assert list(prefetch_text(args, page_urls)) == [b""] * 4 + [
+        b"<a href='/a'>a</a>"
+    ]
+    assert time.time() - start_time < 0.7
+    with pytest.raises(CheckerError):
+        list(prefetch_text(args, ["http://doesnotexist.invalid/"]))
+
+
+@pytest.mark.filterwarnings(
+    "error::pytest.PytestUnhandledThreadExceptionWarning"
+)
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_get_html_links_concurrently(jobs):
+    args = link_checker.parse_arguments(["legalcode", "--jobs", str(jobs)])
+    base_urls = [f"https://www.demourl.com/page{idx}" for idx in range(10)]
+    source_htmls = (
+        f"<a href='/link{idx}'>Link</a> <a href='#top'>Top</a>"
+        for idx in range(10)
+    )
+    results = list(get_html_links_concurrently(args, base_urls, source_htmls))
+    assert results == [
+        (
+            2,
+            [f'<a href="/link{idx}">Link</a>'],
+            [f"https://www.demourl.com/link{idx}"],
+            [],
+        )
+        for idx in range(10)
+    ]
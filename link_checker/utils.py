@@ -2,18 +2,40 @@
 """
 
 # Standard library
+import array
+import collections
+import functools
+import hashlib
+import json
+import multiprocessing
 import os
 import posixpath
 import re
+import string
+import subprocess
+import sys
 import time
-from urllib.parse import urljoin, urlsplit
+from concurrent.futures import Future, ProcessPoolExecutor
+from urllib.parse import urljoin, urlsplit, urlunsplit
 
 # Third-party
 import requests
-from bs4 import BeautifulSoup
+from gevent import get_hub
+from gevent.pool import Pool
 from junit_xml import TestCase, TestSuite, to_xml_report_file
 
 # Local
+from .anchors import get_anchors
+from .cache import (
+    cache_extract,
+    cache_page,
+    cache_statuses,
+    get_cached_extract,
+    get_cached_page,
+    get_cached_status,
+    get_manifest_entry,
+    update_manifest,
+)
 from .constants import (
     DEBUG,
     ERROR,
@@ -25,11 +47,28 @@ from .constants import (
     LICENSE_LOCAL_PATH,
     MAP_BROKEN_LINKS,
     MEMOIZED_LINKS,
+    POOL_CONNECTIONS,
+    RECHECKED_LINKS,
+    REQUESTS_POOL_SIZE,
     REQUESTS_TIMEOUT,
     START_TIME,
     TEST_ORDER,
     WARNING,
 )
+from .profiling import phase, profile_iter
+from .rdf import iter_rdf_licenses
+from .shards import get_license_group, get_rdf_group, get_shard
+
+SESSION = None
+# Options that change which pages and links a shard checks, which must be the
+# same for all the shards of a run (see read_shard_results)
+SHARD_OPTIONS = ["root_url", "limit", "local", "local_index", "http_as_https"]
+# Ports removed from normalized links (see normalize_link)
+DEFAULT_PORTS = {"http": 80, "https": 443}
+PERCENT_ENCODING = re.compile("%[0-9A-Fa-f]{2}")
+UNRESERVED_CHARACTERS = frozenset(
+    string.ascii_letters + string.digits + "-._~"
+)
 
 
 class CheckerError(Exception):
@@ -96,13 +135,19 @@ def get_legalcode(args):
     if args.local:
         if args.log_level == DEBUG:
             print("DEBUG: processing local legalcode files")
-        license_names = get_local_legalcode()
+        license_names = get_local_legalcode(args.local_path)
     else:
         if args.log_level == DEBUG:
             print("DEBUG: processing GitHub legalcode files")
         license_names = get_github_legalcode()
     if args.limit and args.subcommand != "rdf":
         license_names = license_names[0 : args.limit]  # noqa: E203
+    if "shard" in args and args.shard:
+        license_names = get_shard(
+            license_names,
+            [get_license_group(name) for name in license_names],
+            args.shard,
+        )
     return license_names
 
 
@@ -138,17 +183,22 @@ def get_github_legalcode():
     return license_names
 
 
-def get_local_legalcode():
+def get_local_legalcode(local_path=None):
     """This function get all the legalcode stored locally
 
+    Args:
+        local_path (str): Directory containing the legalcode files (defaults
+            to LICENSE_LOCAL_PATH)
+
     Returns:
         list: list of file names of license file
     """
+    local_path = local_path or LICENSE_LOCAL_PATH
     try:
-        license_names_unordered = os.listdir(LICENSE_LOCAL_PATH)
+        license_names_unordered = os.listdir(local_path)
     except FileNotFoundError:
         raise CheckerError(
-            "Local license path({}) does not exist".format(LICENSE_LOCAL_PATH)
+            "Local license path({}) does not exist".format(local_path)
         )
     # Catching permission denied(OS ERROR) or other errors
     except:
@@ -169,15 +219,20 @@ def get_local_legalcode():
     return license_names
 
 
-def get_rdf(args):
+def get_rdf(args, license_names=None):
     """Helper function that determines RDF urls
     from license_names found locally or on github and
     returns a list of valid rdf objects.
 
+    Parameters:
+        license_names: list of license file names (looked up with
+                       get_legalcode if not supplied)
     Returns:
         rdf_obj_list: list of rdf objects
     """
-    license_names = get_legalcode(args)
+    if license_names is None:
+        with phase("discovery"):
+            license_names = get_legalcode(args)
     rdf_urls = []
     rdf_obj_list = []
     for license_name in license_names:
@@ -189,13 +244,17 @@ def get_rdf(args):
     unique_rdf_urls = list(set(rdf_urls))
     if args.limit:
         unique_rdf_urls = unique_rdf_urls[0 : args.limit]  # noqa: E203
-    for url in unique_rdf_urls:
-        if url:
-            page_text = request_text(url)
-            soup = BeautifulSoup(page_text, "xml")
-            rdf = soup.find("cc:License")
-            if rdf is not None:
-                rdf_obj_list.append(rdf)
+    page_texts = profile_iter(
+        prefetch_text(args, unique_rdf_urls), "fetch", unique_rdf_urls
+    )
+    # Imported here as link_checker.scheduling depends on this module
+    from .scheduling import iter_until_stopped
+
+    for rdf_url in iter_until_stopped(unique_rdf_urls):
+        page_text = next(page_texts)
+        with phase("parse", rdf_url):
+            rdf_obj_list.extend(iter_rdf_licenses(page_text, limit=1))
+    page_texts.close()
     return rdf_obj_list
 
 
@@ -207,30 +266,36 @@ def get_index_rdf(args, local_path=""):
         rdf_obj_list: list of RDF objects found in index.rdf
     """
     if args.local_index:
-        rdf_obj_list = get_local_index_rdf(local_path)
+        rdf_obj_list = get_local_index_rdf(local_path, args.limit)
     else:
-        rdf_obj_list = get_remote_index_rdf()
-    if args.limit:
-        rdf_obj_list = rdf_obj_list[0 : args.limit]  # noqa: E203
+        rdf_obj_list = get_remote_index_rdf(args.limit)
+    if "shard" in args and args.shard:
+        rdf_obj_list = get_shard(
+            rdf_obj_list,
+            [get_rdf_group(rdf_obj) for rdf_obj in rdf_obj_list],
+            args.shard,
+        )
     return rdf_obj_list
 
 
-def get_remote_index_rdf():
+def get_remote_index_rdf(limit=0):
     """This function reads RDFs found at
     https://creativecommons.org/licenses/index.rdf
 
+    Parameters:
+        limit: maximum number of RDF objects to parse (0 for all)
     Returns:
         rdf_obj_list: list of rdf objects found in index.rdf
     """
     URL = "https://creativecommons.org/licenses/index.rdf"
-    page_text = request_text(URL)
-    soup = BeautifulSoup(page_text, "xml")
-    rdfs = soup.find_all("cc:License")
-    rdf_obj_list = list(rdfs)
+    with phase("fetch"):
+        page_text = request_text(URL)
+    with phase("parse"):
+        rdf_obj_list = list(iter_rdf_licenses(page_text, limit))
     return rdf_obj_list
 
 
-def get_local_index_rdf(local_path=""):
+def get_local_index_rdf(local_path="", limit=0):
     """This function reads from index.rdf stored locally
 
     Parameters:
@@ -238,46 +303,113 @@ def get_local_index_rdf(local_path=""):
                     the INDEX_RDF_LOCAL_PATH constant is used
                     (which uses your environment or defaults to
                     "./index.rdf"; see constants.py)
+        limit: maximum number of RDF objects to parse (0 for all)
     Returns:
         rdf_obj_list: list of RDF objects found in index.rdf
     """
     try:
         local_path = local_path or INDEX_RDF_LOCAL_PATH
-        with open(local_path, "rb") as index_rdf:
-            rdf_text = index_rdf.read()
+        with open(local_path, "rb") as index_rdf, phase("parse"):
+            # The file is parsed as it is read
+            rdf_obj_list = list(iter_rdf_licenses(index_rdf, limit))
     except FileNotFoundError:
         raise CheckerError(
             f"Local index.rdf path({local_path}) does not exist"
         )
     except:
         raise
-    soup = BeautifulSoup(rdf_text, "xml")
-    rdfs = soup.find_all("cc:License")
-    rdf_obj_list = list(rdfs)
     return rdf_obj_list
 
 
 def get_links_from_rdf(rdf_obj):
     """This function parses an RDF and returns links found
     Parameters:
-        rdf_obj: soup object
+        rdf_obj: RdfLicense record (see link_checker.rdf)
     Returns:
-        links_found: list of link dictionaries found in RDF soup object
+        links_found: list of link dictionaries found in RDF object
     """
-    tags = rdf_obj.findChildren()
     links_found = []
-    for tag in tags:
+    for tag in rdf_obj.links:
         # check link to deed and resources
-        link = {"tag": tag, "href": ""}
-        if tag.has_attr("rdf:resource"):
-            link["href"] = tag["rdf:resource"]
-            links_found.append(link)
-        if tag.has_attr("rdf:about"):
-            link["href"] = tag["rdf:resource"]
-            links_found.append(link)
+        links_found.append({"tag": tag, "href": tag.href})
     return links_found
 
 
+def create_session(pool_maxsize=REQUESTS_POOL_SIZE):
+    """Creates the requests session shared by all page fetches and link
+    checks, so that connections are kept alive and reused across requests
+
+    Args:
+        pool_maxsize (int): Number of connections kept alive per host
+
+    Returns:
+        class 'requests.Session': the shared session
+    """
+    global SESSION
+    SESSION = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=POOL_CONNECTIONS, pool_maxsize=pool_maxsize
+    )
+    SESSION.mount("http://", adapter)
+    SESSION.mount("https://", adapter)
+    return SESSION
+
+
+def get_session():
+    """Returns the shared requests session (see create_session)"""
+    if SESSION is None:
+        return create_session()
+    return SESSION
+
+
+def get_pool_statistics():
+    """Collects connection pool statistics of the shared session
+
+    Returns:
+        dict: hosts - Number of hosts connected to
+              requests - Number of requests made
+              connections - Number of connections opened
+              open_sockets - Number of idle connections kept alive
+    """
+    statistics = {
+        "hosts": 0,
+        "requests": 0,
+        "connections": 0,
+        "open_sockets": 0,
+    }
+    if SESSION is None:
+        return statistics
+    pools = []
+    for adapter in set(SESSION.adapters.values()):
+        pool_manager = adapter.poolmanager
+        pools += [pool_manager.pools[key] for key in pool_manager.pools.keys()]
+    for pool in pools:
+        statistics["hosts"] += 1
+        statistics["requests"] += pool.num_requests
+        statistics["connections"] += pool.num_connections
+        if pool.pool is not None:
+            statistics["open_sockets"] += sum(
+                1 for conn in list(pool.pool.queue) if conn is not None
+            )
+    return statistics
+
+
+def output_pool_statistics(args):
+    """Prints connection pool statistics of the shared session"""
+    if args.log_level > INFO:
+        return
+    statistics = get_pool_statistics()
+    if not statistics["requests"]:
+        return
+    reused = statistics["requests"] - statistics["connections"]
+    print(
+        f"\nConnection pool: {statistics['requests']} requests to"
+        f" {statistics['hosts']} hosts over {statistics['connections']}"
+        f" connections ({reused / statistics['requests']:.0%} reused),"
+        f" {statistics['open_sockets']} open sockets"
+    )
+
+
 def request_json(page_url):
     """This function makes a requests get and returns the json result
 
@@ -288,7 +420,9 @@ def request_json(page_url):
         str: request response json
     """
     try:
-        r = requests.get(page_url, headers=HEADER, timeout=REQUESTS_TIMEOUT)
+        r = get_session().get(
+            page_url, headers=HEADER, timeout=REQUESTS_TIMEOUT
+        )
         fetched_json = r.json()
     except requests.exceptions.ConnectionError:
         raise CheckerError(
@@ -310,15 +444,42 @@ def request_json(page_url):
 def request_text(page_url):
     """This function makes a requests get and returns the text result
 
+    If the page was fetched before (and the link status cache is open), a
+    conditional get is made and the cached text is returned if the page was
+    not modified. The request waits for the rate limit and connection cap of
+    the host (see link_checker.hosts).
+
     Args:
         page_url (str): URL to perform a GET request for
 
     Returns:
         str: request response text
     """
+    headers = dict(HEADER)
+    cached_page = get_cached_page(page_url)
+    if cached_page:
+        if cached_page["etag"]:
+            headers["If-None-Match"] = cached_page["etag"]
+        if cached_page["last_modified"]:
+            headers["If-Modified-Since"] = cached_page["last_modified"]
+    # Imported here as link_checker.hosts depends on this module
+    from .hosts import host_slot
+
     try:
-        r = requests.get(page_url, headers=HEADER, timeout=REQUESTS_TIMEOUT)
+        with host_slot(page_url):
+            r = get_session().get(
+                page_url, headers=headers, timeout=REQUESTS_TIMEOUT
+            )
+        if r.status_code == 304 and cached_page:
+            return cached_page["body"]
         fetched_text = r.content
+        if r.status_code == 200:
+            cache_page(
+                page_url,
+                r.headers.get("ETag"),
+                r.headers.get("Last-Modified"),
+                fetched_text,
+            )
     except requests.exceptions.ConnectionError:
         raise CheckerError(
             "FAILED to retreive source HTML ({}) due to"
@@ -336,6 +497,33 @@ def request_text(page_url):
     return fetched_text
 
 
+def prefetch_text(args, page_urls):
+    """Downloads pages concurrently (--fetch-workers at a time), so that the
+    next pages are downloaded while the current one is being parsed
+
+    Args:
+        page_urls (list): URLs to perform a GET request for
+
+    Returns:
+        iterator: request response text of each page (see request_text), in
+                  the order of page_urls
+    """
+    pool = Pool(args.fetch_workers)
+    return kill_on_close(pool, pool.imap(request_text, page_urls))
+
+
+def kill_on_close(pool, results):
+    """Yields the results of a gevent pool, killing its greenlets once the
+    results are not needed anymore (e.g. once the checks were stopped, see
+    link_checker.scheduling)
+    """
+    try:
+        yield from results
+    finally:
+        results.kill()
+        pool.kill()
+
+
 def request_local_text(local_path, filename):
     """This function reads license, deed, or rdf content from the file
     stored in local file system
@@ -362,7 +550,7 @@ def get_scrapable_links(
     args, base_url, links_found, context, context_printed, rdf=False
 ):
     """Filters out anchor tags without href attribute, internal links and
-    mailto scheme links
+    mailto scheme links and prints the warnings found while doing so
 
     Args:
         base_url (string): URL on which the license page will be displayed
@@ -373,6 +561,26 @@ def get_scrapable_links(
         list: valid_links - list of all absolute scrapable links
         bool: context_printed
     """
+    valid_anchors, valid_links, warnings = filter_scrapable_links(
+        base_url, links_found, rdf
+    )
+    context_printed = print_warnings(args, warnings, context, context_printed)
+    return (valid_anchors, valid_links, context_printed)
+
+
+def filter_scrapable_links(base_url, links_found, rdf=False):
+    """Filters out anchor tags without href attribute, internal links and
+    mailto scheme links
+
+    Args:
+        base_url (string): URL on which the license page will be displayed
+        links_found (list): List of all the links found in file
+
+    Returns:
+        list: valid_anchors - list of all scrapable anchor tags
+        list: valid_links - list of all absolute scrapable links
+        list: warnings - list of warnings about anchor tags
+    """
     valid_links = []
     valid_anchors = []
     warnings = []
@@ -436,13 +644,316 @@ def get_scrapable_links(
             valid_anchors.append(link["tag"])
         else:
             valid_anchors.append(link)
+    return (valid_anchors, valid_links, warnings)
+
+
+def print_warnings(args, warnings, context, context_printed):
+    """Prints the warnings found while filtering the links of a page
+
+    Args:
+        warnings (list): List of warnings about anchor tags
+        context (str): Context printed before the warnings
+        context_printed (bool): Whether the context was already printed
+
+    Returns:
+        bool: context_printed
+    """
     # Logging level WARNING or lower
     if warnings and args.log_level <= WARNING:
         print(context)
         print("Warnings:")
         print("\n".join(warnings))
         context_printed = True
-    return (valid_anchors, valid_links, context_printed)
+    return context_printed
+
+
+def get_html_links(base_url, source_html):
+    """Scrapes the links of an HTML page, reusing the links scraped from
+    identical pages in previous runs (if the link status cache is open)
+
+    Args:
+        base_url (string): URL on which the license page will be displayed
+        source_html (str or bytes): HTML of the page
+
+    Returns:
+        int: link_count - Number of anchor tags found in the page
+        list: valid_anchors - list of all scrapable anchor tags (rendered to
+              text)
+        list: valid_links - list of all absolute scrapable links
+        list: warnings - list of warnings about anchor tags
+    """
+    key = get_extract_key(base_url, source_html)
+    with phase("cache"):
+        extract = get_cached_extract(key)
+    if not extract:
+        extract = parse_html_links(base_url, source_html)
+        with phase("cache"):
+            cache_extract(key, extract)
+    return (
+        extract["link_count"],
+        extract["anchors"],
+        extract["links"],
+        extract["warnings"],
+    )
+
+
+def get_html_links_concurrently(args, base_urls, source_htmls):
+    """Scrapes the links of HTML pages like get_html_links, parsing up to
+    --jobs pages at once in separate processes
+
+    Args:
+        base_urls (list): URLs on which the pages will be displayed
+        source_htmls (iterable): HTML of the pages
+
+    Returns:
+        iterator: result of get_html_links for each page, in order
+    """
+    if args.jobs == 1:
+        for base_url, source_html in zip(base_urls, source_htmls):
+            yield get_html_links(base_url, source_html)
+        return
+    # Limit the number of pages held in memory while waiting to be parsed
+    backlog = collections.deque()
+    # The workers are spawned rather than forked: gevent watches the forked
+    # children and its patched os.waitpid cannot be used by the executor's
+    # management thread
+    executor = ProcessPoolExecutor(
+        args.jobs, mp_context=multiprocessing.get_context("spawn")
+    )
+    try:
+        for base_url, source_html in zip(base_urls, source_htmls):
+            key = get_extract_key(base_url, source_html)
+            with phase("cache"):
+                extract = get_cached_extract(key)
+            if not extract:
+                extract = executor.submit(
+                    parse_html_links, base_url, source_html
+                )
+            backlog.append((key, extract))
+            while len(backlog) > args.jobs * 4:
+                yield get_extract_result(*backlog.popleft())
+        while backlog:
+            yield get_extract_result(*backlog.popleft())
+    finally:
+        wait_cooperatively(executor.shutdown, cancel_futures=True)
+
+
+def get_local_html_links(args, license_names, base_urls, local_path=None):
+    """Scrapes the links of local pages like get_html_links_concurrently
+
+    With --incremental, the links of files that did not change since the
+    previous run (same size and modification time, or not changed in the
+    --changed-since revision range) are taken from the cache without reading
+    the files.
+
+    Args:
+        license_names (list): File names of the pages
+        base_urls (list): URLs on which the pages will be displayed
+        local_path (str): Directory containing the pages (defaults to
+            LICENSE_LOCAL_PATH)
+
+    Returns:
+        iterator: result of get_html_links for each page, in order
+    """
+    local_path = local_path or LICENSE_LOCAL_PATH
+    unchanged = {}
+    if args.incremental:
+        changed_paths = None
+        if args.changed_since:
+            changed_paths = get_changed_paths(local_path, args.changed_since)
+        for idx, license_name in enumerate(license_names):
+            with phase("cache", license_name):
+                result = get_unchanged_html_links(
+                    os.path.join(local_path, license_name),
+                    base_urls[idx],
+                    changed_paths,
+                )
+            if result:
+                unchanged[idx] = result
+        if args.log_level <= INFO:
+            print(
+                f"Unchanged files (incremental): {len(unchanged)} of"
+                f" {len(license_names)}"
+            )
+    changed_idx = [
+        idx for idx in range(len(license_names)) if idx not in unchanged
+    ]
+    source_htmls = read_local_pages(
+        args, local_path, [license_names[idx] for idx in changed_idx]
+    )
+    results = get_html_links_concurrently(
+        args, [base_urls[idx] for idx in changed_idx], source_htmls
+    )
+    for idx in range(len(license_names)):
+        if idx in unchanged:
+            yield unchanged.pop(idx)
+        else:
+            yield next(results)
+
+
+def read_local_pages(args, local_path, license_names):
+    """Reads local pages, recording them in the manifest with --incremental
+
+    Returns:
+        iterator: content of each page
+    """
+    for license_name in license_names:
+        path = os.path.realpath(os.path.join(local_path, license_name))
+        # The file is examined before it is read so that a modification
+        # during the run is detected by the next one
+        stat = os.stat(path) if args.incremental else None
+        with phase("fetch", license_name):
+            source_html = request_local_text(local_path, license_name)
+        if stat:
+            update_manifest(
+                path, stat.st_size, stat.st_mtime, get_digest(source_html)
+            )
+        yield source_html
+
+
+def get_unchanged_html_links(path, base_url, changed_paths=None):
+    """Get the cached links of a local page if it did not change since it was
+    last parsed
+
+    Args:
+        path (str): Path of the page
+        base_url (string): URL on which the page will be displayed
+        changed_paths (set): Paths changed in the --changed-since revision
+            range (None to compare the modification time instead)
+
+    Returns:
+        tuple: result of get_html_links (or None)
+    """
+    path = os.path.realpath(path)
+    entry = get_manifest_entry(path)
+    if entry is None:
+        return None
+    size, mtime, digest = entry
+    stat = os.stat(path)
+    if changed_paths is not None:
+        # Checking out revisions changes the modification time of files
+        if path in changed_paths or stat.st_size != size:
+            return None
+    elif (stat.st_size, stat.st_mtime) != (size, mtime):
+        return None
+    extract = get_cached_extract(f"{digest} {base_url}")
+    if not extract:
+        return None
+    return (
+        extract["link_count"],
+        extract["anchors"],
+        extract["links"],
+        extract["warnings"],
+    )
+
+
+def get_changed_paths(local_path, revision_range):
+    """Lists the files of a git repository changed in a revision range
+
+    Args:
+        local_path (str): Directory (in a git repository) to look into
+        revision_range (str): Revision (compared to the working tree) or
+            range of revisions (e.g. "HEAD~3..HEAD")
+
+    Returns:
+        set: absolute paths of the changed files
+    """
+    try:
+        output = subprocess.run(
+            ["git", "diff", "--name-only", "--relative", revision_range],
+            cwd=local_path,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError) as e:
+        raise CheckerError(
+            f"Unable to list the files changed since {revision_range}: {e}"
+        )
+    return {
+        os.path.realpath(os.path.join(local_path, changed_path))
+        for changed_path in output.splitlines()
+    }
+
+
+def get_extract_result(key, extract):
+    """Returns the result of get_html_links_concurrently for a page whose
+    links are cached or being parsed (and caches them once parsed)
+    """
+    if isinstance(extract, Future):
+        extract = wait_cooperatively(extract.result)
+        cache_extract(key, extract)
+    return (
+        extract["link_count"],
+        extract["anchors"],
+        extract["links"],
+        extract["warnings"],
+    )
+
+
+def wait_cooperatively(function, *args, **kwargs):
+    """Calls a blocking function in a thread of the gevent hub, so that the
+    other greenlets (e.g. the other checks of combined) keep running while it
+    waits
+
+    Returns:
+        object: result of the function
+    """
+    return get_hub().threadpool.apply(function, args, kwargs)
+
+
+def get_extract_key(base_url, source_html):
+    """Get the key under which the links scraped from a page are cached
+
+    Args:
+        base_url (string): URL on which the license page will be displayed
+        source_html (str or bytes): HTML of the page
+
+    Returns:
+        str: hash of the page content followed by the base URL
+    """
+    return "{} {}".format(get_digest(source_html), base_url)
+
+
+def get_digest(source_html):
+    """Get the digest identifying the content of a page
+
+    Args:
+        source_html (str or bytes): HTML of the page
+
+    Returns:
+        str: SHA-256 hash of the page content
+    """
+    if isinstance(source_html, str):
+        source_html = source_html.encode("utf-8")
+    return hashlib.sha256(source_html).hexdigest()
+
+
+def parse_html_links(base_url, source_html):
+    """Parses an HTML page and scrapes its links
+
+    Args:
+        base_url (string): URL on which the license page will be displayed
+        source_html (str or bytes): HTML of the page
+
+    Returns:
+        dict: link_count - Number of anchor tags found in the page
+              anchors - list of all scrapable anchor tags rendered to text
+              links - list of all absolute scrapable links
+              warnings - list of warnings about anchor tags
+    """
+    links_found = get_anchors(source_html)
+    valid_anchors, valid_links, warnings = filter_scrapable_links(
+        base_url, links_found
+    )
+    return {
+        "link_count": len(links_found),
+        "anchors": [
+            str(anchor).replace("\n", "").strip() for anchor in valid_anchors
+        ],
+        "links": valid_links,
+        "warnings": warnings,
+    }
 
 
 def create_base_link(
@@ -526,18 +1037,81 @@ def create_absolute_link(base_url, link_analysis):
     return href
 
 
-def get_memoized_result(valid_links, valid_anchors):
-    """Get memoized result of previously checked links
+@functools.lru_cache(maxsize=2**16)
+def normalize_link(link, https=False):
+    """Normalizes a link, so that equivalent links are checked (and memoized)
+    only once:
+    - the fragment is removed
+    - the scheme and host are lowercased and the default port is removed
+    - percent-encoded unreserved characters are decoded and the other
+      percent-encodings are uppercased
+    - an empty path is replaced with "/"
+
+    Args:
+        link (str): Absolute link
+        https (bool): Whether http links are replaced with their https
+            equivalent (--http-as-https)
+
+    Returns:
+        str: normalized link (non-HTTP links are returned unchanged)
+    """
+    try:
+        link_analysis = urlsplit(link)
+        port = link_analysis.port
+    except ValueError:
+        return link
+    scheme = link_analysis.scheme.lower()
+    if scheme not in DEFAULT_PORTS:
+        return link
+    userinfo, at, host = link_analysis.netloc.rpartition("@")
+    host = host.lower()
+    if port == DEFAULT_PORTS[scheme] or host.endswith(":"):
+        host = host.rsplit(":", 1)[0]
+    if https and scheme == "http":
+        scheme = "https"
+    return urlunsplit(
+        (
+            scheme,
+            f"{userinfo}{at}{host}",
+            normalize_percent_encoding(link_analysis.path) or "/",
+            normalize_percent_encoding(link_analysis.query),
+            "",
+        )
+    )
+
+
+def normalize_percent_encoding(text):
+    """Decodes the percent-encoded unreserved characters of a URL component
+    and uppercases the other percent-encodings
+    """
+    return PERCENT_ENCODING.sub(normalize_percent_encoded, text)
+
+
+def normalize_percent_encoded(match):
+    character = chr(int(match.group(0)[1:], 16))
+    if character in UNRESERVED_CHARACTERS:
+        return character
+    return match.group(0).upper()
+
+
+def get_memoized_result(valid_links, valid_anchors, https=False):
+    """Get memoized result of previously checked links (in this run or, if
+    the link status cache is open, in previous runs)
+
+    Results are memoized per normalized link (see normalize_link).
 
     Args:
         valid_links (list): List of all scrapable links in license
         valid_anchors (list): List of all scrapable anchor tags in license
+        https (bool): Whether http links are checked as their https
+            equivalent (--http-as-https)
 
     Returns:
         set: stored_links - List of links whose responses are memoized
              stored_anchors - List of anchor tags corresponding to stored_links
              stored_result - List of responses corresponding to stored_links
              check_links - List of links which are to be checked
+                           (normalized)
              check_anchors - List of anchor tags corresponding to check_links
     """
     stored_links = []
@@ -546,13 +1120,18 @@ def get_memoized_result(valid_links, valid_anchors):
     check_links = []
     check_anchors = []
     for idx, link in enumerate(valid_links):
-        status = MEMOIZED_LINKS.get(link)
+        key = normalize_link(link, https)
+        status = MEMOIZED_LINKS.get(key)
+        if not status:
+            status = get_cached_status(key)
+            if status:
+                MEMOIZED_LINKS[key] = status
         if status:
             stored_anchors.append(valid_anchors[idx])
             stored_result.append(status)
             stored_links.append(link)
         else:
-            check_links.append(link)
+            check_links.append(key)
             check_anchors.append(valid_anchors[idx])
     return (
         stored_links,
@@ -563,6 +1142,65 @@ def get_memoized_result(valid_links, valid_anchors):
     )
 
 
+def get_page(
+    name, base_url, context, valid_links, valid_anchors, context_printed=False
+):
+    """Creates the page dictionary of a scraped license page, deed or RDF
+
+    The anchors are rendered to text right away so that the parse tree of
+    the page can be freed before the links are checked. Links and anchors
+    are interned: the same link or anchor found in many pages (translations
+    of the same license, for example) is only stored once.
+
+    Args:
+        name (str or RDF object): Name of license (used in the error log)
+        base_url (string): URL on which the license page will be displayed
+        context (str): Context printed with the errors of the page
+        valid_links (list): List of all scrapable links in the page
+        valid_anchors (list): List of all scrapable anchor tags in the page
+        context_printed (bool): Whether the context was already printed
+            while scraping the page
+
+    Returns:
+        dict: page
+    """
+    return {
+        "name": name,
+        "base_url": base_url,
+        "context": context,
+        "context_printed": context_printed,
+        "links": [sys.intern(link) for link in valid_links],
+        "anchors": [
+            sys.intern(str(anchor).replace("\n", "").strip())
+            for anchor in valid_anchors
+        ],
+    }
+
+
+def get_unique_links(pages, https=False):
+    """Maps each unique link to the pages in which it was found
+
+    Args:
+        pages (list): List of page dictionaries (see get_page)
+        https (bool): Whether http links are checked as their https
+            equivalent (--http-as-https)
+
+    Returns:
+        dict: unique_links - each unique normalized link (see
+              normalize_link) mapped to an array of the indices of the pages
+              in which it was found (once per occurrence)
+    """
+    unique_links = {}
+    for page_idx, page in enumerate(pages):
+        for link in page["links"]:
+            link = normalize_link(link, https)
+            occurrences = unique_links.get(link)
+            if occurrences is None:
+                occurrences = unique_links[link] = array.array("I")
+            occurrences.append(page_idx)
+    return unique_links
+
+
 def exception_handler(request, exception):
     """Handles Invalid Scheme and Timeout Error from grequests.get
 
@@ -585,7 +1223,8 @@ def exception_handler(request, exception):
 
 
 def memoize_result(check_links, responses):
-    """Memoize the result of links checked
+    """Memoize the result of links checked (and store them in the link
+    status cache, if it is open)
 
     Args:
         check_links (list): List of fresh links that are processed
@@ -594,6 +1233,36 @@ def memoize_result(check_links, responses):
     """
     for idx, link in enumerate(check_links):
         MEMOIZED_LINKS[link] = responses[idx]
+    cache_statuses(check_links, responses)
+
+
+def record_recheck(link, first_response, response):
+    """Records the result of the re-check of a link that failed transiently
+    (see engines.recheck_link_responses)
+
+    Args:
+        link (str): Link re-checked
+        first_response (int or str): Status/exception of the first check
+        response (int or str): Status/exception of the re-check
+    """
+    RECHECKED_LINKS[link] = {"first": first_response, "status": response}
+
+
+def get_rechecked_links():
+    """Splits the links re-checked after a transient failure
+
+    Returns:
+        tuple: recovered - links that responded when re-checked
+               confirmed - links that failed again (and are reported)
+    """
+    recovered = []
+    confirmed = []
+    for link, recheck in RECHECKED_LINKS.items():
+        if recheck["status"] in GOOD_RESPONSE:
+            recovered.append(link)
+        else:
+            confirmed.append(link)
+    return recovered, confirmed
 
 
 def write_response(
@@ -626,7 +1295,9 @@ def write_response(
         except AttributeError:
             status = link_status
         if status not in GOOD_RESPONSE:
-            map_links_file(all_links[idx], base_url)
+            map_links_file(
+                normalize_link(all_links[idx], args.http_as_https), base_url
+            )
             caught_errors += 1
             if caught_errors == 1:
                 if args.log_level <= ERROR:
@@ -646,15 +1317,14 @@ def write_response(
 def map_links_file(link, file_url):
     """Maps broken link to the files of occurence
 
+    The files of each broken link are the keys of a dictionary, which keeps
+    them in order of occurence without duplicates.
+
     Args:
         link (str): Broken link encountered
         file_url (str): File url in which the broken link was encountered
     """
-    if MAP_BROKEN_LINKS.get(link):
-        if file_url not in MAP_BROKEN_LINKS[link]:
-            MAP_BROKEN_LINKS[link].append(file_url)
-    else:
-        MAP_BROKEN_LINKS[link] = [file_url]
+    MAP_BROKEN_LINKS.setdefault(link, {})[file_url] = None
 
 
 def output_write(args, *args_, **kwargs):
@@ -664,32 +1334,86 @@ def output_write(args, *args_, **kwargs):
         print(*args_, **kwargs)
 
 
-def output_issues_summary(args, license_names, num_errors):
+def output_issues_summary(args, license_names, num_errors, coverage=None):
     """Prints short summary of broken links in the output error file
 
     Args:
         license_names: Array of link to license files
         num_errors (int): Number of broken links found
+        coverage (dict): Coverage of the run (see metrics.get_coverage)
     """
     output_write(
         args, "\n\n{}\n{} SUMMARY\n{}\n".format("*" * 39, " " * 15, "*" * 39)
     )
     output_write(args, "Timestamp: {}".format(time.ctime()))
     output_write(args, "Total files checked: {}".format(len(license_names)))
+    if coverage:
+        output_write(args, get_coverage_summary(coverage))
     output_write(args, "Number of error links: {}".format(num_errors))
+    recovered, confirmed = get_rechecked_links()
+    if RECHECKED_LINKS:
+        output_write(
+            args,
+            f"Number of links re-checked after a transient failure:"
+            f" {len(RECHECKED_LINKS)} ({len(recovered)} failed once and"
+            f" recovered, {len(confirmed)} confirmed broken)",
+        )
     keys = MAP_BROKEN_LINKS.keys()
     output_write(args, "Number of unique broken links: {}\n".format(len(keys)))
     for key, value in MAP_BROKEN_LINKS.items():
-        output_write(args, "\nBroken link - {} found in:".format(key))
+        if key in RECHECKED_LINKS:
+            output_write(
+                args,
+                "\nBroken link - {} (confirmed broken on re-check) found"
+                " in:".format(key),
+            )
+        else:
+            output_write(args, "\nBroken link - {} found in:".format(key))
         for url in value:
             output_write(args, url)
+    if recovered:
+        output_write(args, "\nRecovered links (failed once, then responded):")
+        for link in recovered:
+            output_write(
+                args,
+                f"{link} (first check: {RECHECKED_LINKS[link]['first']},"
+                f" re-check: {RECHECKED_LINKS[link]['status']})",
+            )
 
 
-def output_test_summary(errors_total):
+def is_partial(coverage):
+    """Whether links or pages were not checked in a run (see
+    metrics.get_coverage)
+    """
+    return bool(
+        coverage and (coverage["unchecked"] or coverage.get("unchecked_pages"))
+    )
+
+
+def get_coverage_summary(coverage):
+    """Returns the coverage of a run (see metrics.get_coverage) in text"""
+    checked = coverage["links"] - coverage["unchecked"]
+    summary = (
+        f"Coverage: {checked} of {coverage['links']} unique links checked"
+    )
+    if coverage["links"]:
+        summary += f" ({checked / coverage['links']:.1%})"
+    if coverage.get("unchecked_pages"):
+        summary += f", {coverage['unchecked_pages']} pages not checked"
+    if is_partial(coverage):
+        summary += f", stopped as {coverage['stop_reason']}"
+    return summary
+
+
+def output_test_summary(errors_total, coverage=None):
     """Prints summary of script output in form of junit-xml
 
+    The links that were not checked (see link_checker.scheduling) are
+    reported as a skipped test case.
+
     Args:
         errors_total (int): Total number of broken links
+        coverage (dict): Coverage of the run (see metrics.get_coverage)
     """
     if not os.path.isdir("test-summary"):
         os.mkdir("test-summary")
@@ -704,14 +1428,135 @@ def output_test_summary(errors_total):
                 f"Number of error links: {errors_total}\nNumber of unique"
                 f" broken links: {len(MAP_BROKEN_LINKS.keys())}",
             )
-        ts = TestSuite("cc-link-checker", [test_case])
+        test_cases = [test_case]
+        properties = None
+        if coverage:
+            test_case.stdout = get_coverage_summary(coverage)
+            properties = {
+                "links": coverage["links"],
+                "links_checked": coverage["links"] - coverage["unchecked"],
+                "pages_not_checked": coverage.get("unchecked_pages", 0),
+            }
+            if is_partial(coverage):
+                skipped_case = TestCase("Unchecked links", "License files")
+                skipped_case.add_skipped_info(
+                    f"{coverage['unchecked']} of {coverage['links']} unique"
+                    f" links and {coverage.get('unchecked_pages', 0)} pages"
+                    f" not checked, as {coverage['stop_reason']}"
+                )
+                test_cases.append(skipped_case)
+        ts = TestSuite("cc-link-checker", test_cases, properties=properties)
         to_xml_report_file(test_summary, [ts])
 
 
-def output_summaries(args, license_names, errors_total):
+def output_summaries(args, license_names, errors_total, coverage=None):
     if not args.output_errors:
         return
-    output_issues_summary(args, license_names, errors_total)
+    output_issues_summary(args, license_names, errors_total, coverage)
     if args.log_level <= INFO:
         print("\nOutput to error file:", args.output_errors.name)
-    output_test_summary(errors_total)
+    output_test_summary(errors_total, coverage)
+
+
+def output_shard_result(
+    args, license_names, errors_total, exit_status, coverage=None
+):
+    """Writes the result of a shard (--shard) to the --shard-output file
+
+    The result holds what the merge subcommand needs to write the error file
+    and the junit-xml summary of all shards: the errors written for each
+    page (see write_response) and the broken links (see map_links_file).
+
+    Args:
+        license_names (list): License file names (or RDF objects) checked
+        errors_total (int): Number of broken links found in all pages
+        exit_status (int): 1 if any broken link was found, otherwise 0
+        coverage (dict): Coverage of the shard (see metrics.get_coverage)
+    """
+    result = {
+        "shard": list(args.shard),
+        "subcommand": args.subcommand,
+        "options": {
+            name: getattr(args, name) for name in SHARD_OPTIONS if name in args
+        },
+        "license_names": [
+            name if isinstance(name, str) else name["rdf:about"]
+            for name in license_names
+        ],
+        "errors_total": errors_total,
+        "exit_status": exit_status,
+        "duration": time.time() - START_TIME,
+        "error_log": args.output_errors.getvalue(),
+        "broken_links": {
+            link: {
+                "status": getattr(
+                    MEMOIZED_LINKS.get(link),
+                    "status_code",
+                    MEMOIZED_LINKS.get(link),
+                ),
+                "files": list(files),
+            }
+            for link, files in MAP_BROKEN_LINKS.items()
+        },
+        "rechecked_links": RECHECKED_LINKS,
+        "coverage": coverage,
+    }
+    with open(args.shard_output, "w", encoding="utf-8") as shard_output:
+        json.dump(result, shard_output, indent=2)
+    if args.log_level <= INFO:
+        print("\nOutput to shard result file:", args.shard_output)
+
+
+def read_shard_results(paths):
+    """Reads the results of all the shards of a run (see output_shard_result)
+
+    The shards must all have been checked with the same subcommand and
+    options (see SHARD_OPTIONS).
+
+    Args:
+        paths (list): Paths to the shard result files
+
+    Returns:
+        list: results sorted by shard index
+    """
+    results = []
+    for path in paths:
+        try:
+            with open(path, encoding="utf-8") as shard_result:
+                results.append(json.load(shard_result))
+        except FileNotFoundError:
+            raise CheckerError(f"Shard result path({path}) does not exist")
+        except (ValueError, UnicodeDecodeError) as e:
+            raise CheckerError(f"Invalid shard result ({path}): {e}")
+    results.sort(key=lambda result: result["shard"])
+    for result in results[1:]:
+        for key in ["subcommand", "options"]:
+            if result.get(key) != results[0].get(key):
+                raise CheckerError(
+                    f"Shard results of different runs ({key}:"
+                    f" {results[0].get(key)} in shard"
+                    f" {results[0]['shard'][0]}, {result.get(key)} in shard"
+                    f" {result['shard'][0]})"
+                )
+    shards = [tuple(result["shard"]) for result in results]
+    count = shards[0][1]
+    if shards != [(index, count) for index in range(1, count + 1)]:
+        found = ", ".join(f"{index}/{count}" for index, count in shards)
+        raise CheckerError(
+            f"Incomplete shard results (expected shards 1/{count} to"
+            f" {count}/{count}, found: {found})"
+        )
+    return results
+
+
+def merge_shard_result(args, result):
+    """Writes the errors of a shard to the --output-errors file and adds its
+    broken links to MAP_BROKEN_LINKS and its re-checked links to
+    RECHECKED_LINKS (see read_shard_results)
+    """
+    output_write(args, result["error_log"], end="")
+    RECHECKED_LINKS.update(result.get("rechecked_links", {}))
+    for link, broken_link in result["broken_links"].items():
+        MEMOIZED_LINKS.setdefault(link, broken_link["status"])
+        for file_url in broken_link["files"]:
+            map_links_file(link, file_url)
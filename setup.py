@@ -19,6 +19,7 @@ setup(
         "lxml",
         "requests",
     ],
+    extras_require={"async": ["httpx"], "http2": ["httpx[http2]"]},
     license="MIT",
     tests_require=["pytest"],
     packages=["link_checker"],